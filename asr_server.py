@@ -0,0 +1,120 @@
+import io
+import json
+import time
+import hashlib
+import argparse
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+def parse_multipart(content_type, body):
+    """
+    Parse a multipart/form-data request body
+    :return: Dict mapping field name to (filename, bytes, content type)
+    """
+    message = BytesParser(policy=default_policy).parsebytes(
+        b"Content-Type: " + content_type.encode("latin-1") + b"\r\n\r\n" + body
+    )
+    fields = {}
+    for part in message.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        fields[name] = (part.get_filename(), part.get_payload(decode=True), part.get_content_type())
+    return fields
+
+
+class MockBackend:
+    """Returns a deterministic placeholder transcription derived from the uploaded bytes"""
+
+    model = "mock"
+
+    def transcribe(self, filename, audio_file, mime_type):
+        data = audio_file.read()
+        digest = hashlib.sha256(data).hexdigest()[:8]
+        return {"text": f"Mock transcription of {filename} ({len(data)} bytes, {digest})."}
+
+
+def make_handler(backend, latency_sec=0.0, error_rate=0.0):
+    """
+    Build a request handler speaking the SiliconFlow /v1/audio/transcriptions protocol
+    :param backend: Object with transcribe(filename, file, mime_type) returning a dict
+    :param latency_sec: Artificial delay added to every request
+    :param error_rate: Fraction of requests answered with 503, for testing retries
+    """
+    counter = {"requests": 0}
+
+    class TranscriptionHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, status, payload, headers=None):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if not self.path.rstrip("/").endswith("/audio/transcriptions"):
+                self._send_json(404, {"error": "not found"})
+                return
+            counter["requests"] += 1
+            if error_rate and (counter["requests"] * error_rate) % 1 < error_rate:
+                self._send_json(503, {"error": "injected failure"}, {"Retry-After": "0"})
+                return
+            fields = parse_multipart(self.headers.get("Content-Type", ""), body)
+            if "file" not in fields:
+                self._send_json(400, {"error": "missing file field"})
+                return
+            filename, data, mime_type = fields["file"]
+            if latency_sec:
+                time.sleep(latency_sec)
+            try:
+                result = backend.transcribe(filename or "audio", io.BytesIO(data), mime_type)
+            except Exception as e:
+                self._send_json(500, {"error": str(e)})
+                return
+            self._send_json(200, result)
+
+        def log_message(self, format, *args):
+            pass
+
+    return TranscriptionHandler
+
+
+def serve(host="127.0.0.1", port=8900, backend=None, latency_sec=0.0, error_rate=0.0):
+    """
+    Create a stand-in transcription server (call serve_forever() on the result)
+    Point SILICON_FLOW_URL at http://host:port/v1/audio/transcriptions to use it.
+    """
+    backend = backend or MockBackend()
+    return ThreadingHTTPServer((host, port), make_handler(backend, latency_sec, error_rate))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local SiliconFlow-compatible transcription server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--mock", action="store_true", help="Return placeholder text instead of running a model")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds of artificial latency per request")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    args = parser.parse_args()
+
+    if args.mock:
+        backend = MockBackend()
+    else:
+        from src.backends import FasterWhisperBackend
+        backend = FasterWhisperBackend()
+
+    server = serve(args.host, args.port, backend, args.latency, args.error_rate)
+    print(f"Transcription server ({backend.model}) listening on http://{args.host}:{args.port}/v1/audio/transcriptions")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
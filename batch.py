@@ -0,0 +1,153 @@
+import os
+import sys
+import glob
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from src.config import Config
+from lecture_pipeline import LecturePipeline
+
+AUDIO_EXTENSIONS = (".m4a", ".mp3", ".wav", ".flac", ".ogg", ".opus")
+
+
+def find_lectures(target):
+    """
+    Resolve a directory or glob pattern to a sorted list of audio files
+    :param target: Directory path or glob pattern (e.g. "data/*.m4a")
+    """
+    if os.path.isdir(target):
+        paths = [os.path.join(target, name) for name in os.listdir(target)]
+    else:
+        paths = glob.glob(target, recursive=True)
+    return sorted(p for p in paths if os.path.isfile(p) and p.lower().endswith(AUDIO_EXTENSIONS))
+
+
+def split_lecture(input_file):
+    """
+    Decode and split one lecture (runs in a worker process)
+    The result is recorded in the lecture's manifest, where the I/O stage picks it up.
+    :return: Number of segments, or None if splitting failed
+    """
+    pipeline = LecturePipeline(input_file)
+    if not pipeline.prepare_segments():
+        return None
+    return len(pipeline.manifest.data["segments"])
+
+
+def run_lecture(input_file):
+    """
+    Transcribe and enhance one already-split lecture (runs in an I/O thread)
+    API calls from every lecture share the process-wide SiliconFlow/DeepSeek rate limiters.
+    :return: Status dict for the summary table
+    """
+    started = time.perf_counter()
+    pipeline = LecturePipeline(input_file)
+    report = pipeline.process()
+    failed_segments = len(pipeline.manifest.pending_segments())
+    if report is None:
+        status = "failed"
+    elif failed_segments:
+        status = "partial"
+    else:
+        status = "done"
+    return {
+        "file": input_file,
+        "status": status,
+        "segments": len(pipeline.manifest.data["segments"]),
+        "failed_segments": failed_segments,
+        "seconds": time.perf_counter() - started,
+        "report": report,
+    }
+
+
+def split_and_submit(lectures, split_workers, io_pool, statuses):
+    """
+    Split lectures on a process pool, handing each to the I/O pool once its split finishes
+    Lectures that cannot be split get a "split failed" entry in statuses.
+    :return: Dict mapping I/O futures to their lecture
+    """
+    io_futures = {}
+    with ProcessPoolExecutor(max_workers=split_workers) as split_pool:
+        split_futures = {split_pool.submit(split_lecture, path): path for path in lectures}
+        for future in as_completed(split_futures):
+            path = split_futures[future]
+            try:
+                segment_count = future.result()
+            except Exception as e:
+                print(f"Error splitting {os.path.basename(path)}: {str(e)}")
+                segment_count = None
+            if segment_count is None:
+                statuses[path] = {"file": path, "status": "split failed", "segments": 0,
+                                  "failed_segments": 0, "seconds": 0.0, "report": None}
+                continue
+            io_futures[io_pool.submit(run_lecture, path)] = path
+    return io_futures
+
+
+def run_batch(lectures, split_workers=None, lecture_concurrency=None):
+    """
+    Process many lectures: CPU-bound splitting on a process pool, API-bound work on threads
+    Each lecture moves to the I/O stage as soon as its own split finishes. With
+    Config.IN_MEMORY_SEGMENTS the pipeline streams segments from its own decoder, so
+    lectures go straight to the I/O stage and nothing is split to disk.
+    :param lectures: Input audio files
+    :param split_workers: Processes used for decoding and splitting
+    :param lecture_concurrency: Lectures transcribed/enhanced at the same time
+    :return: List of status dicts in input order
+    """
+    split_workers = split_workers or Config.BATCH_SPLIT_WORKERS
+    lecture_concurrency = lecture_concurrency or Config.BATCH_LECTURE_CONCURRENCY
+    statuses = {}
+
+    with ThreadPoolExecutor(max_workers=lecture_concurrency) as io_pool:
+        if Config.IN_MEMORY_SEGMENTS:
+            io_futures = {io_pool.submit(run_lecture, path): path for path in lectures}
+        else:
+            io_futures = split_and_submit(lectures, split_workers, io_pool, statuses)
+
+        for future in as_completed(io_futures):
+            path = io_futures[future]
+            try:
+                statuses[path] = future.result()
+            except Exception as e:
+                print(f"Error processing {os.path.basename(path)}: {str(e)}")
+                statuses[path] = {"file": path, "status": "failed", "segments": 0,
+                                  "failed_segments": 0, "seconds": 0.0, "report": None}
+
+    return [statuses[path] for path in lectures]
+
+
+def print_summary(statuses):
+    """Print a per-lecture status table"""
+    print("\n=== Batch Summary ===")
+    width = max([len(os.path.basename(s["file"])) for s in statuses] + [7])
+    print(f"{'Lecture':<{width}}  {'Status':<12}  {'Segments':>8}  {'Time':>8}  Report")
+    for s in statuses:
+        segments = f"{s['segments'] - s['failed_segments']}/{s['segments']}"
+        report = os.path.basename(s["report"]) if s["report"] else "-"
+        print(f"{os.path.basename(s['file']):<{width}}  {s['status']:<12}  {segments:>8}  {s['seconds']:>7.0f}s  {report}")
+    done = sum(1 for s in statuses if s["status"] == "done")
+    print(f"\n{done} of {len(statuses)} lectures completed")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Process a folder of lecture recordings")
+    parser.add_argument("target", help="Directory of recordings or glob pattern, e.g. 'data/*.m4a'")
+    parser.add_argument("--split-workers", type=int, help="Processes for decoding/splitting (default: CPU count; unused with IN_MEMORY_SEGMENTS)")
+    parser.add_argument("--lectures", type=int, help="Lectures transcribed and enhanced concurrently")
+    args = parser.parse_args()
+
+    lectures = find_lectures(args.target)
+    if not lectures:
+        print(f"No audio files found for {args.target}")
+        sys.exit(1)
+
+    Config.require("transcription", "llm")
+    print(f"=== Batch processing {len(lectures)} lectures ===")
+    statuses = run_batch(lectures, args.split_workers, args.lectures)
+    print_summary(statuses)
+    if any(s["status"] != "done" for s in statuses):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
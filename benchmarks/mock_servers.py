@@ -0,0 +1,131 @@
+import json
+import time
+import hashlib
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from asr_server import serve as serve_asr
+
+
+def make_llm_handler(latency_sec=0.0, tokens_per_sec=200.0, completion_words=400):
+    """
+    Build a handler for an OpenAI-compatible /chat/completions endpoint
+    Replies are synthetic Markdown of a fixed length; streaming follows the SSE protocol.
+    :param latency_sec: Delay before the first token
+    :param tokens_per_sec: Generation speed used to pace the reply
+    :param completion_words: Words per reply
+    """
+    # Simulated provider prefix cache: prompts are cached in 64-token (about 256 character) units
+    unit_chars = 256
+    seen_prefixes = set()
+    lock = threading.Lock()
+
+    def prefix_cache(prompt):
+        """Return the cached prefix length in tokens, then cache this prompt's prefixes"""
+        digests = [
+            hashlib.sha256(prompt[:end].encode("utf-8")).hexdigest()
+            for end in range(unit_chars, len(prompt) + 1, unit_chars)
+        ]
+        with lock:
+            hits = 0
+            while hits < len(digests) and digests[hits] in seen_prefixes:
+                hits += 1
+            seen_prefixes.update(digests)
+        return hits * unit_chars // 4
+
+    class ChatHandler(BaseHTTPRequestHandler):
+
+        def do_POST(self):
+            body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self.send_error(404)
+                return
+            prompt = "\n".join(message.get("content", "") for message in body.get("messages", []))
+            prompt_chars = len(prompt)
+            hit_tokens = prefix_cache(prompt)
+            usage = {
+                "prompt_tokens": prompt_chars // 4,
+                "prompt_cache_hit_tokens": hit_tokens,
+                "prompt_cache_miss_tokens": prompt_chars // 4 - hit_tokens,
+                "completion_tokens": completion_words,
+                "total_tokens": prompt_chars // 4 + completion_words,
+            }
+            words = ["## Section\n\n"] + [f"word{i % 50} " for i in range(completion_words)]
+            time.sleep(latency_sec)
+            if body.get("stream"):
+                self._stream(body.get("model", "mock"), words, usage)
+            else:
+                time.sleep(completion_words / tokens_per_sec)
+                self._send_json({
+                    "id": "mock", "object": "chat.completion", "created": int(time.time()),
+                    "model": body.get("model", "mock"),
+                    "choices": [{"index": 0, "finish_reason": "stop",
+                                 "message": {"role": "assistant", "content": "".join(words)}}],
+                    "usage": usage,
+                })
+
+        def _send_json(self, payload):
+            data = json.dumps(payload).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _stream(self, model, words, usage):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            batch = 10
+            for i in range(0, len(words), batch):
+                chunk = {
+                    "id": "mock", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                    "choices": [{"index": 0, "delta": {"content": "".join(words[i:i + batch])}, "finish_reason": None}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(batch / tokens_per_sec)
+            final = {"id": "mock", "object": "chat.completion.chunk", "created": int(time.time()), "model": model,
+                     "choices": [], "usage": usage}
+            self.wfile.write(f"data: {json.dumps(final)}\n\ndata: [DONE]\n\n".encode("utf-8"))
+            self.wfile.flush()
+            self.close_connection = True
+
+        def log_message(self, format, *args):
+            pass
+
+    return ChatHandler
+
+
+class MockServers:
+    """
+    Start mock SiliconFlow and DeepSeek servers on free local ports
+    Use as a context manager; env() returns the variables that point the pipeline at them.
+    """
+
+    def __init__(self, asr_latency_sec=0.5, llm_latency_sec=1.0, llm_tokens_per_sec=200.0):
+        self.asr = serve_asr("127.0.0.1", 0, latency_sec=asr_latency_sec)
+        self.llm = ThreadingHTTPServer(("127.0.0.1", 0), make_llm_handler(llm_latency_sec, llm_tokens_per_sec))
+        self._threads = []
+
+    def __enter__(self):
+        for server in (self.asr, self.llm):
+            thread = threading.Thread(target=server.serve_forever, daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def __exit__(self, *exc):
+        for server in (self.asr, self.llm):
+            server.shutdown()
+            server.server_close()
+
+    def env(self):
+        return {
+            "SILICON_FLOW_URL": f"http://127.0.0.1:{self.asr.server_address[1]}/v1/audio/transcriptions",
+            "DEEPSEEK_BASE_URL": f"http://127.0.0.1:{self.llm.server_address[1]}",
+            "SILICON_FLOW_API_KEY": "benchmark",
+            "DEEPSEEK_API_KEY": "benchmark",
+            "OPENAI_API_KEY": "benchmark",
+        }
@@ -0,0 +1,208 @@
+import os
+import sys
+import json
+import time
+import wave
+import shutil
+import argparse
+import resource
+import tempfile
+import threading
+import subprocess
+import numpy as np
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCHMARK_DIR)
+sys.path.insert(0, REPO_DIR)
+
+
+def generate_lecture(path, minutes, sample_rate=16000, seed=0):
+    """
+    Write a synthetic lecture recording as a mono 16-bit WAV
+    Phrases of syllable-modulated noise alternate with short pauses, with a 40 s break
+    every 15 minutes and a faint noise floor, so silence detection has realistic work.
+    Generated phrase by phrase, so memory use does not grow with the duration.
+    """
+    rng = np.random.default_rng(seed)
+    total_samples = int(minutes * 60 * sample_rate)
+    written = 0
+    next_break = 15 * 60 * sample_rate
+    with wave.open(path, "wb") as wav_file:
+        wav_file.setnchannels(1)
+        wav_file.setsampwidth(2)
+        wav_file.setframerate(sample_rate)
+        while written < total_samples:
+            if written >= next_break:
+                length = 40 * sample_rate
+                signal = np.zeros(length)
+                next_break += 15 * 60 * sample_rate
+            else:
+                phrase = int(rng.uniform(2.0, 8.0) * sample_rate)
+                pause = int(rng.uniform(0.3, 1.5) * sample_rate)
+                t = np.arange(phrase) / sample_rate
+                syllables = 0.5 * (1 + np.sin(2 * np.pi * rng.uniform(3.0, 5.0) * t))
+                signal = np.concatenate([rng.standard_normal(phrase) * syllables * 0.2, np.zeros(pause)])
+                length = len(signal)
+            length = min(length, total_samples - written)
+            floor = rng.standard_normal(length) * 0.0005
+            samples = np.clip((signal[:length] + floor) * 32767, -32768, 32767).astype("<i2")
+            wav_file.writeframes(samples.tobytes())
+            written += length
+    return path
+
+
+def encode_m4a(wav_path, m4a_path):
+    """Encode the synthetic WAV as AAC/M4A, like a phone recording"""
+    subprocess.run(
+        ["ffmpeg", "-hide_banner", "-loglevel", "error", "-y", "-i", wav_path, "-c:a", "aac", "-b:a", "64k", m4a_path],
+        check=True
+    )
+    return m4a_path
+
+
+def directory_size(path):
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(root, name))
+            except OSError:
+                pass
+    return total
+
+
+def run_child(input_file, output_dir):
+    """
+    Run one pipeline end to end in this process and print its measurements as JSON
+    Must run in a fresh process so peak RSS belongs to this lecture only.
+    """
+    from lecture_pipeline import LecturePipeline
+
+    pipeline = LecturePipeline(input_file, output_dir=output_dir)
+    peak_disk = {"bytes": 0}
+    done = threading.Event()
+
+    def sample_disk():
+        while not done.is_set():
+            used = directory_size(pipeline.run_dir)
+            if pipeline.temp_dir and os.path.exists(pipeline.temp_dir):
+                used += directory_size(pipeline.temp_dir)
+            peak_disk["bytes"] = max(peak_disk["bytes"], used)
+            done.wait(0.2)
+
+    sampler = threading.Thread(target=sample_disk, daemon=True)
+    sampler.start()
+    started = time.perf_counter()
+    report = pipeline.process()
+    wall_sec = time.perf_counter() - started
+    done.set()
+    sampler.join()
+
+    metrics = pipeline.metrics.to_dict()
+    result = {
+        "ok": report is not None,
+        "wall_sec": round(wall_sec, 3),
+        "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        "peak_child_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+        "peak_temp_disk_mb": round(peak_disk["bytes"] / (1024 * 1024), 1),
+        "real_time_factor": metrics["real_time_factor"],
+        "bytes_uploaded": metrics["counters"].get("bytes_uploaded", 0),
+        "llm_prompt_tokens": metrics["counters"].get("llm_prompt_tokens", 0),
+        "llm_prompt_cache_hit_tokens": metrics["counters"].get("llm_prompt_cache_hit_tokens", 0),
+        "stages": metrics["stages"],
+    }
+    print("BENCHMARK_RESULT " + json.dumps(result))
+
+
+def run_case(minutes, work_dir, servers, args):
+    """Generate (or reuse) a synthetic lecture and benchmark it in a child process"""
+    wav_path = os.path.join(work_dir, f"synthetic_{minutes}min.wav")
+    if not os.path.exists(wav_path):
+        print(f"Generating {minutes}-minute synthetic lecture...")
+        generate_lecture(wav_path, minutes, seed=minutes)
+    input_file = wav_path
+    if args.format == "m4a":
+        input_file = os.path.join(work_dir, f"synthetic_{minutes}min.m4a")
+        if not os.path.exists(input_file):
+            encode_m4a(wav_path, input_file)
+
+    output_dir = tempfile.mkdtemp(prefix=f"bench-{minutes}min-", dir=work_dir)
+    env = dict(os.environ)
+    env.update(servers.env())
+    env.update({
+        "TRANSCRIPTION_CACHE": "False",
+        "CACHE_DIR": os.path.join(output_dir, "cache"),
+        "SCRATCH_DIR": output_dir,
+        # Section blobs are pruned after every report; keep that away from the user's store
+        "SECTIONS_DIR": os.path.join(output_dir, "sections"),
+        # Index into the case's own database; the report is deleted with output_dir
+        "SEARCH_INDEX_PATH": os.path.join(output_dir, "search.sqlite3"),
+        "SILICON_FLOW_RPM": "0",
+        "DEEPSEEK_RPM": "0",
+    })
+    command = [sys.executable, os.path.abspath(__file__), "--child", input_file, "--child-output", output_dir]
+    completed = subprocess.run(command, env=env, capture_output=True, text=True, cwd=REPO_DIR)
+    shutil.rmtree(output_dir, ignore_errors=True)
+
+    for line in completed.stdout.splitlines():
+        if line.startswith("BENCHMARK_RESULT "):
+            result = json.loads(line[len("BENCHMARK_RESULT "):])
+            result["minutes"] = minutes
+            return result
+    print(completed.stdout[-2000:])
+    print(completed.stderr[-2000:])
+    return {"minutes": minutes, "ok": False}
+
+
+def print_table(results):
+    print("\n=== Benchmark Results ===")
+    print(f"{'Minutes':>7}  {'OK':>3}  {'Wall s':>8}  {'RSS MB':>7}  {'ffmpeg MB':>9}  {'Disk MB':>8}  {'RTF':>7}  {'LLM cache':>9}  Stage CPU s (process + children)")
+    for r in results:
+        if not r.get("stages"):
+            print(f"{r['minutes']:>7}  {'no':>3}")
+            continue
+        stages = ", ".join(
+            f"{name} {totals['process_cpu_sec'] + totals['children_cpu_sec']:.1f}"
+            for name, totals in r["stages"].items() if name != "transcribe_segment"
+        )
+        # Share of prompt tokens served from the provider's prefix cache
+        cached = r["llm_prompt_cache_hit_tokens"] / r["llm_prompt_tokens"] if r["llm_prompt_tokens"] else 0.0
+        print(f"{r['minutes']:>7}  {'yes' if r['ok'] else 'no':>3}  {r['wall_sec']:>8.1f}  {r['peak_rss_mb']:>7.1f}  "
+              f"{r['peak_child_rss_mb']:>9.1f}  {r['peak_temp_disk_mb']:>8.1f}  {r['real_time_factor'] or 0:>7.4f}  "
+              f"{cached:>9.0%}  {stages}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end pipeline benchmark against mock ASR/LLM servers")
+    parser.add_argument("--minutes", type=int, nargs="+", default=[10, 60, 180], help="Lecture lengths to benchmark")
+    parser.add_argument("--format", choices=["wav", "m4a"], default="m4a", help="Input format of the synthetic lectures")
+    parser.add_argument("--asr-latency", type=float, default=0.5, help="Mock transcription latency per segment (s)")
+    parser.add_argument("--llm-latency", type=float, default=1.0, help="Mock LLM time to first token (s)")
+    parser.add_argument("--llm-speed", type=float, default=200.0, help="Mock LLM tokens per second")
+    parser.add_argument("--work-dir", default=os.path.join(BENCHMARK_DIR, "data"), help="Where synthetic audio is kept")
+    parser.add_argument("--output", help="Write results as JSON to this file")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    parser.add_argument("--child-output", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(args.child, args.child_output)
+        return
+
+    from benchmarks.mock_servers import MockServers
+
+    os.makedirs(args.work_dir, exist_ok=True)
+    results = []
+    with MockServers(args.asr_latency, args.llm_latency, args.llm_speed) as servers:
+        for minutes in args.minutes:
+            print(f"\nBenchmarking {minutes}-minute lecture...")
+            results.append(run_case(minutes, args.work_dir, servers, args))
+    print_table(results)
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"\nResults saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
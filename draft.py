@@ -1,8 +1,11 @@
-from pydub import AudioSegment
 import os
-import requests
 import json
 from src.config import Config
+from src.engine import RunContext, ConvertStage, SplitStage, TranscribeStage, fetch_transcription
+from src.report import render_summary_text, render_complete_text
+from src.transcript import Transcript, TranscriptSegment
+from src.transcription import TranscriptionError
+from src.backends import get_transcription_backend
 from datetime import datetime
 
 def convert_m4a_to_mp3(input_file, output_file):
@@ -11,192 +14,145 @@ def convert_m4a_to_mp3(input_file, output_file):
     :param input_file: Path to input M4A file
     :param output_file: Path to output MP3 file
     """
-    try:
-        audio = AudioSegment.from_file(input_file, format="m4a")
-        audio.export(output_file, format="mp3")
-        print(f"Successfully converted {input_file} to {output_file}")
-        return True
-    except Exception as e:
-        print(f"Error converting file: {str(e)}")
+    context = RunContext(os.path.basename(input_file))
+    if ConvertStage("mp3", output_file)(context, input_file) is None:
         return False
+    print(f"Successfully converted {input_file} to {output_file}")
+    return True
 
 def split_mp3(file_path, output_dir, segment_length_sec=600):
     """
     Split MP3 file into segments of specified length
+    Kept for existing callers; streams through split_audio so the file is never fully loaded.
     :param file_path: Path to input MP3 file
     :param output_dir: Directory to save the segments
     :param segment_length_sec: Length of each segment in seconds (default: 600 seconds = 10 minutes)
     :return: List of created segment files
     """
-    try:
-        audio = AudioSegment.from_mp3(file_path)
-        total_length_sec = len(audio) / 1000  # Convert milliseconds to seconds
-
-        # Create output directory if it doesn't exist
-        os.makedirs(output_dir, exist_ok=True)
-
-        # Get base filename
-        base_filename = os.path.splitext(os.path.basename(file_path))[0]
-        
-        segment_files = []
-        start = 0
-        part_num = 1
+    return split_audio(file_path, output_dir, segment_length_sec=segment_length_sec, fmt="mp3")
 
-        while start < total_length_sec:
-            end = start + segment_length_sec
-            # Slice audio (convert seconds to milliseconds)
-            segment_audio = audio[start*1000:end*1000]
-            
-            # Create output filename
-            output_filename = f"{base_filename}_part{part_num}.mp3"
-            output_path = os.path.join(output_dir, output_filename)
-            
-            # Export segment
-            segment_audio.export(output_path, format="mp3")
-            print(f"Exported segment: {output_path}")
-            segment_files.append(output_path)
-            
-            part_num += 1
-            start = end
+def split_audio(file_path, output_dir, segment_length_sec=600, fmt="flac", context=None):
+    """
+    Split any input audio straight into upload-ready segments in one decode pass
+    :param file_path: Path to input audio file (M4A or MP3)
+    :param output_dir: Directory to save the segments
+    :param segment_length_sec: Length of each segment in seconds (default: 600 seconds = 10 minutes)
+    :param fmt: Segment format, see src.audio.SEGMENT_CODECS ("copy" keeps the source codec)
+    :param context: Optional RunContext to record metrics in
+    :return: List of created segment files
+    """
+    segments = split_segments(file_path, output_dir, segment_length_sec, fmt, context)
+    return [segment["path"] for segment in segments]
 
+def split_segments(file_path, output_dir, segment_length_sec=600, fmt="flac", context=None):
+    """Like split_audio, but returns the engine's segment records (path, start_sec, end_sec)"""
+    base_filename = os.path.splitext(os.path.basename(file_path))[0]
+    context = context or RunContext(os.path.basename(file_path))
+    stage = SplitStage(
+        segment_length_sec, fmt=fmt, silence_aware=False, output_dir=output_dir, prefix=f"{base_filename}_part"
+    )
+    segments = stage(context, file_path)
+    for segment in segments:
+        print(f"Exported segment: {segment['path']}")
+    if segments:
         print("Splitting completed successfully!")
-        return segment_files
-    except Exception as e:
-        print(f"Error splitting file: {str(e)}")
-        return []
+    return segments
 
-def transcribe_audio(file_path, output_dir="output/transcriptions"):
+def transcribe_audio(file_path, output_dir="output/transcriptions", cache=None):
     """
-    Transcribe audio file using Silicon Flow API and save results
+    Transcribe audio file using the configured ASR backend (Silicon Flow API by default) and save results
     :param file_path: Path to audio file
     :param output_dir: Directory to save transcription results
+    :param cache: Optional DiskCache; a hit reuses the stored response instead of uploading
     :return: Path to the saved transcription file
     """
     try:
         # Create output directory if it doesn't exist
         os.makedirs(output_dir, exist_ok=True)
-        
+
         # Get the base filename without extension
         base_filename = os.path.splitext(os.path.basename(file_path))[0]
-        
+
         # Define output file paths
         txt_output = os.path.join(output_dir, f"{base_filename}_transcription.txt")
         json_output = os.path.join(output_dir, f"{base_filename}_transcription.json")
 
-        url = "https://api.siliconflow.cn/v1/audio/transcriptions"
-        
-        # Open file in binary mode
-        with open(file_path, "rb") as audio_file:
-            # Build multipart/form-data request
-            files = {
-                "file": (os.path.basename(file_path), audio_file, "audio/mpeg"),
-                "model": (None, "FunAudioLLM/SenseVoiceSmall")
-            }
-            
-            headers = {
-                "Authorization": f"Bearer {Config.SILICON_FLOW_API_KEY}"
-            }
+        try:
+            result = fetch_transcription(get_transcription_backend(), file_path, cache)
+        except TranscriptionError as e:
+            print(str(e))
+            return None
+
+        # Save raw JSON response
+        with open(json_output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
 
-            response = requests.post(url, files=files, headers=headers)
-            
-        if response.status_code == 200:
-            # Save raw JSON response
-            with open(json_output, 'w', encoding='utf-8') as f:
-                json.dump(response.json(), f, ensure_ascii=False, indent=2)
-            
-            # Extract and save text content
-            try:
-                transcription_text = response.json().get('text', '')
-                with open(txt_output, 'w', encoding='utf-8') as f:
-                    f.write(transcription_text)
-                print(f"Transcription saved to {txt_output}")
-                print(f"Full response saved to {json_output}")
-                return txt_output
-            except Exception as e:
-                print(f"Error saving transcription: {str(e)}")
-                return None
-        else:
-            print(f"Transcription failed with status code: {response.status_code}")
-            print(f"Response: {response.text}")
+        # Extract and save text content
+        try:
+            transcription_text = result.get('text', '')
+            with open(txt_output, 'w', encoding='utf-8') as f:
+                f.write(transcription_text)
+            print(f"Transcription saved to {txt_output}")
+            print(f"Full response saved to {json_output}")
+            return txt_output
+        except Exception as e:
+            print(f"Error saving transcription: {str(e)}")
             return None
     except Exception as e:
         print(f"Error during transcription: {str(e)}")
         return None
 
-def create_lecture_summary(transcription_files, output_dir):
+def load_transcription_files(transcription_files, spans=None):
+    """
+    Read per-segment transcription text files into one Transcript, reading each file once
+    Parts that cannot be read are kept as failed segments.
+    :param transcription_files: List of transcription file paths in lecture order
+    :param spans: Optional (start_sec, end_sec) of each part, e.g. from split_segments; without
+                  them the parts are left untimed rather than given invented offsets
+    """
+    transcript = Transcript()
+    for i, file_path in enumerate(transcription_files):
+        try:
+            with open(file_path, 'r', encoding='utf-8') as infile:
+                text = infile.read()
+        except Exception as e:
+            print(f"Error reading part {i + 1}: {str(e)}")
+            text = None
+        start_sec, end_sec = spans[i] if spans else (None, None)
+        transcript.append(TranscriptSegment(i, start_sec, end_sec, text))
+    return transcript
+
+def create_lecture_summary(transcript, output_dir):
     """
     Create a combined and formatted lecture summary
-    :param transcription_files: List of transcription file paths
+    :param transcript: Transcript from the transcription stage (or a list of transcription file paths)
     :param output_dir: Directory to save the summary
     """
+    if not isinstance(transcript, Transcript):
+        transcript = load_transcription_files(transcript)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     combined_output = os.path.join(output_dir, f"lecture_summary_{timestamp}.txt")
-    
+
     with open(combined_output, 'w', encoding='utf-8') as outfile:
-        # Write header
-        outfile.write("=== Lecture Summary ===\n")
-        outfile.write(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n")
-        
-        # Write content from each part
-        for i, file_path in enumerate(transcription_files, 1):
-            outfile.write(f"\n=== Part {i} ===\n")
-            try:
-                with open(file_path, 'r', encoding='utf-8') as infile:
-                    content = infile.read().strip()
-                    outfile.write(content)
-                    outfile.write("\n")
-            except Exception as e:
-                outfile.write(f"[Error reading part {i}: {str(e)}]\n")
-        
-        # Write footer
-        outfile.write("\n=== End of Summary ===\n")
-    
+        outfile.write(render_summary_text(transcript))
+
     print(f"\nLecture summary saved to {combined_output}")
     return combined_output
 
-def merge_transcriptions(transcription_files, output_dir):
+def merge_transcriptions(transcript, output_dir):
     """
     Merge all transcription files into a single, well-formatted document
-    :param transcription_files: List of transcription file paths
+    :param transcript: Transcript from the transcription stage (or a list of transcription file paths)
     :param output_dir: Directory to save the merged document
     """
+    if not isinstance(transcript, Transcript):
+        transcript = load_transcription_files(transcript)
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     merged_output = os.path.join(output_dir, f"complete_lecture_{timestamp}.txt")
-    
+
     with open(merged_output, 'w', encoding='utf-8') as outfile:
-        # Write document header
-        outfile.write("=" * 80 + "\n")
-        outfile.write("COMPLETE LECTURE TRANSCRIPTION\n")
-        outfile.write("=" * 80 + "\n\n")
-        outfile.write(f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-        outfile.write(f"Total Parts: {len(transcription_files)}\n")
-        outfile.write("-" * 80 + "\n\n")
-        
-        # Write content from each part
-        for i, file_path in enumerate(transcription_files, 1):
-            # Write part header
-            outfile.write(f"PART {i}\n")
-            outfile.write("-" * 40 + "\n")
-            
-            try:
-                with open(file_path, 'r', encoding='utf-8') as infile:
-                    content = infile.read().strip()
-                    # Add proper paragraph spacing
-                    paragraphs = content.split('\n\n')
-                    for para in paragraphs:
-                        if para.strip():
-                            outfile.write(para.strip() + "\n\n")
-            except Exception as e:
-                outfile.write(f"[Error reading part {i}: {str(e)}]\n\n")
-            
-            # Add separator between parts
-            outfile.write("-" * 80 + "\n\n")
-        
-        # Write document footer
-        outfile.write("=" * 80 + "\n")
-        outfile.write("END OF LECTURE TRANSCRIPTION\n")
-        outfile.write("=" * 80 + "\n")
-    
+        outfile.write(render_complete_text(transcript))
+
     print(f"\nComplete lecture document saved to {merged_output}")
     return merged_output
 
@@ -206,55 +162,38 @@ def main():
     input_file = os.path.join(base_dir, "data", "Frankfurt School of Finance & Management 2.m4a")
     mp3_dir = os.path.join(base_dir, "output", "mp3")
     transcriptions_dir = os.path.join(base_dir, "output", "transcriptions")
-    
+
     # Ensure directories exist
     os.makedirs(mp3_dir, exist_ok=True)
     os.makedirs(transcriptions_dir, exist_ok=True)
-    
-    # Commented out for testing transcription only
-    """
+    Config.require("transcription")
+
     print("=== Starting Lecture Processing ===")
-    
-    # Convert M4A to MP3
-    output_file = os.path.join(mp3_dir, "converted_lecture.mp3")
-    if not convert_m4a_to_mp3(input_file, output_file):
-        print("Failed to convert audio file. Exiting.")
-        return
-    
-    # Split the MP3 file into 10-minute segments
-    segment_files = split_mp3(output_file, mp3_dir, segment_length_sec=600)
-    if not segment_files:
+    context = RunContext(os.path.basename(input_file))
+
+    # Split the M4A file straight into 10-minute FLAC segments (no intermediate MP3)
+    segments = split_segments(input_file, mp3_dir, segment_length_sec=600, context=context)
+    if not segments:
         print("Failed to split audio file. Exiting.")
         return
 
-    
-    # For testing transcription with existing files
-    segment_files = [os.path.join(mp3_dir, f) for f in os.listdir(mp3_dir) if f.endswith('.mp3')]
-    
-    # Create a list to store all transcription file paths
-    transcription_files = []
-    
-    # Transcribe all segments
+    # Transcribe all segments; texts stay in memory for the documents below
     print("\n=== Starting Transcription Process ===")
-    for i, segment_file in enumerate(segment_files, 1):
-        print(f"\nTranscribing segment {i} of {len(segment_files)}: {os.path.basename(segment_file)}...")
-        result_file = transcribe_audio(segment_file, transcriptions_dir)
-        if result_file:
-            transcription_files.append(result_file)
-        else:
-            print(f"Warning: Failed to transcribe segment {i}")
-    """
+    transcript = TranscribeStage()(context, segments)
+    for segment in transcript.failed:
+        print(f"Warning: Failed to transcribe segment {segment.index + 1}")
+
     # Create the final summary and complete document
-    if transcription_files:
+    if transcript.has_text():
         print("\n=== Creating Documents ===")
+        transcript.save(os.path.join(transcriptions_dir, f"lecture_transcript_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"))
         # Create the summary
-        create_lecture_summary(transcription_files, transcriptions_dir)
+        create_lecture_summary(transcript, transcriptions_dir)
         # Create the complete document
-        merge_transcriptions(transcription_files, transcriptions_dir)
+        merge_transcriptions(transcript, transcriptions_dir)
         print("\n=== Processing Complete ===")
     else:
         print("\nNo transcriptions were generated. Please check the errors above.")
 
 if __name__ == "__main__":
     main()
-    
\ No newline at end of file
@@ -1,265 +1,233 @@
 import os
-from pydub import AudioSegment
-import requests
-import json
-from openai import OpenAI
+import shutil
 from datetime import datetime
 from src.config import Config
+from src.engine import RunContext, SplitStage, TranscribeStage, StreamTranscribeStage, EnhanceStage
+from src.manifest import LectureManifest, source_fingerprint
+from src.report import write_frontmatter, write_report
+from src.search import index_report
+from src.sections import report_sections, build_sections, prune_sections
 
 class LecturePipeline:
-    def __init__(self, input_file):
+    def __init__(self, input_file, output_dir=None, cancel_event=None):
         """
         Initialize the lecture processing pipeline
         :param input_file: Path to input audio file (M4A or MP3)
+        :param output_dir: Directory for reports and run state (defaults to ./output)
+        :param cancel_event: Optional threading.Event that stops the run at the next segment or stage
+                             (or during enhancement)
         """
         self.input_file = input_file
         self.base_dir = os.path.dirname(os.path.abspath(__file__))
-        self.output_dir = os.path.join(self.base_dir, "output")
-        self.temp_dir = os.path.join(self.output_dir, "temp")
-        os.makedirs(self.temp_dir, exist_ok=True)
-        
-        # Initialize API clients
-        self.deepseek_client = OpenAI(
-            api_key=Config.DEEPSEEK_API_KEY,
-            base_url="https://api.deepseek.com"
+        self.output_dir = output_dir or os.path.join(self.base_dir, "output")
+        # Work for each lecture is checkpointed in its own run directory so failed runs can resume
+        self.run_id = source_fingerprint(input_file)[:16]
+        self.run_dir = os.path.join(self.output_dir, "runs", self.run_id)
+        os.makedirs(self.run_dir, exist_ok=True)
+        self.manifest = LectureManifest(
+            os.path.join(self.run_dir, "manifest.json"),
+            input_file,
+            source_fingerprint(input_file)
         )
+        # Scratch space, transcription backend, cache and metrics shared by the engine stages
+        self.context = RunContext(
+            os.path.basename(input_file), scratch_prefix=f"lecture-{self.run_id}-", cancel_event=cancel_event
+        )
+        self.metrics = self.context.metrics
 
-    def convert_to_mp3(self, input_file):
-        """Convert M4A to MP3 if needed"""
-        try:
-            if input_file.lower().endswith('.m4a'):
-                output_file = os.path.join(self.temp_dir, "converted.mp3")
-                audio = AudioSegment.from_file(input_file, format="m4a")
-                audio.export(output_file, format="mp3")
-                print(f"Converted {input_file} to MP3")
-                return output_file
-            return input_file
-        except Exception as e:
-            print(f"Error converting file: {str(e)}")
-            return None
+    @property
+    def temp_dir(self):
+        """This run's scratch directory, or None before a stage needs one"""
+        return self.context.temp_dir
 
-    def split_audio(self, file_path, segment_length_sec=600):
-        """Split audio into segments"""
-        try:
-            audio = AudioSegment.from_mp3(file_path)
-            total_length_sec = len(audio) / 1000
-            segments = []
-            
-            for i in range(0, int(total_length_sec), segment_length_sec):
-                end = min(i + segment_length_sec, total_length_sec)
-                segment = audio[i*1000:int(end*1000)]
-                segment_path = os.path.join(self.temp_dir, f"segment_{i//segment_length_sec + 1}.mp3")
-                segment.export(segment_path, format="mp3")
-                segments.append(segment_path)
-            
-            print(f"Split audio into {len(segments)} segments")
-            return segments
-        except Exception as e:
-            print(f"Error splitting audio: {str(e)}")
-            return []
+    def prepare_segments(self):
+        """
+        Split the recording unless the manifest already has usable segments
+        :return: True if segments are ready for transcription
+        """
+        if self.manifest.segments_available():
+            print(f"Reusing {len(self.manifest.data['segments'])} segments from previous run")
+            paths = [segment["path"] for segment in self.manifest.data["segments"] if segment["path"]]
+            if paths:
+                self.context.temp_dir = os.path.dirname(paths[0])
+            return True
+        segments = SplitStage()(self.context, self.input_file)
+        if not segments:
+            return False
+        self.manifest.set_segments(
+            [segment["path"] for segment in segments],
+            [(segment["start_sec"], segment["end_sec"]) for segment in segments]
+        )
+        return True
 
-    def transcribe_segment(self, segment_path):
-        """Transcribe a single audio segment"""
-        try:
-            url = "https://api.siliconflow.cn/v1/audio/transcriptions"
-            
-            with open(segment_path, "rb") as audio_file:
-                files = {
-                    "file": (os.path.basename(segment_path), audio_file, "audio/mpeg"),
-                    "model": (None, "FunAudioLLM/SenseVoiceSmall")
-                }
-                headers = {"Authorization": f"Bearer {Config.SILICON_FLOW_API_KEY}"}
-                response = requests.post(url, files=files, headers=headers)
-            
-            if response.status_code == 200:
-                return response.json().get('text', '')
-            else:
-                print(f"Transcription failed for segment {segment_path}")
+    def transcribe(self):
+        """
+        Produce the timestamped transcript, checkpointing every segment in the manifest
+        :return: Transcript, or None if splitting failed
+        """
+        if Config.IN_MEMORY_SEGMENTS:
+            # Stream segments straight from the decoder to the API
+            def known_text(index, start_sec, end_sec):
+                return self.manifest.add_segment(index, None, start_sec, end_sec)["text"]
+
+            StreamTranscribeStage(known_text, self.manifest.set_transcription)(self.context, self.input_file)
+            # A cancelled stream stops decoding early, so the segment list may be incomplete
+            if self.context.cancelled:
+                return self.manifest.transcript()
+            self.manifest.mark_done("split")
+        else:
+            # Decode once and split directly into upload-ready segments
+            if not self.prepare_segments():
                 return None
-        except Exception as e:
-            print(f"Error transcribing segment: {str(e)}")
-            return None
-
-    def enhance_summary(self, text):
-        """Enhance the summary using DeepSeek API with two different approaches"""
-        try:
-            # First prompt for concept summarization
-            concept_prompt = """You are an expert at analyzing and summarizing academic lectures. Your task is to create a comprehensive concept summary in Markdown format. Please:
-
-1. Extract and organize the main concepts and key ideas
-2. Identify the relationships between different concepts
-3. Highlight important definitions and terminology
-4. Create a clear hierarchy of ideas
-5. Include examples and applications where relevant
-6. Add cross-references between related concepts
-7. Identify the main learning objectives
-8. Note any practical applications or real-world connections
-
-Format requirements:
-- Use # for the main title
-- Use ## for major concept categories
-- Use ### for sub-concepts
-- Use bullet points (- or *) for key points
-- Use **bold** for important terms and definitions
-- Use > for key concepts and definitions
-- Use `code` for technical terms
-- Add a concept map or outline at the beginning
-- Include a glossary of key terms at the end
-- Use horizontal rules (---) between major concept sections
-
-Please ensure the output is in perfect Markdown format with clear concept organization."""
-
-            # Second prompt for transcription correction
-            correction_prompt = """You are an expert at correcting and improving lecture transcriptions. Your task is to fix and enhance the transcription while maintaining its original meaning. Please:
-
-1. Fix any transcription errors and unclear sentences
-2. Correct grammar and punctuation
-3. Improve sentence structure and flow
-4. Remove filler words and redundant phrases
-5. Fix technical term misspellings
-6. Add proper paragraph breaks
-7. Maintain the original lecture's tone and style
-8. Preserve important pauses and emphasis
-
-Format requirements:
-- Use # for the main title
-- Use ## for major sections
-- Use ### for subsections
-- Use proper paragraph spacing
-- Use **bold** for emphasis on corrected terms
-- Use > for important quotes
-- Add timestamps or section markers
-- Include a note about major corrections
-- Use horizontal rules (---) between major sections
-
-Please ensure the output is in perfect Markdown format with clear corrections and improvements."""
-
-            # Get both types of summaries
-            concept_response = self.deepseek_client.chat.completions.create(
-                model="deepseek-chat",
-                messages=[
-                    {"role": "system", "content": concept_prompt},
-                    {"role": "user", "content": f"Please create a concept summary of this lecture:\n\n{text}"},
-                ],
-                stream=False
-            )
-            
-            correction_response = self.deepseek_client.chat.completions.create(
-                model="deepseek-chat",
-                messages=[
-                    {"role": "system", "content": correction_prompt},
-                    {"role": "user", "content": f"Please correct and improve this lecture transcription:\n\n{text}"},
-                ],
-                stream=False
-            )
-            
-            # Combine both summaries with clear separation
-            combined_summary = f"""# Lecture Analysis Report
-
-## Table of Contents
-- [Concept Summary](#concept-summary)
-- [Corrected Transcription](#corrected-transcription)
-
----
+            TranscribeStage(self.manifest.set_transcription)(self.context, self.manifest.data["segments"])
+        if not self.manifest.pending_segments():
+            self.manifest.mark_done("transcribed")
+        return self.manifest.transcript()
 
-## Concept Summary
-
-{concept_response.choices[0].message.content}
-
----
-
-## Corrected Transcription
-
-{correction_response.choices[0].message.content}
+    def enhance(self, transcript, output_file):
+        """
+        Write the report for a transcript, reusing enhancement results from an earlier run
+        With Config.REPORT_SECTIONS the report is assembled from content-addressed section
+        blobs; if it comes out identical to the lecture's latest report, the new file is
+        dropped and the latest one kept.
+        :return: Path of the report, or None if it was not written
+        """
+        streamed = False
+        if self.manifest.is_done("corrected") and self.manifest.is_done("summarized"):
+            print("Reusing enhancement results from previous run")
+            results = {
+                'concept': self.manifest.get_output("concept"),
+                'correction': self.manifest.get_output("correction"),
+            }
+        else:
+            # Sectioned reports note failed segments themselves, so no LLM tokens are spent on them
+            stage = EnhanceStage(include_failed=not Config.REPORT_SECTIONS)
+            if Config.LLM_STREAM:
+                # Tokens are written to the report as they arrive
+                with open(output_file, 'w', encoding='utf-8') as f:
+                    write_frontmatter(f, "Lecture Analysis Report", self.input_file, "AI Lecture Assistant")
+                    stage.out = f
+                    results = stage(self.context, transcript)
+                streamed = True
+                if not results:
+                    print(f"Partial report kept at: {output_file}")
+            else:
+                results = stage(self.context, transcript)
+            if not results:
+                return None
+            self.manifest.set_output("correction", results['correction'], stage="corrected")
+            self.manifest.set_output("concept", results['concept'], stage="summarized")
 
----
+        if not Config.REPORT_SECTIONS:
+            if not streamed:
+                write_report(output_file, results, self.input_file)
+            return output_file
 
-*Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*
-"""
-            
-            return combined_summary
+        report_path = report_sections(self.input_file).assemble(
+            output_file, build_sections(results, transcript, self.input_file)
+        )
+        prune_sections()
+        if report_path != output_file:
+            if streamed:
+                os.remove(output_file)
+            print(f"Report unchanged; keeping {report_path}")
+        return report_path
+
+    def write_metrics(self, base_path):
+        """Write the JSON run report (and Prometheus export if enabled) for this run"""
+        try:
+            path = self.metrics.write_reports(base_path, prometheus=Config.METRICS_PROMETHEUS)
+            print(f"Run metrics saved to: {path}")
         except Exception as e:
-            print(f"Error enhancing summary: {str(e)}")
-            return None
+            print(f"Error writing run metrics: {str(e)}")
+
+    def cleanup(self):
+        """Remove this run's scratch and run directories once the report is written"""
+        self.context.cleanup()
+        if os.path.exists(self.run_dir):
+            shutil.rmtree(self.run_dir)
 
     def process(self):
-        """Run the complete pipeline"""
+        """
+        Run the complete pipeline
+        Progress is checkpointed in the run manifest; on failure the run directory is kept
+        and the next call resumes from the first unfinished stage.
+        :return: Path to the lecture analysis report, or None if the run did not finish
+        """
+        if not self.manifest.acquire_lock():
+            print(f"{os.path.basename(self.input_file)} is already being processed by another run")
+            return None
+        # Unfinished runs keep their metrics next to the manifest
+        metrics_base = os.path.join(self.run_dir, "run")
         try:
             print("\n=== Starting Lecture Processing Pipeline ===")
-            
-            # Step 1: Convert to MP3 if needed
-            mp3_file = self.convert_to_mp3(self.input_file)
-            if not mp3_file:
-                return
-            
-            # Step 2: Split audio into segments
-            segments = self.split_audio(mp3_file)
-            if not segments:
+            if self.manifest.resumed:
+                print(f"Resuming previous run from {self.run_dir}")
+
+            # Steps 1-2: Split and transcribe whatever is still missing
+            transcript = self.transcribe()
+
+            if self.context.cancelled:
+                print(f"Run cancelled; rerun to resume from {self.run_dir}")
                 return
-            
-            # Step 3: Transcribe all segments
-            print("\nTranscribing segments...")
-            transcriptions = []
-            for i, segment in enumerate(segments, 1):
-                print(f"Transcribing segment {i} of {len(segments)}...")
-                text = self.transcribe_segment(segment)
-                if text:
-                    transcriptions.append(text)
-            
-            if not transcriptions:
+            if not transcript or not transcript.has_text():
                 print("No transcriptions were generated.")
                 return
-            
-            # Step 4: Combine transcriptions
-            combined_text = "\n\n".join(transcriptions)
-            
-            # Step 5: Enhance the summary
+            if transcript.failed:
+                print(f"{len(transcript.failed)} segments could not be transcribed: "
+                      + ", ".join(segment.span for segment in transcript.failed))
+
+            # Step 3: Enhance the summary
+            # The run id keeps lectures that finish in the same second (batch, server) apart;
+            # the run lock guarantees no other pipeline uses it at the same time
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            output_file = os.path.join(self.output_dir, f"lecture_analysis_{timestamp}_{self.run_id[:8]}.md")
             print("\nEnhancing summary...")
-            enhanced_summary = self.enhance_summary(combined_text)
-            
-            if enhanced_summary:
-                # Save the final enhanced summary
-                timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                output_file = os.path.join(self.output_dir, f"lecture_analysis_{timestamp}.md")
-                
-                with open(output_file, 'w', encoding='utf-8') as f:
-                    # Add YAML frontmatter
-                    f.write("---\n")
-                    f.write(f"title: Lecture Analysis Report\n")
-                    f.write(f"date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-                    f.write(f"source_file: {os.path.basename(self.input_file)}\n")
-                    f.write(f"generated_by: AI Lecture Assistant\n")
-                    f.write("---\n\n")
-                    # Write the enhanced summary
-                    f.write(enhanced_summary)
-                
+            report_path = self.enhance(transcript, output_file)
+
+            # Step 4: Keep the timestamped transcript next to the report (or the partial one)
+            if report_path or os.path.exists(output_file):
+                transcript.save(f"{os.path.splitext(report_path or output_file)[0]}.transcript.json")
+
+            if report_path:
+                output_file = report_path
+                self.manifest.set_output("report", output_file, stage="reported")
+                index_report(output_file)
+
+                metrics_base = os.path.splitext(output_file)[0]
                 print(f"\n=== Pipeline Complete ===")
                 print(f"Lecture analysis saved to: {output_file}")
-                
-                # Clean up temporary files
-                for file in os.listdir(self.temp_dir):
-                    os.remove(os.path.join(self.temp_dir, file))
-                os.rmdir(self.temp_dir)
+
+                # Failed segments keep the run directory around so a rerun can retry them
+                if self.manifest.pending_segments():
+                    print(f"{len(self.manifest.pending_segments())} segments failed; rerun to retry them")
+                else:
+                    self.cleanup()
+                return output_file
+            elif self.context.cancelled:
+                print(f"Run cancelled; rerun to resume from {self.run_dir}")
             else:
                 print("Failed to enhance the summary.")
-        
+                print(f"Progress saved; rerun to resume from {self.run_dir}")
+
         except Exception as e:
             print(f"Error in pipeline: {str(e)}")
+            print(f"Progress saved; rerun to resume from {self.run_dir}")
         finally:
-            # Clean up temporary files in case of error
-            if os.path.exists(self.temp_dir):
-                for file in os.listdir(self.temp_dir):
-                    os.remove(os.path.join(self.temp_dir, file))
-                os.rmdir(self.temp_dir)
+            self.write_metrics(metrics_base)
+            self.manifest.release_lock()
 
 def main():
     # Define input file path
     base_dir = os.path.dirname(os.path.abspath(__file__))
     input_file = os.path.join(base_dir, "data", "Frankfurt School of Finance & Management 3.m4a")
-    
+
+    # Fail fast on missing credentials for the stages this run needs
+    Config.require("transcription", "llm")
+
     # Create and run pipeline
     pipeline = LecturePipeline(input_file)
     pipeline.process()
 
 if __name__ == "__main__":
-    main() 
\ No newline at end of file
+    main()
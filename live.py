@@ -0,0 +1,271 @@
+import os
+import sys
+import time
+import signal
+import asyncio
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from src.config import Config
+from src.live import StreamSegmenter, iter_live_pcm
+from src.transcription import transcribe_with_retry
+from src.engine import fetch_transcription
+from src.report import write_frontmatter
+from src.search import index_report
+from src.backends import get_transcription_backend
+from src.metrics import RunMetrics
+from src.ratelimit import rate_share
+from src.transcript import Transcript, TranscriptSegment
+from src.enhancement import (
+    create_async_client, generate, merge_concepts, estimate_tokens, raise_failures, FAILED_SECTION_NOTE, PROMPT_VARIANTS
+)
+
+# Appended to the user message for each piece of a lecture that is still being recorded
+LIVE_PART_NOTE = "\n\n(This is part {part} of a lecture that is still in progress. Only process this part; do not add an introduction or conclusion for the whole lecture.)"
+
+
+class LiveSession:
+    """
+    Transcribe and correct a lecture while it is being recorded
+    Audio is cut at pauses as it arrives; every segment is transcribed and corrected right
+    away and appended to the report in order. A partial concept summary is started for
+    every LLM_CHUNK_TOKENS of transcript, so when the recording stops only the last part
+    and the final merge are left to do.
+    """
+
+    def __init__(self, source, output_dir=None, input_format=None):
+        """
+        :param source: Path to a recording that is still growing, or "-" for stdin
+        :param output_dir: Directory for the report (defaults to ./output)
+        :param input_format: ffmpeg input format to force, e.g. "s16le" for headerless PCM
+        """
+        self.source = source
+        self.input_format = input_format
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        self.output_dir = output_dir or os.path.join(base_dir, "output")
+        source_name = "stdin" if source == "-" else os.path.basename(source)
+        self.metrics = RunMetrics(source_name)
+        self.stop_event = threading.Event()
+        self.transcript = Transcript(source_file=source_name)
+        self.correction_prompt, self.correction_template = PROMPT_VARIANTS["correction"]
+        self.concept_prompt, self.concept_template = PROMPT_VARIANTS["concept"]
+
+    def read_segments(self, loop, queue):
+        """Decode and segment the source (runs in a thread), handing segments to the event loop"""
+        segmenter = StreamSegmenter(
+            target_sec=Config.LIVE_SEGMENT_SEC,
+            tolerance_sec=Config.LIVE_TOLERANCE_SEC,
+            silence_db=Config.SILENCE_THRESHOLD_DB,
+            max_silence_sec=Config.MAX_SILENCE_SEC
+        )
+        try:
+            pcm_stream = iter_live_pcm(
+                self.source, self.stop_event,
+                input_format=self.input_format,
+                idle_timeout_sec=Config.LIVE_IDLE_TIMEOUT_SEC
+            )
+            for pcm in pcm_stream:
+                for segment in segmenter.feed(pcm):
+                    loop.call_soon_threadsafe(queue.put_nowait, segment)
+            for segment in segmenter.flush():
+                loop.call_soon_threadsafe(queue.put_nowait, segment)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, None)
+
+    def transcribe(self, segment):
+        """Transcribe one PcmSegment with retries (runs in a worker thread)"""
+        backend = get_transcription_backend()
+
+        def transcribe_once(segment):
+            return fetch_transcription(backend, segment, metrics=self.metrics).get('text', '')
+
+        with self.metrics.span("transcribe_segment", index=segment.index, audio_sec=segment.duration_sec) as span, \
+                rate_share(self.transcript.source_file, segment.duration_sec):
+            span["ok"] = False
+            text = transcribe_with_retry(
+                transcribe_once, segment,
+                retries=backend.segment_retries,
+                backoff_sec=Config.TRANSCRIBE_BACKOFF_SEC
+            )
+            span["ok"] = text is not None
+        if text is not None:
+            self.metrics.add("audio_seconds", segment.duration_sec)
+        return text
+
+    async def process_segment(self, segment, client, pool, semaphore):
+        """
+        Transcribe and correct one segment
+        :return: Tuple of (TranscriptSegment, corrected text or None)
+        """
+        text = await asyncio.get_running_loop().run_in_executor(pool, self.transcribe, segment)
+        record = TranscriptSegment(segment.index, segment.start_sec, segment.end_sec, text)
+        if not text or not text.strip():
+            return record, None
+        user_content = self.correction_template.format(text=record.marked_text())
+        user_content += LIVE_PART_NOTE.format(part=segment.index + 1)
+        try:
+            async with semaphore:
+                corrected = await generate(
+                    client, self.correction_prompt, user_content,
+                    section=f"correction-{segment.index + 1}", metrics=self.metrics
+                )
+        except Exception as e:
+            # Keep the raw transcript in the notes rather than losing the segment
+            print(f"Error correcting segment {segment.index + 1}: {str(e)}")
+            corrected = text
+        return record, corrected
+
+    async def summarize_part(self, client, semaphore, texts, part):
+        """Concept summary of one finished stretch of the lecture"""
+        user_content = self.concept_template.format(text="\n\n".join(texts)) + LIVE_PART_NOTE.format(part=part)
+        async with semaphore:
+            return await generate(
+                client, self.concept_prompt, user_content,
+                section=f"concept-part-{part}", metrics=self.metrics
+            )
+
+    async def write_corrections(self, f, tasks, client, semaphore):
+        """
+        Append corrected segments to the report in recording order as they complete
+        :return: Tuple of (partial concept summary tasks, transcript texts not yet summarised)
+        """
+        concept_tasks = []
+        pending, pending_tokens = [], 0
+        while True:
+            task = await tasks.get()
+            if task is None:
+                return concept_tasks, pending
+            record, corrected = await task
+            self.transcript.append(record)
+            if not record.ok:
+                f.write(f"### {record.span}\n\n*This segment could not be transcribed.*\n\n")
+                f.flush()
+                continue
+            if corrected is None:
+                continue
+            f.write(f"### {record.span}\n\n{corrected.strip()}\n\n")
+            f.flush()
+            print(f"Segment {record.index + 1} ({record.span}) added to the notes")
+
+            pending.append(record.marked_text())
+            pending_tokens += estimate_tokens(record.text)
+            if pending_tokens >= Config.LLM_CHUNK_TOKENS:
+                part = len(concept_tasks) + 1
+                concept_tasks.append(asyncio.create_task(self.summarize_part(client, semaphore, pending, part)))
+                pending, pending_tokens = [], 0
+
+    async def summarize(self, client, semaphore, concept_tasks, pending):
+        """
+        Finish the concept summary once the recording has ended
+        A failed call leaves a note in place of the summary, so the transcript and the
+        corrected notes are still saved.
+        """
+        try:
+            if not concept_tasks:
+                if not pending:
+                    return ""
+                return await generate(
+                    client, self.concept_prompt, self.concept_template.format(text="\n\n".join(pending)),
+                    section="concept", metrics=self.metrics
+                )
+            if pending:
+                concept_tasks.append(asyncio.create_task(
+                    self.summarize_part(client, semaphore, pending, len(concept_tasks) + 1)
+                ))
+            # Let every part finish (and be cached) before giving up on the summary
+            partial_concepts = await asyncio.gather(*concept_tasks, return_exceptions=True)
+            raise_failures(partial_concepts)
+            return await merge_concepts(client, partial_concepts, metrics=self.metrics)
+        except Exception as e:
+            print(f"Error generating the concept summary: {str(e)}")
+            return FAILED_SECTION_NOTE.format(error=str(e) or type(e).__name__).strip()
+
+    def write_frontmatter(self, f):
+        """Write the YAML frontmatter and the heading of the live report"""
+        write_frontmatter(f, "Lecture Analysis Report", self.transcript.source_file, "AI Lecture Assistant (live)")
+        f.write("# Lecture Analysis Report\n\n## Corrected Transcription\n\n")
+        f.flush()
+
+    async def run(self):
+        """
+        Follow the source until it ends and write the report
+        :return: Path to the report, or None if nothing was transcribed
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGINT, self.stop)
+        except (NotImplementedError, RuntimeError):
+            pass
+
+        backend = get_transcription_backend()
+        client = create_async_client()
+        semaphore = asyncio.Semaphore(Config.LLM_CONCURRENCY)
+        pool = ThreadPoolExecutor(max_workers=backend.concurrency)
+        segments = asyncio.Queue()
+        tasks = asyncio.Queue()
+
+        os.makedirs(self.output_dir, exist_ok=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        output_file = os.path.join(self.output_dir, f"lecture_analysis_live_{timestamp}.md")
+        try:
+            with open(output_file, 'w', encoding='utf-8') as f:
+                self.write_frontmatter(f)
+                reader = loop.run_in_executor(None, self.read_segments, loop, segments)
+                writer = asyncio.create_task(self.write_corrections(f, tasks, client, semaphore))
+                while True:
+                    segment = await segments.get()
+                    if segment is None:
+                        break
+                    tasks.put_nowait(asyncio.create_task(self.process_segment(segment, client, pool, semaphore)))
+                tasks.put_nowait(None)
+                await reader
+
+                # The recording has ended: finish the last segments and the concept summary
+                ended = time.perf_counter()
+                with self.metrics.span("finish"):
+                    concept_tasks, pending = await writer
+                    concept = await self.summarize(client, semaphore, concept_tasks, pending)
+                if not self.transcript.has_text():
+                    print("No transcriptions were generated.")
+                    return None
+                self.transcript.save(f"{os.path.splitext(output_file)[0]}.transcript.json")
+                f.write(f"---\n\n## Concept Summary\n\n{concept}\n\n---\n\n")
+                f.write(f"*Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*\n")
+            index_report(output_file)
+            print(f"\nNotes ready {time.perf_counter() - ended:.1f}s after the recording ended")
+            print(f"Lecture analysis saved to: {output_file}")
+            return output_file
+        finally:
+            pool.shutdown()
+            await client.close()
+            path = self.metrics.write_reports(os.path.splitext(output_file)[0], prometheus=Config.METRICS_PROMETHEUS)
+            print(f"Run metrics saved to: {path}")
+
+    def stop(self):
+        """Stop reading input; segments already received are still processed"""
+        if not self.stop_event.is_set():
+            print("\nStopping: finishing the segments already recorded...")
+            self.stop_event.set()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Transcribe and correct a lecture while it is being recorded")
+    parser.add_argument("source", help="Recording that is still being written (WAV, MP3, FLAC, Ogg), or - for stdin")
+    parser.add_argument("--format", help="Force the ffmpeg input format, e.g. s16le for raw PCM")
+    parser.add_argument("--output-dir", help="Directory for the report (default: ./output)")
+    args = parser.parse_args()
+
+    if args.source != "-" and not os.path.exists(args.source):
+        print(f"{args.source} does not exist")
+        sys.exit(1)
+    Config.require("transcription", "llm")
+
+    print(f"=== Live lecture mode: following {'stdin' if args.source == '-' else args.source} ===")
+    print("Press Ctrl-C when the lecture is over")
+    session = LiveSession(args.source, args.output_dir, args.format)
+    if asyncio.run(session.run()) is None:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
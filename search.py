@@ -0,0 +1,48 @@
+import os
+import sys
+import time
+import argparse
+from src.config import Config
+from src.search import NoteIndex
+
+
+def main():
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    parser = argparse.ArgumentParser(description="Search the generated lecture notes")
+    parser.add_argument("query", nargs="*", help="Words to look for")
+    parser.add_argument("--output-dir", default=os.path.join(base_dir, "output"), help="Notes directory (default: ./output)")
+    parser.add_argument("--index", default=Config.SEARCH_INDEX_PATH,
+                        help="Search index database (default: SEARCH_INDEX_PATH, where the pipelines write)")
+    parser.add_argument("--source", help="Only notes whose source recording name contains this text")
+    parser.add_argument("--since", help="Only notes dated on or after YYYY-MM-DD")
+    parser.add_argument("--limit", type=int, default=20, help="Maximum number of results")
+    parser.add_argument("--no-update", action="store_true", help="Search the index as it is, without checking for new files")
+    args = parser.parse_args()
+
+    index = NoteIndex(args.index)
+    if not args.no_update:
+        # Only new or changed files are read, so this is a quick stat of the directory
+        started = time.perf_counter()
+        indexed, removed = index.update(args.output_dir)
+        if indexed or removed:
+            print(f"Index updated: {indexed} files indexed, {removed} removed "
+                  f"({(time.perf_counter() - started) * 1000:.0f} ms)")
+    if not args.query:
+        stats = index.stats()
+        print(f"{stats['files']} notes, {stats['sections']} sections indexed")
+        return
+
+    started = time.perf_counter()
+    results = index.search(" ".join(args.query), limit=args.limit, source=args.source, since=args.since)
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    for result in results:
+        print(f"\n{os.path.relpath(result['path'], args.output_dir)}  {result['date']}  {result['source_file']}")
+        if result["heading"]:
+            print(f"  # {result['heading']}")
+        print(f"  {' '.join(result['snippet'].split())}")
+    print(f"\n{len(results)} results in {elapsed_ms:.1f} ms")
+    if not results:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+import os
+import json
+import threading
+import argparse
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from src.config import Config
+from src.jobs import JobQueue, JOB_STATES
+from lecture_pipeline import LecturePipeline
+
+
+class WorkerPool:
+    """
+    Long-lived worker threads that take lectures from the job queue
+    Workers stay up between jobs, so the transcription backend (HTTP session or local
+    model), the caches, the rate limiters and the client libraries are loaded once per
+    server instead of once per lecture.
+    """
+
+    def __init__(self, queue, workers=None, output_dir=None, poll_sec=5.0):
+        """
+        :param queue: JobQueue to take jobs from
+        :param workers: Lectures processed at the same time (defaults to Config.SERVER_WORKERS)
+        :param output_dir: Directory for reports and run state (defaults to ./output)
+        :param poll_sec: How often idle workers recheck the queue for jobs added by other processes
+        """
+        self.queue = queue
+        self.workers = workers or Config.SERVER_WORKERS
+        self.output_dir = output_dir
+        self.poll_sec = poll_sec
+        self._wake = threading.Condition()
+        self._cancel_events = {}
+        self._lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._threads = []
+
+    def warm_up(self):
+        """Load the transcription backend and LLM client library before the first job arrives"""
+        from src.backends import get_transcription_backend
+        from src.enhancement import get_prompt_cache
+        import openai  # noqa: F401 (imported once here instead of inside the first job)
+
+        backend = get_transcription_backend()
+        get_prompt_cache()
+        print(f"Workers ready: {self.workers} lectures at a time, ASR model {backend.model}")
+
+    def start(self):
+        self.warm_up()
+        for i in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"lecture-worker-{i + 1}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def notify(self):
+        """Wake an idle worker after a job was submitted"""
+        with self._wake:
+            self._wake.notify()
+
+    def cancel(self, job_id):
+        """
+        Cancel a queued or running job
+        :return: The job after the update, or None if it does not exist
+        """
+        job = self.queue.cancel(job_id)
+        with self._lock:
+            event = self._cancel_events.get(job_id)
+        if event:
+            event.set()
+        return job
+
+    def running(self):
+        with self._lock:
+            return sorted(self._cancel_events)
+
+    def stop(self):
+        """Stop taking new jobs and cancel the running ones (they resume on the next start)"""
+        self._stopping.set()
+        with self._lock:
+            events = list(self._cancel_events.values())
+        for event in events:
+            event.set()
+        with self._wake:
+            self._wake.notify_all()
+        for thread in self._threads:
+            thread.join()
+
+    def _work(self):
+        while not self._stopping.is_set():
+            job = self.queue.claim()
+            if job is None:
+                with self._wake:
+                    self._wake.wait(self.poll_sec)
+                continue
+            self._run(job)
+
+    def _run(self, job):
+        cancel_event = threading.Event()
+        with self._lock:
+            self._cancel_events[job["id"]] = cancel_event
+        print(f"Job {job['id']}: processing {os.path.basename(job['input_file'])}")
+        report, error = None, None
+        try:
+            pipeline = LecturePipeline(job["input_file"], self.output_dir, cancel_event=cancel_event)
+            report = pipeline.process()
+            failed_segments = len(pipeline.manifest.pending_segments())
+        except Exception as e:
+            error = str(e)
+            failed_segments = 0
+        finally:
+            with self._lock:
+                del self._cancel_events[job["id"]]
+
+        if self._stopping.is_set() and report is None:
+            # Interrupted by shutdown, not by the user: leave it running so it is requeued
+            print(f"Job {job['id']}: interrupted by shutdown")
+            return
+        # A cancel that arrives after the report was written and indexed is too late to stop anything
+        if report is None and cancel_event.is_set():
+            status = "cancelled"
+        elif report is None:
+            status = "failed"
+            error = error or "pipeline did not finish; see server log"
+        elif failed_segments:
+            status = "partial"
+            error = f"{failed_segments} segments could not be transcribed"
+        else:
+            status = "done"
+        self.queue.finish(job["id"], status, report=report, error=error)
+        print(f"Job {job['id']}: {status}")
+
+
+def make_handler(queue, pool):
+    """
+    Build the request handler of the job API
+      POST   /jobs         {"file": "...", "priority": 0}  submit a lecture
+      GET    /jobs         ?status=queued&limit=100         list jobs, newest first
+      GET    /jobs/<id>                                     job status
+      DELETE /jobs/<id>                                     cancel a job
+      GET    /health                                        queue counts and running jobs
+    """
+
+    class JobHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send_json(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def _job_id(self, path):
+            parts = path.strip("/").split("/")
+            if len(parts) == 2 and parts[0] == "jobs" and parts[1].isdigit():
+                return int(parts[1])
+            return None
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            path = url.path.rstrip("/")
+            if path == "/health":
+                self._send_json(200, {"workers": pool.workers, "running": pool.running(), "jobs": queue.counts()})
+            elif path == "/jobs":
+                query = parse_qs(url.query)
+                status = query.get("status", [None])[0]
+                if status and status not in JOB_STATES:
+                    self._send_json(400, {"error": f"unknown status {status}"})
+                    return
+                try:
+                    limit = int(query.get("limit", ["100"])[0])
+                except ValueError:
+                    self._send_json(400, {"error": "limit must be an integer"})
+                    return
+                self._send_json(200, {"jobs": queue.list(status, limit)})
+            else:
+                job_id = self._job_id(path)
+                job = queue.get(job_id) if job_id is not None else None
+                if job is None:
+                    self._send_json(404, {"error": "not found"})
+                    return
+                self._send_json(200, job)
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            if urlparse(self.path).path.rstrip("/") != "/jobs":
+                self._send_json(404, {"error": "not found"})
+                return
+            try:
+                request = json.loads(body or b"{}")
+                input_file = request["file"]
+                priority = int(request.get("priority", 0))
+            except (ValueError, KeyError, TypeError):
+                self._send_json(400, {"error": 'expected JSON {"file": "...", "priority": 0}'})
+                return
+            if not os.path.isfile(input_file):
+                self._send_json(400, {"error": f"{input_file} does not exist"})
+                return
+            job = queue.submit(input_file, priority)
+            pool.notify()
+            self._send_json(201, job)
+
+        def do_DELETE(self):
+            job_id = self._job_id(urlparse(self.path).path.rstrip("/"))
+            job = pool.cancel(job_id) if job_id is not None else None
+            if job is None:
+                self._send_json(404, {"error": "not found"})
+                return
+            self._send_json(200, job)
+
+        def log_message(self, format, *args):
+            pass
+
+    return JobHandler
+
+
+def serve(host=None, port=None, queue=None, pool=None):
+    """
+    Create the job API server (call serve_forever() on the result)
+    The worker pool must be started separately.
+    """
+    queue = queue or JobQueue(Config.JOBS_DB)
+    pool = pool or WorkerPool(queue)
+    return ThreadingHTTPServer((host or Config.SERVER_HOST, port or Config.SERVER_PORT), make_handler(queue, pool))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Lecture processing service with a persistent job queue")
+    parser.add_argument("--host", default=Config.SERVER_HOST)
+    parser.add_argument("--port", type=int, default=Config.SERVER_PORT)
+    parser.add_argument("--workers", type=int, help="Lectures processed at the same time")
+    parser.add_argument("--output-dir", help="Directory for reports and run state (default: ./output)")
+    args = parser.parse_args()
+
+    Config.require("transcription", "llm")
+    queue = JobQueue(Config.JOBS_DB)
+    requeued = queue.requeue_interrupted()
+    if requeued:
+        print(f"Requeued {requeued} jobs interrupted by the last shutdown")
+    pool = WorkerPool(queue, args.workers, args.output_dir)
+    pool.start()
+
+    server = serve(args.host, args.port, queue, pool)
+    print(f"Job server listening on http://{args.host}:{args.port}/jobs")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print("\nShutting down: running jobs will resume on the next start")
+    finally:
+        server.server_close()
+        pool.stop()
+        queue.close()
+
+if __name__ == "__main__":
+    main()
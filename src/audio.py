@@ -0,0 +1,231 @@
+import io
+import os
+import subprocess
+import wave
+
+# Encoder settings for each supported segment format (extension -> ffmpeg codec args)
+SEGMENT_CODECS = {
+    "flac": ["-c:a", "flac"],
+    "opus": ["-c:a", "libopus", "-b:a", "24k"],
+    "mp3": ["-c:a", "libmp3lame", "-q:a", "4"],
+    "wav": ["-c:a", "pcm_s16le"],
+}
+
+AUDIO_MIME_TYPES = {
+    ".flac": "audio/flac",
+    ".opus": "audio/ogg",
+    ".ogg": "audio/ogg",
+    ".mp3": "audio/mpeg",
+    ".m4a": "audio/mp4",
+    ".wav": "audio/wav",
+}
+
+
+def mime_type_for(path):
+    """Return the upload MIME type for an audio file based on its extension"""
+    return AUDIO_MIME_TYPES.get(os.path.splitext(path)[1].lower(), "application/octet-stream")
+
+
+def split_audio_file(input_file, output_dir, segment_length_sec=600, fmt="flac",
+                     sample_rate=16000, prefix="segment"):
+    """
+    Split an audio file into segments with a single ffmpeg decode pass
+    :param input_file: Path to input audio file (any format ffmpeg can read)
+    :param output_dir: Directory to write the segments to
+    :param segment_length_sec: Length of each segment in seconds
+    :param fmt: Segment format ("flac", "opus", "mp3", "wav") or "copy" to keep the source codec
+    :param sample_rate: Output sample rate in Hz (ignored for "copy")
+    :param prefix: Filename prefix for the segments
+    :return: Sorted list of created segment paths
+    """
+    os.makedirs(output_dir, exist_ok=True)
+
+    if fmt == "copy":
+        # Stream copy avoids decoding entirely; cuts land on the nearest packet
+        ext = os.path.splitext(input_file)[1].lstrip(".").lower() or "m4a"
+        codec_args = ["-c", "copy"]
+    else:
+        ext = fmt
+        codec_args = ["-ac", "1", "-ar", str(sample_rate)] + SEGMENT_CODECS[fmt]
+
+    pattern = os.path.join(output_dir, f"{prefix}_%03d.{ext}")
+    command = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+        "-i", input_file,
+        "-vn", "-map", "0:a:0",
+        *codec_args,
+        "-f", "segment",
+        "-segment_time", str(segment_length_sec),
+        "-reset_timestamps", "1",
+        pattern,
+    ]
+    subprocess.run(command, check=True, capture_output=True)
+
+    return sorted(
+        os.path.join(output_dir, name)
+        for name in os.listdir(output_dir)
+        if name.startswith(f"{prefix}_") and name.endswith(f".{ext}")
+    )
+
+
+def probe_duration(path):
+    """
+    Read the duration of an audio file from its container with ffprobe
+    :return: Duration in seconds, or None if ffprobe cannot tell
+    """
+    command = [
+        "ffprobe", "-v", "error",
+        "-show_entries", "format=duration",
+        "-of", "default=noprint_wrappers=1:nokey=1",
+        path,
+    ]
+    try:
+        result = subprocess.run(command, check=True, capture_output=True, text=True)
+        return float(result.stdout.strip())
+    except (OSError, subprocess.CalledProcessError, ValueError):
+        return None
+
+
+def convert_audio(input_file, output_file, fmt="mp3", sample_rate=None):
+    """
+    Transcode a whole audio file with ffmpeg
+    :param input_file: Path to input audio file
+    :param output_file: Path of the converted file
+    :param fmt: Output format (see SEGMENT_CODECS)
+    :param sample_rate: Resample to this rate in Hz (None keeps the source rate)
+    :return: Path of the converted file
+    """
+    rate_args = ["-ar", str(sample_rate)] if sample_rate else []
+    command = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+        "-i", input_file,
+        "-vn", *rate_args, *SEGMENT_CODECS[fmt],
+        output_file,
+    ]
+    subprocess.run(command, check=True, capture_output=True)
+    return output_file
+
+
+class PcmSegment:
+    """A decoded slice of mono 16-bit PCM audio"""
+
+    __slots__ = ("index", "start_sec", "pcm", "sample_rate")
+
+    def __init__(self, index, start_sec, pcm, sample_rate):
+        self.index = index
+        self.start_sec = start_sec
+        self.pcm = pcm
+        self.sample_rate = sample_rate
+
+    @property
+    def duration_sec(self):
+        return len(self.pcm) / (2 * self.sample_rate)
+
+    @property
+    def end_sec(self):
+        return self.start_sec + self.duration_sec
+
+    def to_wav_bytes(self):
+        """Wrap the PCM in a WAV container held in memory"""
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as wav_file:
+            wav_file.setnchannels(1)
+            wav_file.setsampwidth(2)
+            wav_file.setframerate(self.sample_rate)
+            wav_file.writeframes(self.pcm)
+        return buffer.getvalue()
+
+    def write_wav(self, path):
+        """Write the segment to a WAV file and return its path"""
+        with open(path, "wb") as f:
+            f.write(self.to_wav_bytes())
+        return path
+
+
+def _read_exact(stream, size):
+    """Read up to size bytes from a pipe, looping over short reads"""
+    chunks = []
+    remaining = size
+    while remaining > 0:
+        chunk = stream.read(remaining)
+        if not chunk:
+            break
+        chunks.append(chunk)
+        remaining -= len(chunk)
+    return b"".join(chunks)
+
+
+def _iter_wav_windows(input_file, window_bytes, sample_rate):
+    """Yield PCM windows from a WAV file; returns False if it needs resampling first"""
+    with wave.open(input_file, "rb") as wav_file:
+        if (wav_file.getnchannels(), wav_file.getsampwidth(), wav_file.getframerate()) != (1, 2, sample_rate):
+            return False
+        frames = window_bytes // 2
+        while True:
+            chunk = wav_file.readframes(frames)
+            if not chunk:
+                return True
+            yield chunk
+
+
+def iter_pcm_windows(input_file, window_sec=30, sample_rate=16000):
+    """
+    Stream decoded mono 16-bit PCM in fixed windows without loading the whole file
+    :param input_file: Path to input audio file
+    :param window_sec: Window length in seconds
+    :param sample_rate: Output sample rate in Hz
+    :return: Generator of PCM byte strings, each at most window_sec long
+    """
+    window_bytes = int(window_sec * sample_rate) * 2
+
+    if input_file.lower().endswith(".wav"):
+        try:
+            matched = yield from _iter_wav_windows(input_file, window_bytes, sample_rate)
+        except wave.Error:
+            matched = False
+        if matched:
+            return
+
+    command = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        "-i", input_file,
+        "-vn", "-ac", "1", "-ar", str(sample_rate),
+        "-f", "s16le", "pipe:1",
+    ]
+    process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            chunk = _read_exact(process.stdout, window_bytes)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+        process.wait()
+
+
+def iter_segments(input_file, segment_length_sec=600, sample_rate=16000, window_sec=30):
+    """
+    Stream an audio file as consecutive PCM segments
+    Peak memory is one segment plus one decode window, independent of file length.
+    :param input_file: Path to input audio file
+    :param segment_length_sec: Length of each segment in seconds
+    :param sample_rate: Output sample rate in Hz
+    :param window_sec: Decoder read size in seconds
+    :return: Generator of PcmSegment
+    """
+    segment_bytes = int(segment_length_sec * sample_rate) * 2
+    buffer = bytearray()
+    index = 0
+
+    for window in iter_pcm_windows(input_file, window_sec=window_sec, sample_rate=sample_rate):
+        buffer.extend(window)
+        while len(buffer) >= segment_bytes:
+            yield PcmSegment(index, index * segment_length_sec, bytes(buffer[:segment_bytes]), sample_rate)
+            del buffer[:segment_bytes]
+            index += 1
+
+    if buffer:
+        yield PcmSegment(index, index * segment_length_sec, bytes(buffer), sample_rate)
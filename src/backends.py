@@ -0,0 +1,125 @@
+import io
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+
+from src.config import Config
+from src.transcription import TranscriptionClient, TranscriptionError
+
+
+class TranscriptionBackend:
+    """
+    Interface for speech-to-text engines used by the pipeline
+    Implementations return a SiliconFlow-style response dict with at least a "text" key.
+    """
+
+    # Name of the model, part of the transcription cache key
+    model = None
+    # How many segments the pipeline should keep in flight for this backend
+    concurrency = 1
+
+    def transcribe(self, filename, audio_file, mime_type):
+        """
+        Transcribe one audio file
+        :param filename: Name of the audio file
+        :param audio_file: Binary file object positioned at the start of the audio
+        :param mime_type: MIME type of the audio
+        :return: Dict with a "text" key
+        """
+        raise NotImplementedError
+
+    @property
+    def segment_retries(self):
+        """Extra attempts the pipeline makes for a segment that failed with an unexpected error"""
+        return Config.TRANSCRIBE_RETRIES
+
+    def close(self):
+        pass
+
+
+class SiliconFlowBackend(TranscriptionClient, TranscriptionBackend):
+    """Remote SiliconFlow API (or any server speaking the same protocol, see asr_server.py)"""
+
+    @property
+    def concurrency(self):
+        return Config.TRANSCRIBE_CONCURRENCY
+
+    @property
+    def segment_retries(self):
+        # Each request already retries 429/5xx and connection errors with backoff
+        return 0
+
+
+# Model loaded once per worker process by _init_worker
+_worker_model = None
+
+
+def _init_worker(model_size, compute_type, cpu_threads):
+    global _worker_model
+    from faster_whisper import WhisperModel
+    _worker_model = WhisperModel(model_size, device="cpu", compute_type=compute_type, cpu_threads=cpu_threads)
+
+
+def _transcribe_in_worker(audio_bytes, language):
+    segments, info = _worker_model.transcribe(io.BytesIO(audio_bytes), language=language or None, beam_size=1)
+    text = " ".join(segment.text.strip() for segment in segments)
+    return {"text": text, "language": info.language, "duration": info.duration}
+
+
+class FasterWhisperBackend(TranscriptionBackend):
+    """
+    Offline CPU transcription with faster-whisper (CTranslate2, int8 by default)
+    Segments are spread over a pool of worker processes, each holding its own copy of
+    the model, so throughput scales with the number of cores. The pipeline keeps
+    `concurrency` segments in flight, one per worker.
+    Needs the optional faster-whisper package (see requirements.txt).
+    """
+
+    def __init__(self, model_size=None, workers=None, compute_type=None, language=None):
+        """
+        :param model_size: faster-whisper model name or path (defaults to Config.LOCAL_ASR_MODEL)
+        :param workers: Worker processes (defaults to Config.LOCAL_ASR_WORKERS)
+        :param compute_type: CTranslate2 compute type (defaults to Config.LOCAL_ASR_COMPUTE_TYPE)
+        :param language: Force a language code instead of auto-detection
+        """
+        self.model_size = model_size or Config.LOCAL_ASR_MODEL
+        self.workers = workers or Config.LOCAL_ASR_WORKERS
+        self.compute_type = compute_type or Config.LOCAL_ASR_COMPUTE_TYPE
+        self.language = language or Config.LOCAL_ASR_LANGUAGE
+        self.model = f"faster-whisper/{self.model_size}/{self.compute_type}"
+        self.concurrency = self.workers
+        # Split the cores between workers so they don't oversubscribe the CPU
+        cpu_threads = max(1, (os.cpu_count() or 1) // self.workers)
+        self.pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            initializer=_init_worker,
+            initargs=(self.model_size, self.compute_type, cpu_threads)
+        )
+
+    def transcribe(self, filename, audio_file, mime_type):
+        try:
+            return self.pool.submit(_transcribe_in_worker, audio_file.read(), self.language).result()
+        except Exception as e:
+            raise TranscriptionError(f"Local transcription of {filename} failed: {str(e)}")
+
+    def close(self):
+        self.pool.shutdown()
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_transcription_backend():
+    """Return the process-wide backend selected by Config.ASR_BACKEND"""
+    global _backend
+    with _backend_lock:
+        if _backend is None:
+            Config.require("transcription")
+            if Config.ASR_BACKEND == "siliconflow":
+                _backend = SiliconFlowBackend()
+            elif Config.ASR_BACKEND == "faster-whisper":
+                _backend = FasterWhisperBackend()
+            else:
+                raise ValueError(f"Unknown ASR_BACKEND: {Config.ASR_BACKEND}")
+        return _backend
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+from src.audio import PcmSegment, iter_pcm_windows
+
+
+class DiskCache:
+    """
+    Persistent key/value cache stored in SQLite with size-bounded LRU eviction
+    Values are JSON-serialisable objects; safe to share between threads.
+    """
+
+    def __init__(self, path, max_bytes=512 * 1024 * 1024, ttl_sec=None):
+        """
+        :param path: Path to the SQLite database file
+        :param max_bytes: Total size of stored values before least-recently-used entries are evicted
+        :param ttl_sec: Entries older than this are treated as missing (None keeps them until evicted)
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.ttl_sec = ttl_sec
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, "
+            "created REAL NOT NULL, accessed REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries(accessed)")
+        self._conn.commit()
+
+    def get(self, key):
+        """Return the cached value for key, or None on a miss"""
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT value, created FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is not None and self.ttl_sec and now - row[1] > self.ttl_sec:
+                self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self._conn.commit()
+                row = None
+            if row is None:
+                self.misses += 1
+                return None
+            self._conn.execute("UPDATE entries SET accessed = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+            self.hits += 1
+            return json.loads(row[0])
+
+    def set(self, key, value):
+        """Store value under key and evict old entries if the cache is over budget"""
+        data = json.dumps(value, ensure_ascii=False)
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                (key, data, len(data.encode("utf-8")), now, now)
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        if self.ttl_sec:
+            self._conn.execute("DELETE FROM entries WHERE created < ?", (time.time() - self.ttl_sec,))
+        total = self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        for key, size in self._conn.execute("SELECT key, size FROM entries ORDER BY accessed").fetchall():
+            self._conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+            total -= size
+            if total <= self.max_bytes:
+                break
+
+    def stats(self):
+        """Return hit/miss counters and current size"""
+        with self._lock:
+            entries, size = self._conn.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM entries"
+            ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def audio_fingerprint(audio):
+    """
+    Hash the decoded PCM of an audio segment
+    Keys depend on the audio content only, not on the container or encoder settings.
+    :param audio: File path, PcmSegment, or file-like object (hashed as raw bytes)
+    """
+    digest = hashlib.sha256()
+    if isinstance(audio, PcmSegment):
+        digest.update(audio.pcm)
+    elif isinstance(audio, str):
+        for window in iter_pcm_windows(audio):
+            digest.update(window)
+    else:
+        audio.seek(0)
+        for block in iter(lambda: audio.read(1024 * 1024), b""):
+            digest.update(block)
+        audio.seek(0)
+    return digest.hexdigest()
+
+
+def transcription_key(audio, model):
+    """Cache key for a transcription of an audio segment by the given ASR model"""
+    return f"asr:{model}:{audio_fingerprint(audio)}"
+
+
+def prompt_key(model, system_prompt, user_content):
+    """Cache key for a chat completion of one system prompt and user message by the given model"""
+    digest = hashlib.sha256()
+    for part in (system_prompt, user_content):
+        data = part.encode("utf-8")
+        # Length-prefix each part so different splits of the same text get different keys
+        digest.update(len(data).to_bytes(8, "big"))
+        digest.update(data)
+    return f"llm:{model}:{digest.hexdigest()}"
@@ -1,4 +1,5 @@
 import os
+import importlib.util
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -12,24 +13,107 @@ class Config:
     # Application Settings
     DEBUG = os.getenv('DEBUG', 'False').lower() == 'true'
     ENVIRONMENT = os.getenv('ENVIRONMENT', 'development')
+    # Audio Settings
+    SEGMENT_FORMAT = os.getenv('SEGMENT_FORMAT', 'flac')
+    SEGMENT_LENGTH_SEC = int(os.getenv('SEGMENT_LENGTH_SEC', '600'))
+    # Parent directory for per-run scratch space (empty = system temp dir, /dev/shm = tmpfs)
+    SCRATCH_DIR = os.getenv('SCRATCH_DIR', '')
+    # Upload segments from memory buffers instead of scratch files (fixed-length cuts only)
+    IN_MEMORY_SEGMENTS = os.getenv('IN_MEMORY_SEGMENTS', 'False').lower() == 'true'
+    SILENCE_AWARE_SPLIT = os.getenv('SILENCE_AWARE_SPLIT', 'True').lower() == 'true'
+    SILENCE_THRESHOLD_DB = float(os.getenv('SILENCE_THRESHOLD_DB', '-40'))
+    SPLIT_TOLERANCE_SEC = float(os.getenv('SPLIT_TOLERANCE_SEC', '30'))
+    MAX_SILENCE_SEC = float(os.getenv('MAX_SILENCE_SEC', '10'))
+    # Transcription Settings
+    SILICON_FLOW_URL = os.getenv('SILICON_FLOW_URL', 'https://api.siliconflow.cn/v1/audio/transcriptions')
+    SILICON_FLOW_MODEL = os.getenv('SILICON_FLOW_MODEL', 'FunAudioLLM/SenseVoiceSmall')
+    TRANSCRIBE_CONCURRENCY = int(os.getenv('TRANSCRIBE_CONCURRENCY', '4'))
+    TRANSCRIBE_RETRIES = int(os.getenv('TRANSCRIBE_RETRIES', '3'))
+    TRANSCRIBE_BACKOFF_SEC = float(os.getenv('TRANSCRIBE_BACKOFF_SEC', '2'))
+    # ASR backend: "siliconflow" (remote API) or "faster-whisper" (local CPU)
+    ASR_BACKEND = os.getenv('ASR_BACKEND', 'siliconflow')
+    LOCAL_ASR_MODEL = os.getenv('LOCAL_ASR_MODEL', 'small')
+    LOCAL_ASR_COMPUTE_TYPE = os.getenv('LOCAL_ASR_COMPUTE_TYPE', 'int8')
+    LOCAL_ASR_WORKERS = int(os.getenv('LOCAL_ASR_WORKERS', str(max(1, (os.cpu_count() or 2) // 2))))
+    LOCAL_ASR_LANGUAGE = os.getenv('LOCAL_ASR_LANGUAGE', '')
+    # HTTP Settings for the transcription API
+    HTTP_CONNECT_TIMEOUT_SEC = float(os.getenv('HTTP_CONNECT_TIMEOUT_SEC', '10'))
+    HTTP_READ_TIMEOUT_SEC = float(os.getenv('HTTP_READ_TIMEOUT_SEC', '300'))
+    HTTP_MAX_RETRIES = int(os.getenv('HTTP_MAX_RETRIES', '4'))
+    CIRCUIT_FAILURE_THRESHOLD = int(os.getenv('CIRCUIT_FAILURE_THRESHOLD', '5'))
+    CIRCUIT_RESET_SEC = float(os.getenv('CIRCUIT_RESET_SEC', '60'))
+    # LLM Settings
+    DEEPSEEK_BASE_URL = os.getenv('DEEPSEEK_BASE_URL', 'https://api.deepseek.com')
+    DEEPSEEK_MODEL = os.getenv('DEEPSEEK_MODEL', 'deepseek-chat')
+    LLM_TIMEOUT_SEC = float(os.getenv('LLM_TIMEOUT_SEC', '300'))
+    LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', '3'))
+    LLM_CHUNK_TOKENS = int(os.getenv('LLM_CHUNK_TOKENS', '6000'))
+    LLM_CONCURRENCY = int(os.getenv('LLM_CONCURRENCY', '4'))
+    LLM_STREAM = os.getenv('LLM_STREAM', 'True').lower() == 'true'
+    # Seconds a pass waits for another pass over the same chunk to warm the provider's prefix cache (0 = no wait)
+    LLM_PREFIX_WAIT_SEC = float(os.getenv('LLM_PREFIX_WAIT_SEC', '5'))
+    # Rate Limits (per minute, shared by all pipelines in a process, 0 = unlimited)
+    SILICON_FLOW_RPM = int(os.getenv('SILICON_FLOW_RPM', '60'))
+    SILICON_FLOW_AUDIO_SEC_PER_MIN = int(os.getenv('SILICON_FLOW_AUDIO_SEC_PER_MIN', '0'))
+    DEEPSEEK_RPM = int(os.getenv('DEEPSEEK_RPM', '60'))
+    DEEPSEEK_TPM = int(os.getenv('DEEPSEEK_TPM', '0'))
+    # Batch Settings
+    BATCH_SPLIT_WORKERS = int(os.getenv('BATCH_SPLIT_WORKERS', str(os.cpu_count() or 2)))
+    BATCH_LECTURE_CONCURRENCY = int(os.getenv('BATCH_LECTURE_CONCURRENCY', '2'))
+    # Job Server Settings (lectures processed at once by the warm worker pool)
+    SERVER_HOST = os.getenv('SERVER_HOST', '127.0.0.1')
+    SERVER_PORT = int(os.getenv('SERVER_PORT', '8800'))
+    SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', '2'))
+    JOBS_DB = os.getenv('JOBS_DB', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'output', 'jobs.sqlite3'))
+    # Live Mode Settings (shorter segments so text arrives while the lecture is running)
+    LIVE_SEGMENT_SEC = float(os.getenv('LIVE_SEGMENT_SEC', '60'))
+    LIVE_TOLERANCE_SEC = float(os.getenv('LIVE_TOLERANCE_SEC', '10'))
+    LIVE_IDLE_TIMEOUT_SEC = float(os.getenv('LIVE_IDLE_TIMEOUT_SEC', '30'))
+    # Metrics Settings
+    METRICS_PROMETHEUS = os.getenv('METRICS_PROMETHEUS', 'False').lower() == 'true'
+    # Cache Settings
+    CACHE_DIR = os.getenv('CACHE_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'output', 'cache'))
+    TRANSCRIPTION_CACHE = os.getenv('TRANSCRIPTION_CACHE', 'True').lower() == 'true'
+    TRANSCRIPTION_CACHE_MAX_MB = int(os.getenv('TRANSCRIPTION_CACHE_MAX_MB', '256'))
+    LLM_CACHE = os.getenv('LLM_CACHE', 'True').lower() == 'true'
+    LLM_CACHE_MAX_MB = int(os.getenv('LLM_CACHE_MAX_MB', '128'))
+    LLM_CACHE_TTL_DAYS = float(os.getenv('LLM_CACHE_TTL_DAYS', '30'))
+    # Search Settings (full-text index of the reports, updated as each one is written)
+    SEARCH_INDEX = os.getenv('SEARCH_INDEX', 'True').lower() == 'true'
+    SEARCH_INDEX_PATH = os.getenv('SEARCH_INDEX_PATH', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'output', 'search.sqlite3'))
+    # Report Sections Settings (assemble reports from content-addressed section blobs)
+    REPORT_SECTIONS = os.getenv('REPORT_SECTIONS', 'True').lower() == 'true'
+    SECTIONS_DIR = os.getenv('SECTIONS_DIR', os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'output', 'sections'))
 
     @classmethod
-    def validate(cls):
-        """Validate that all required environment variables are set."""
-        missing_vars = []
-        
-        if not cls.OPENAI_API_KEY:
-            missing_vars.append('OPENAI_API_KEY')
-        if not cls.SILICON_FLOW_API_KEY:
-            missing_vars.append('SILICON_FLOW_API_KEY')
-        if not cls.DEEPSEEK_API_KEY:
-            missing_vars.append('DEEPSEEK_API_KEY')
+    def require(cls, *capabilities):
+        """
+        Validate the environment variables needed by the given capabilities only
+        Stages call this when they first need a key, so e.g. the summary enhancer runs
+        without transcription credentials.
+        :param capabilities: Any of "transcription" and "llm"
+        """
+        required = {
+            # The local engine needs no credentials
+            'transcription': ['SILICON_FLOW_API_KEY'] if cls.ASR_BACKEND == 'siliconflow' else [],
+            'llm': ['DEEPSEEK_API_KEY'],
+        }
+        missing_vars = [name for capability in capabilities for name in required[capability] if not getattr(cls, name)]
         
         if missing_vars:
             raise ValueError(
                 f"Missing required environment variables: {', '.join(missing_vars)}. "
                 "Please check your .env file."
             )
+        # Checked here so a missing package stops the run before any segment is attempted
+        if 'transcription' in capabilities and cls.ASR_BACKEND == 'faster-whisper' \
+                and importlib.util.find_spec('faster_whisper') is None:
+            raise ValueError(
+                "ASR_BACKEND=faster-whisper needs the optional faster-whisper package. "
+                "Install it with: pip install faster-whisper"
+            )
 
-# Validate configuration on import
-Config.validate() 
\ No newline at end of file
+    @classmethod
+    def validate(cls):
+        """Validate that the environment variables for every capability are set."""
+        cls.require('transcription', 'llm')
\ No newline at end of file
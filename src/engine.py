@@ -0,0 +1,470 @@
+import os
+import asyncio
+import shutil
+import tempfile
+
+from src.config import Config
+from src.audio import convert_audio, split_audio_file, iter_segments, probe_duration
+from src.cache import DiskCache, transcription_key
+from src.metrics import RunMetrics
+from src.ratelimit import rate_share
+from src.report import report_parts
+from src.transcript import Transcript, TranscriptSegment
+from src.transcription import transcribe_segments, transcribe_stream, open_segment, TranscriptionError
+from src.backends import get_transcription_backend
+from src.enhancement import (
+    enhance_paragraphs, chunk_transcript, run_chunked_enhancements, run_chunked_prompt, run_until_stopped,
+    OrderedStreamWriter
+)
+
+
+class RunContext:
+    """
+    Resources shared by the stages of one run
+    Scratch space, the transcription backend and the transcription cache are created on
+    first use, so a front-end that runs only some stages never pays for the others.
+    """
+
+    def __init__(self, name, metrics=None, scratch_prefix="lecture-", cancel_event=None):
+        """
+        :param name: Name of the run, usually the recording's file name
+        :param metrics: RunMetrics to record into (a new one is created if omitted)
+        :param scratch_prefix: Prefix of the scratch directory name
+        :param cancel_event: Optional threading.Event; once set, no new stage or segment is started
+        """
+        self.name = name
+        self.metrics = metrics or RunMetrics(name)
+        self.scratch_prefix = scratch_prefix
+        self.cancel_event = cancel_event
+        self.temp_dir = None
+        self._backend = None
+        self._cache = None
+        self._cache_opened = False
+
+    @property
+    def backend(self):
+        """The process-wide transcription backend (SiliconFlow API or a local engine)"""
+        if self._backend is None:
+            self._backend = get_transcription_backend()
+        return self._backend
+
+    @property
+    def cancelled(self):
+        """True once the run has been asked to stop"""
+        return self.cancel_event is not None and self.cancel_event.is_set()
+
+    @property
+    def transcription_cache(self):
+        """DiskCache of transcriptions by audio content, or None if disabled"""
+        if not self._cache_opened:
+            self._cache_opened = True
+            if Config.TRANSCRIPTION_CACHE:
+                self._cache = DiskCache(
+                    os.path.join(Config.CACHE_DIR, "transcriptions.sqlite3"),
+                    max_bytes=Config.TRANSCRIPTION_CACHE_MAX_MB * 1024 * 1024
+                )
+        return self._cache
+
+    def scratch_dir(self):
+        """
+        Return this run's private scratch directory, creating it on first use
+        It is unique per run (under SCRATCH_DIR, e.g. /dev/shm for tmpfs), so concurrent
+        runs never share or delete each other's files.
+        """
+        if self.temp_dir is None:
+            self.temp_dir = tempfile.mkdtemp(prefix=self.scratch_prefix, dir=Config.SCRATCH_DIR or None)
+        return self.temp_dir
+
+    def cleanup(self):
+        """Remove the scratch directory"""
+        if self.temp_dir and os.path.exists(self.temp_dir):
+            shutil.rmtree(self.temp_dir)
+        self.temp_dir = None
+
+
+class Stage:
+    """
+    One step of a lecture run
+    A stage receives the previous stage's output in memory and returns its own, so stages
+    chain without intermediate files. Subclasses set name (also the metrics span) and
+    implement run(); returning None or an empty result means the run cannot continue.
+    A cancelled run starts no further stages.
+
+    ConvertStage:         audio path -> converted audio path
+    SplitStage:           audio path -> segment records
+    TranscribeStage:      segment records -> Transcript
+    StreamTranscribeStage: audio path -> Transcript
+    EnhanceStage:         Transcript -> {"concept", "correction"}
+    PromptStage:          paragraphs -> one output per chunk
+    """
+
+    name = None
+
+    def run(self, context, data):
+        raise NotImplementedError
+
+    def __call__(self, context, data):
+        if context.cancelled:
+            return None
+        with context.metrics.span(self.name):
+            return self.run(context, data)
+
+
+def run_stages(context, stages, data):
+    """
+    Run stages in order, handing each output to the next
+    :return: Output of the last stage, or None as soon as a stage produces nothing
+    """
+    for stage in stages:
+        data = stage(context, data)
+        if not data:
+            return None
+    return data
+
+
+def fetch_transcription(backend, audio, cache=None, metrics=None):
+    """
+    Transcribe one segment, answering from the cache when the same audio was seen before
+    :param backend: TranscriptionBackend
+    :param audio: Segment file path, PcmSegment or file-like object such as BytesIO
+    :param cache: Optional DiskCache keyed by audio content and model
+    :param metrics: Optional RunMetrics counting cache hits and uploaded bytes
+    :return: Response dict with a "text" key
+    """
+    cache_key = None
+    if cache:
+        cache_key = transcription_key(audio, backend.model)
+        cached = cache.get(cache_key)
+        if cached is not None:
+            if metrics:
+                metrics.add("transcription_cache_hits")
+            return cached
+
+    with open_segment(audio) as (filename, audio_file, mime_type):
+        if metrics:
+            start = audio_file.tell()
+            metrics.add("bytes_uploaded", audio_file.seek(0, os.SEEK_END) - start)
+            audio_file.seek(start)
+        result = backend.transcribe(filename, audio_file, mime_type)
+
+    if cache_key:
+        cache.set(cache_key, result)
+    return result
+
+
+def transcribe_text(context, audio):
+    """
+    Transcribe one segment for a run
+    A TranscriptionError from the backend propagates, so the caller does not retry a
+    segment the backend has given up on (see transcribe_with_retry).
+    :return: Its text, or None if it failed otherwise
+    """
+    try:
+        result = fetch_transcription(context.backend, audio, context.transcription_cache, context.metrics)
+        return result.get('text', '')
+    except TranscriptionError:
+        raise
+    except Exception as e:
+        print(f"Error transcribing segment: {str(e)}")
+        return None
+
+
+class ConvertStage(Stage):
+    """Transcode the recording, e.g. M4A to MP3 for tools that need it"""
+
+    name = "convert"
+
+    def __init__(self, fmt="mp3", output_file=None):
+        """
+        :param fmt: Output format (see src.audio.SEGMENT_CODECS)
+        :param output_file: Where to write the result (defaults to the run's scratch directory)
+        """
+        self.fmt = fmt
+        self.output_file = output_file
+
+    def run(self, context, input_file):
+        try:
+            output_file = self.output_file or os.path.join(context.scratch_dir(), f"converted.{self.fmt}")
+            convert_audio(input_file, output_file, fmt=self.fmt)
+            print(f"Converted {input_file} to {self.fmt.upper()}")
+            return output_file
+        except Exception as e:
+            print(f"Error converting file: {str(e)}")
+            return None
+
+
+class SplitStage(Stage):
+    """Split a recording into upload-ready segments, decoding the source only once"""
+
+    name = "split"
+
+    def __init__(self, segment_length_sec=None, fmt=None, silence_aware=None, output_dir=None, prefix="segment"):
+        """
+        :param segment_length_sec: Length of each segment (defaults to Config.SEGMENT_LENGTH_SEC)
+        :param fmt: Segment format (defaults to Config.SEGMENT_FORMAT)
+        :param silence_aware: Cut in pauses and drop dead air (defaults to Config.SILENCE_AWARE_SPLIT)
+        :param output_dir: Where to write segments (defaults to the run's scratch directory)
+        :param prefix: Filename prefix for the segments
+        """
+        self.segment_length_sec = segment_length_sec or Config.SEGMENT_LENGTH_SEC
+        self.fmt = fmt or Config.SEGMENT_FORMAT
+        self.silence_aware = Config.SILENCE_AWARE_SPLIT if silence_aware is None else silence_aware
+        self.output_dir = output_dir
+        self.prefix = prefix
+
+    def run(self, context, input_file):
+        """
+        :return: Segment records (dicts with index, path, start_sec, end_sec and text=None)
+        """
+        output_dir = self.output_dir or context.scratch_dir()
+        try:
+            if self.silence_aware:
+                # Cut in pauses near each boundary and drop dead air (imported here: loads numpy)
+                from src.silence import split_on_silence
+                planned = split_on_silence(
+                    input_file,
+                    output_dir,
+                    segment_length_sec=self.segment_length_sec,
+                    fmt=self.fmt,
+                    tolerance_sec=Config.SPLIT_TOLERANCE_SEC,
+                    silence_db=Config.SILENCE_THRESHOLD_DB,
+                    max_silence_sec=Config.MAX_SILENCE_SEC,
+                    prefix=self.prefix
+                )
+                kept_sec = sum(end - start for _, start, end in planned)
+                print(f"Split audio into {len(planned)} segments ({kept_sec:.0f}s of speech kept)")
+            else:
+                paths = split_audio_file(
+                    input_file,
+                    output_dir,
+                    segment_length_sec=self.segment_length_sec,
+                    fmt=self.fmt,
+                    prefix=self.prefix
+                )
+                # Offsets come from the segments' real durations: the last one is usually short,
+                # and stream-copied cuts land on packet boundaries
+                planned = []
+                start = 0.0
+                for path in paths:
+                    duration = probe_duration(path)
+                    end = start + (duration if duration is not None else self.segment_length_sec)
+                    planned.append((path, start, end))
+                    start = end
+                print(f"Split audio into {len(planned)} segments")
+            return [
+                {"index": i, "path": path, "start_sec": start, "end_sec": end, "text": None}
+                for i, (path, start, end) in enumerate(planned)
+            ]
+        except Exception as e:
+            print(f"Error splitting audio: {str(e)}")
+            return []
+
+
+class TranscribeStage(Stage):
+    """Transcribe every segment record that has no text yet, concurrently"""
+
+    name = "transcribe"
+
+    def __init__(self, on_transcribed=None):
+        """
+        :param on_transcribed: Called with (index, text) after each successful segment, e.g. to checkpoint it
+        """
+        self.on_transcribed = on_transcribed
+
+    def run(self, context, segments):
+        """
+        :param segments: Segment records; those with a text (from an earlier run) are kept as they are
+        :return: Transcript of all segments, with text None for the ones that failed
+        """
+        texts = {segment["index"]: segment.get("text") for segment in segments}
+        pending = [segment for segment in segments if segment.get("text") is None]
+        if not pending:
+            print("\nAll segments already transcribed, skipping transcription")
+            return Transcript.from_dicts(segments, context.name)
+
+        def transcribe_and_record(segment):
+            audio_sec = segment["end_sec"] - segment["start_sec"]
+            with context.metrics.span("transcribe_segment", index=segment["index"], audio_sec=audio_sec) as span, \
+                    rate_share(context.name, audio_sec):
+                span["ok"] = False
+                text = transcribe_text(context, segment["path"])
+                span["ok"] = text is not None
+            if text is not None:
+                texts[segment["index"]] = text
+                context.metrics.add("audio_seconds", audio_sec)
+                if self.on_transcribed:
+                    self.on_transcribed(segment["index"], text)
+            return text
+
+        print(f"\nTranscribing {len(pending)} segments ({context.backend.concurrency} at a time)...")
+        transcribe_segments(
+            transcribe_and_record,
+            pending,
+            max_workers=context.backend.concurrency,
+            retries=context.backend.segment_retries,
+            backoff_sec=Config.TRANSCRIBE_BACKOFF_SEC,
+            stop_event=context.cancel_event
+        )
+        if context.transcription_cache:
+            stats = context.transcription_cache.stats()
+            print(f"Transcription cache: {stats['hits']} hits, {stats['misses']} misses")
+        return Transcript.from_dicts(
+            ({**segment, "text": texts[segment["index"]]} for segment in segments), context.name
+        )
+
+
+class StreamTranscribeStage(Stage):
+    """
+    Decode, split and transcribe in one streaming pass without writing segments to disk
+    Segments are uploaded from in-memory WAV buffers (fixed-length cuts only).
+    """
+
+    name = "split_and_transcribe"
+
+    def __init__(self, on_segment=None, on_transcribed=None):
+        """
+        :param on_segment: Called with (index, start_sec, end_sec) for each decoded segment; may return
+                           the segment's text from an earlier run to skip the upload
+        :param on_transcribed: Called with (index, text) after each successful segment
+        """
+        self.on_segment = on_segment
+        self.on_transcribed = on_transcribed
+
+    def run(self, context, input_file):
+        records = []
+
+        def record_and_transcribe(segment):
+            with context.metrics.span("transcribe_segment", index=segment.index, audio_sec=segment.duration_sec) as span, \
+                    rate_share(context.name, segment.duration_sec):
+                span["ok"] = False
+                text = transcribe_text(context, segment)
+                span["ok"] = text is not None
+            if text is not None:
+                records[segment.index].text = text
+                context.metrics.add("audio_seconds", segment.duration_sec)
+                if self.on_transcribed:
+                    self.on_transcribed(segment.index, text)
+            return text
+
+        def pending():
+            for segment in iter_segments(input_file, segment_length_sec=Config.SEGMENT_LENGTH_SEC):
+                known = self.on_segment(segment.index, segment.start_sec, segment.end_sec) if self.on_segment else None
+                records.append(TranscriptSegment(segment.index, segment.start_sec, segment.end_sec, known))
+                if known is None:
+                    yield segment
+
+        print(f"\nStreaming and transcribing segments ({context.backend.concurrency} at a time)...")
+        transcribe_stream(
+            record_and_transcribe,
+            pending(),
+            max_workers=context.backend.concurrency,
+            retries=context.backend.segment_retries,
+            backoff_sec=Config.TRANSCRIBE_BACKOFF_SEC,
+            stop_event=context.cancel_event
+        )
+        return Transcript(records, context.name)
+
+
+class EnhanceStage(Stage):
+    """
+    Correct and concept-summarise a transcript; both passes run concurrently, map-reduced when long
+    Cancelling the run abandons the LLM calls in flight, not just the ones still queued.
+    """
+
+    name = "enhance"
+
+    def __init__(self, out=None, include_failed=True):
+        """
+        :param out: Open report file to stream the report body into as tokens arrive
+                    (frontmatter must already be written); None just returns the results
+        :param include_failed: Send placeholders for segments that could not be transcribed; pass
+                               False when the report notes the gaps itself
+        """
+        self.out = out
+        self.include_failed = include_failed
+
+    def run(self, context, transcript):
+        """
+        :return: Dict with "concept" and "correction" outputs, or None on failure
+        """
+        paragraphs = transcript.paragraphs(failed=self.include_failed)
+        if self.out is not None:
+            return self._stream(context, paragraphs)
+        try:
+            with rate_share(context.name):
+                return enhance_paragraphs(paragraphs, metrics=context.metrics, stop_event=context.cancel_event)
+        except Exception as e:
+            print(f"Error enhancing summary: {str(e)}")
+            return None
+
+    def _stream(self, context, paragraphs):
+        """Stream the report body in document order; whatever was generated before a failure is kept"""
+        chunks = chunk_transcript(paragraphs, Config.LLM_CHUNK_TOKENS)
+        corrections = [f"correction-{i}" for i in range(1, len(chunks) + 1)]
+        header, divider, footer = report_parts()
+        writer = OrderedStreamWriter(self.out, ["header", "concept", "divider", *corrections, "footer"])
+        writer.write("header", header)
+        writer.finish("header")
+        writer.write("divider", divider)
+        writer.finish("divider")
+        for section in corrections[1:]:
+            writer.write(section, "\n\n---\n\n")
+        try:
+            with rate_share(context.name):
+                coro = run_chunked_enhancements(paragraphs, writer=writer, metrics=context.metrics)
+                if context.cancel_event is not None:
+                    coro = run_until_stopped(coro, context.cancel_event)
+                results = asyncio.run(coro)
+            writer.write("footer", footer)
+            writer.finish("footer")
+        except Exception as e:
+            print(f"Error enhancing summary: {str(e)}")
+            return None
+        finally:
+            writer.close()
+        if writer.first_write_sec is not None:
+            print(f"Report text started streaming after {writer.first_write_sec:.1f}s")
+        return results
+
+
+class PromptStage(Stage):
+    """Apply one prompt to a long text chunk by chunk, in parallel"""
+
+    name = "enhance"
+
+    def __init__(self, system_prompt, template, out=None, separator="\n\n---\n\n"):
+        """
+        :param system_prompt: System message
+        :param template: User message template with a {text} placeholder
+        :param out: Open file to stream the outputs into in document order (None just returns them)
+        :param separator: Written between the outputs of consecutive chunks
+        """
+        self.system_prompt = system_prompt
+        self.template = template
+        self.out = out
+        self.separator = separator
+
+    def run(self, context, paragraphs):
+        """
+        :param paragraphs: Ordered paragraphs of the input text
+        :return: Outputs in chunk order
+        """
+        if self.out is None:
+            with rate_share(context.name):
+                return asyncio.run(run_chunked_prompt(
+                    self.system_prompt, self.template, paragraphs, metrics=context.metrics
+                ))
+        parts = [f"part-{i}" for i in range(1, len(chunk_transcript(paragraphs, Config.LLM_CHUNK_TOKENS)) + 1)]
+        writer = OrderedStreamWriter(self.out, parts)
+        for section in parts[1:]:
+            writer.write(section, self.separator)
+        try:
+            with rate_share(context.name):
+                outputs = asyncio.run(run_chunked_prompt(
+                    self.system_prompt, self.template, paragraphs, writer=writer, metrics=context.metrics
+                ))
+        finally:
+            writer.close()
+        if writer.first_write_sec is not None:
+            print(f"Output started streaming after {writer.first_write_sec:.1f}s")
+        return outputs
@@ -0,0 +1,610 @@
+import asyncio
+import hashlib
+import os
+import re
+import threading
+import time
+from src.config import Config
+from src.ratelimit import get_limiter
+from src.cache import DiskCache, prompt_key
+
+# Shared by every pass over a transcript. The provider caches prompt prefixes, so every
+# request starts with this system message and the transcript, and the task comes last:
+# the concept and correction passes over the same chunk then share one cached prefix.
+LECTURE_SYSTEM_PROMPT = """You are an expert assistant for academic lecture notes. The user message starts with a lecture transcript between <transcript> tags, followed by the task to perform on it. Follow the task's instructions and format requirements exactly."""
+
+# Transcript first, instructions after it
+TRANSCRIPT_TEMPLATE = "<transcript>\n{text}\n</transcript>\n\n"
+
+# Task for concept summarization
+CONCEPT_PROMPT = """Task: create a comprehensive concept summary of the lecture transcript above in Markdown format. Please:
+
+1. Extract and organize the main concepts and key ideas
+2. Identify the relationships between different concepts
+3. Highlight important definitions and terminology
+4. Create a clear hierarchy of ideas
+5. Include examples and applications where relevant
+6. Add cross-references between related concepts
+7. Identify the main learning objectives
+8. Note any practical applications or real-world connections
+
+Format requirements:
+- Use # for the main title
+- Use ## for major concept categories
+- Use ### for sub-concepts
+- Use bullet points (- or *) for key points
+- Use **bold** for important terms and definitions
+- Use > for key concepts and definitions
+- Use `code` for technical terms
+- Add a concept map or outline at the beginning
+- Include a glossary of key terms at the end
+- Use horizontal rules (---) between major concept sections
+
+Please ensure the output is in perfect Markdown format with clear concept organization."""
+
+# Task for transcription correction
+CORRECTION_PROMPT = """Task: correct and improve the lecture transcription above while maintaining its original meaning. Please:
+
+1. Fix any transcription errors and unclear sentences
+2. Correct grammar and punctuation
+3. Improve sentence structure and flow
+4. Remove filler words and redundant phrases
+5. Fix technical term misspellings
+6. Add proper paragraph breaks
+7. Maintain the original lecture's tone and style
+8. Preserve important pauses and emphasis
+
+Format requirements:
+- Use # for the main title
+- Use ## for major sections
+- Use ### for subsections
+- Use proper paragraph spacing
+- Use **bold** for emphasis on corrected terms
+- Use > for important quotes
+- Each transcript segment starts with its time range in brackets, e.g. [0:10:00 – 0:19:58]; keep these as section markers and never invent other timestamps
+- Where a segment is marked as not transcribed, note the gap instead of filling it in
+- Include a note about major corrections
+- Use horizontal rules (---) between major sections
+
+Please ensure the output is in perfect Markdown format with clear corrections and improvements."""
+
+# Enhancement passes: name -> (system prompt, user message template)
+PROMPT_VARIANTS = {
+    "concept": (LECTURE_SYSTEM_PROMPT, TRANSCRIPT_TEMPLATE + CONCEPT_PROMPT),
+    "correction": (LECTURE_SYSTEM_PROMPT, TRANSCRIPT_TEMPLATE + CORRECTION_PROMPT),
+}
+
+
+def create_async_client():
+    """Create a DeepSeek client whose HTTP connection pool is shared by all concurrent calls"""
+    from openai import AsyncOpenAI
+
+    Config.require("llm")
+    return AsyncOpenAI(
+        api_key=Config.DEEPSEEK_API_KEY,
+        base_url=Config.DEEPSEEK_BASE_URL,
+        timeout=Config.LLM_TIMEOUT_SEC,
+        max_retries=Config.LLM_MAX_RETRIES
+    )
+
+
+def estimate_request_tokens(system_prompt, user_content):
+    """Tokens reserved before a call is sent: the prompt plus a completion about as long as the user message"""
+    return estimate_tokens(system_prompt) + 2 * estimate_tokens(user_content)
+
+
+async def reserve_llm_call(estimated, metrics=None):
+    """Wait for the DeepSeek request and token budgets (fair across lectures)"""
+    waited = await get_limiter("deepseek").acquire_async(estimated)
+    if metrics and waited:
+        metrics.add("llm_rate_limit_wait_sec", waited)
+
+
+def settle_llm_call(estimated, usage):
+    """Correct the token budget once the API has reported the call's actual usage"""
+    if usage is None:
+        return
+    total = usage.get("total_tokens") if isinstance(usage, dict) else getattr(usage, "total_tokens", None)
+    if total:
+        get_limiter("deepseek").adjust(total - estimated)
+
+
+async def complete(client, system_prompt, user_content, model=None, metrics=None, section=None):
+    """
+    Run a single chat completion and return the message text
+    :param client: AsyncOpenAI client
+    :param system_prompt: System message
+    :param user_content: User message
+    :param model: Model name (defaults to Config.DEEPSEEK_MODEL)
+    :param metrics: Optional RunMetrics to record latency and token usage in
+    :param section: Label for the call in metrics
+    """
+    estimated = estimate_request_tokens(system_prompt, user_content)
+    await reserve_llm_call(estimated, metrics)
+    started = time.perf_counter()
+    response = await client.chat.completions.create(
+        model=model or Config.DEEPSEEK_MODEL,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content},
+        ],
+        stream=False
+    )
+    settle_llm_call(estimated, response.usage)
+    if metrics:
+        metrics.record_llm_call(section, time.perf_counter() - started, response.usage)
+    return response.choices[0].message.content
+
+
+async def stream_complete(client, system_prompt, user_content, on_delta, model=None, metrics=None, section=None):
+    """
+    Run a chat completion with streaming, passing each text delta to on_delta as it arrives
+    :return: Tuple of (full text, seconds until the first token or None)
+    """
+    first_token_sec = None
+    usage = None
+    parts = []
+    estimated = estimate_request_tokens(system_prompt, user_content)
+    await reserve_llm_call(estimated, metrics)
+    started = time.perf_counter()
+    stream = await client.chat.completions.create(
+        model=model or Config.DEEPSEEK_MODEL,
+        messages=[
+            {"role": "system", "content": system_prompt},
+            {"role": "user", "content": user_content},
+        ],
+        stream=True,
+        # Ask for token usage in the final chunk
+        extra_body={"stream_options": {"include_usage": True}}
+    )
+    async for chunk in stream:
+        usage = getattr(chunk, "usage", None) or usage
+        if not chunk.choices:
+            continue
+        delta = chunk.choices[0].delta.content
+        if delta:
+            if first_token_sec is None:
+                first_token_sec = time.perf_counter() - started
+            parts.append(delta)
+            on_delta(delta)
+    settle_llm_call(estimated, usage)
+    if metrics:
+        metrics.record_llm_call(section, time.perf_counter() - started, usage, first_token_sec)
+    return "".join(parts), first_token_sec
+
+
+_prompt_cache = None
+_prompt_cache_lock = threading.Lock()
+
+
+def get_prompt_cache():
+    """Return the process-wide LLM response cache, or None if Config.LLM_CACHE is off"""
+    global _prompt_cache
+    if not Config.LLM_CACHE:
+        return None
+    with _prompt_cache_lock:
+        if _prompt_cache is None:
+            _prompt_cache = DiskCache(
+                os.path.join(Config.CACHE_DIR, "llm.sqlite3"),
+                max_bytes=Config.LLM_CACHE_MAX_MB * 1024 * 1024,
+                ttl_sec=Config.LLM_CACHE_TTL_DAYS * 86400
+            )
+        return _prompt_cache
+
+
+# Written into a report section whose LLM call failed, so the rest of the report still stands
+FAILED_SECTION_NOTE = "\n\n> **This section could not be generated:** {error}"
+
+
+class EnhancementError(Exception):
+    """Raised once every section has finished when some of them could not be generated"""
+
+
+class EnhancementCancelled(EnhancementError):
+    """Raised when the run was cancelled while sections were still being generated"""
+
+
+async def run_until_stopped(coro, stop_event, poll_sec=0.5):
+    """
+    Await coro, cancelling it (and every LLM call in flight) once stop_event is set
+    :param stop_event: threading.Event set from another thread, e.g. a server job's cancel event
+    """
+    task = asyncio.ensure_future(coro)
+    while not task.done():
+        if stop_event.is_set():
+            task.cancel()
+            break
+        await asyncio.wait({task}, timeout=poll_sec)
+    try:
+        return await task
+    except asyncio.CancelledError:
+        if not stop_event.is_set():
+            raise
+        raise EnhancementCancelled("Enhancement was cancelled")
+
+
+def mark_failed(writer, section, error):
+    """Note a failed section in the report and let the sections after it continue"""
+    if writer is not None:
+        writer.write(section, FAILED_SECTION_NOTE.format(error=str(error) or type(error).__name__))
+        writer.finish(section)
+
+
+def raise_failures(results):
+    """Raise after gather(return_exceptions=True) if any of the gathered calls failed"""
+    failures = [result for result in results if isinstance(result, BaseException)]
+    for failure in failures:
+        if not isinstance(failure, Exception):
+            raise failure
+    if len(failures) == 1 and isinstance(failures[0], EnhancementError):
+        raise failures[0]
+    if failures:
+        raise EnhancementError(
+            f"{len(failures)} of {len(results)} sections could not be generated: {str(failures[0])}"
+        ) from failures[0]
+
+
+async def generate(client, system_prompt, user_content, writer=None, section=None, metrics=None, on_started=None):
+    """
+    Complete a prompt, streaming into writer[section] when a writer is given
+    Responses are cached by model, system prompt and user message, so an unchanged
+    chunk is answered from disk without an API call.
+    :param writer: Optional OrderedStreamWriter receiving the output
+    :param section: Section name in writer (and label in metrics)
+    :param metrics: Optional RunMetrics
+    :param on_started: Called once the provider has processed the prompt (first token, or the
+                       response when not streaming)
+    :return: Full output text (on failure the section is marked in writer and the error raised)
+    """
+    cache = get_prompt_cache()
+    cache_key = prompt_key(Config.DEEPSEEK_MODEL, system_prompt, user_content) if cache else None
+    cached = cache.get(cache_key) if cache else None
+    if cached is not None:
+        if metrics:
+            metrics.add("llm_cache_hits")
+        if writer is not None:
+            writer.write(section, cached)
+            writer.finish(section)
+        if on_started:
+            on_started()
+        return cached
+
+    if writer is None:
+        text = await complete(client, system_prompt, user_content, metrics=metrics, section=section)
+        if on_started:
+            on_started()
+    else:
+        started = []
+
+        def on_delta(delta):
+            if on_started and not started:
+                started.append(True)
+                on_started()
+            writer.write(section, delta)
+
+        try:
+            text, first_token_sec = await stream_complete(
+                client, system_prompt, user_content, on_delta, metrics=metrics, section=section
+            )
+        except Exception as e:
+            mark_failed(writer, section, e)
+            raise
+        writer.finish(section)
+        if first_token_sec is not None:
+            print(f"First token for {section} after {first_token_sec:.1f}s")
+    if cache and text:
+        cache.set(cache_key, text)
+    return text
+
+
+class OrderedStreamWriter:
+    """
+    Write concurrently generated sections to a file in document order
+    The earliest unfinished section streams straight to disk; later sections are buffered
+    until everything before them is finished.
+    """
+
+    def __init__(self, f, sections):
+        """
+        :param f: Open text file
+        :param sections: Section names in document order
+        """
+        self.f = f
+        self.sections = list(sections)
+        self.buffers = {name: [] for name in self.sections}
+        self.finished = set()
+        self.active = 0
+        self.started = time.perf_counter()
+        self.first_write_sec = None
+
+    def _emit(self, text):
+        if self.first_write_sec is None and text:
+            self.first_write_sec = time.perf_counter() - self.started
+        self.f.write(text)
+        self.f.flush()
+
+    def write(self, section, text):
+        """Append text to a section"""
+        if self.active < len(self.sections) and self.sections[self.active] == section:
+            self._emit(text)
+        else:
+            self.buffers[section].append(text)
+
+    def finish(self, section):
+        """Mark a section complete and start streaming the next one"""
+        self.finished.add(section)
+        while self.active < len(self.sections) and self.sections[self.active] in self.finished:
+            self.active += 1
+            if self.active < len(self.sections):
+                name = self.sections[self.active]
+                self._emit("".join(self.buffers[name]))
+                self.buffers[name] = []
+
+    def close(self):
+        """Flush whatever has been generated so far, even for unfinished sections"""
+        for name in self.sections[self.active:]:
+            self._emit("".join(self.buffers[name]))
+            self.buffers[name] = []
+        self.active = len(self.sections)
+
+
+# System prompt for merging per-chunk concept summaries
+REDUCE_PROMPT = """You are an expert at organizing academic lecture notes. You will receive several partial concept summaries, each covering a consecutive part of the same lecture. Merge them into a single comprehensive concept summary in Markdown format. Please:
+
+1. Merge duplicate concepts and keep the most complete definition
+2. Preserve the order in which topics were introduced in the lecture
+3. Produce one concept map or outline at the beginning covering the whole lecture
+4. Produce one combined glossary of key terms at the end
+5. Keep the same heading levels and formatting conventions as the partial summaries
+
+Please ensure the output is in perfect Markdown format with clear concept organization."""
+
+# Appended to the user message when a transcript is processed in several parts
+# The note names neither the part nor the number of parts, so a chunk's prompt (and its cached
+# response) depends only on the chunk's own text
+PART_NOTE = "\n\n(This is one part of a longer lecture. Only process this part; do not add an introduction or conclusion for the whole lecture.)"
+
+
+def estimate_tokens(text):
+    """
+    Rough token count for budgeting prompts without a tokenizer
+    CJK characters count as one token each, everything else as four characters per token.
+    """
+    cjk = sum(1 for ch in text if "\u3000" <= ch <= "\u9fff" or "\uac00" <= ch <= "\ud7af")
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def _split_oversized(paragraph, max_tokens):
+    """Split a single paragraph that exceeds the budget on sentence boundaries"""
+    sentences = re.split(r"(?<=[.!?。！？])\s*", paragraph)
+    pieces, current = [], ""
+    for sentence in sentences:
+        if current and estimate_tokens(current + " " + sentence) > max_tokens:
+            pieces.append(current)
+            current = sentence
+        else:
+            current = f"{current} {sentence}".strip()
+    if current:
+        pieces.append(current)
+    # A single sentence may still exceed the budget; fall back to a hard character cut
+    result = []
+    for piece in pieces:
+        while estimate_tokens(piece) > max_tokens:
+            cut = max(1, len(piece) * max_tokens // estimate_tokens(piece))
+            result.append(piece[:cut])
+            piece = piece[cut:]
+        result.append(piece)
+    return result
+
+
+def _is_anchor(paragraph, max_tokens):
+    """
+    True if a chunk must start at this paragraph
+    Decided by the paragraph's own text, with a probability proportional to its size, so
+    on average one anchor falls per two full chunks of transcript.
+    """
+    digest = hashlib.blake2b(paragraph.encode("utf-8"), digest_size=8).digest()
+    return int.from_bytes(digest, "big") / 2 ** 64 < estimate_tokens(paragraph) / (2 * max_tokens)
+
+
+def chunk_transcript(paragraphs, max_tokens):
+    """
+    Pack transcript paragraphs (or segment texts) into chunks within a token budget
+    Paragraphs are packed greedily between anchor paragraphs (see _is_anchor), which always
+    start a new chunk. Editing one paragraph therefore only moves the chunk boundaries up to
+    the next anchor; later chunks, and their cached responses, stay the same.
+    :param paragraphs: Ordered list of paragraph strings
+    :param max_tokens: Maximum estimated tokens per chunk
+    :return: List of chunk strings, paragraphs joined with blank lines
+    """
+    chunks, current, current_tokens = [], [], 0
+    for paragraph in paragraphs:
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if current and _is_anchor(paragraph, max_tokens):
+            chunks.append("\n\n".join(current))
+            current, current_tokens = [], 0
+        for piece in _split_oversized(paragraph, max_tokens):
+            tokens = estimate_tokens(piece)
+            if current and current_tokens + tokens > max_tokens:
+                chunks.append("\n\n".join(current))
+                current, current_tokens = [], 0
+            current.append(piece)
+            current_tokens += tokens
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+
+class PrefixGate:
+    """
+    Stagger requests that start with the same transcript chunk
+    Identical prefixes sent at the same moment all miss the provider's prefix cache. The
+    leading pass for a chunk opens its gate once the provider has processed the prompt;
+    the other passes wait for that (at most Config.LLM_PREFIX_WAIT_SEC) and are then
+    served the shared prefix from the cache.
+    """
+
+    def __init__(self, timeout_sec=None):
+        self.timeout_sec = Config.LLM_PREFIX_WAIT_SEC if timeout_sec is None else timeout_sec
+        self._events = {}
+
+    def _event(self, part):
+        return self._events.setdefault(part, asyncio.Event())
+
+    def open(self, part):
+        self._event(part).set()
+
+    async def wait(self, part):
+        try:
+            await asyncio.wait_for(self._event(part).wait(), self.timeout_sec)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def generate_gated(gate, part, lead, client, system_prompt, user_content, writer=None, section=None, metrics=None):
+    """generate() for one pass over a chunk; the lead opens the chunk's PrefixGate, the others wait on it"""
+    if gate is None:
+        return await generate(client, system_prompt, user_content, writer, section, metrics)
+    if not lead:
+        await gate.wait(part)
+        return await generate(client, system_prompt, user_content, writer, section, metrics)
+    try:
+        return await generate(client, system_prompt, user_content, writer, section, metrics, lambda: gate.open(part))
+    finally:
+        # A failed lead must not hold the other passes back
+        gate.open(part)
+
+
+async def map_chunks(client, system_prompt, template, chunks, semaphore, writer=None, section="part", metrics=None,
+                     gate=None, lead=False):
+    """
+    Run one prompt over every chunk concurrently, bounded by a semaphore
+    When a writer is given, chunk i streams into its section f"{section}-{i}".
+    :param gate: Optional PrefixGate shared with another pass over the same chunks
+    :param lead: True for the pass that goes first and opens the gate
+    :return: Outputs in chunk order; if any chunk fails, EnhancementError is raised once all have finished
+    """
+    async def run(part, chunk):
+        user_content = template.format(text=chunk)
+        if len(chunks) > 1:
+            user_content += PART_NOTE
+        if gate is not None and not lead:
+            # Wait outside the semaphore so the leading pass can use the slot
+            await gate.wait(part)
+        async with semaphore:
+            return await generate_gated(
+                gate if lead else None, part, True, client, system_prompt, user_content,
+                writer, f"{section}-{part}", metrics
+            )
+
+    # A failed chunk must not cancel the others: their output is already paid for and streaming
+    outputs = await asyncio.gather(*(run(part, chunk) for part, chunk in enumerate(chunks, 1)), return_exceptions=True)
+    raise_failures(outputs)
+    return outputs
+
+
+async def merge_concepts(client, partial_concepts, writer=None, metrics=None):
+    """
+    Reduce step: merge per-chunk concept summaries into one
+    :param partial_concepts: Concept summaries in lecture order
+    :param writer: Optional OrderedStreamWriter with a "concept" section
+    :return: Merged concept summary
+    """
+    merged = "\n\n---\n\n".join(
+        f"## Part {i}\n\n{summary}" for i, summary in enumerate(partial_concepts, 1)
+    )
+    return await generate(
+        client, REDUCE_PROMPT,
+        f"Please merge these partial concept summaries into one:\n\n{merged}",
+        writer, "concept", metrics
+    )
+
+
+async def run_chunked_enhancements(paragraphs, max_tokens=None, client=None, writer=None, metrics=None):
+    """
+    Map-reduce enhancement for transcripts too long for a single prompt
+    Each chunk is corrected and concept-summarised in parallel (map), then the partial
+    concept summaries are merged in one final call (reduce). A single chunk skips the reduce.
+    :param paragraphs: Ordered transcript paragraphs or segment texts
+    :param max_tokens: Token budget per chunk (defaults to Config.LLM_CHUNK_TOKENS)
+    :param client: Optional shared AsyncOpenAI client
+    :param writer: Optional OrderedStreamWriter with sections "concept" and "correction-1".."correction-N"
+    :param metrics: Optional RunMetrics recording every call
+    :return: Dict with "concept" and "correction" outputs (and "corrections", one per chunk). A failed
+             call is marked in writer and EnhancementError raised once every other section has finished
+    """
+    chunks = chunk_transcript(paragraphs, max_tokens or Config.LLM_CHUNK_TOKENS)
+    owns_client = client is None
+    client = client or create_async_client()
+    semaphore = asyncio.Semaphore(Config.LLM_CONCURRENCY)
+    # Both passes start with the same chunk; the concept pass leads (the report starts with it)
+    gate = PrefixGate() if Config.LLM_PREFIX_WAIT_SEC > 0 else None
+    try:
+        concept_prompt, concept_template = PROMPT_VARIANTS["concept"]
+        correction_prompt, correction_template = PROMPT_VARIANTS["correction"]
+        corrections_pass = map_chunks(
+            client, correction_prompt, correction_template, chunks, semaphore, writer, "correction", metrics, gate=gate
+        )
+
+        if len(chunks) == 1:
+            concept, corrections = await asyncio.gather(
+                generate_gated(
+                    gate, 1, True, client, concept_prompt, concept_template.format(text=chunks[0]),
+                    writer, "concept", metrics
+                ),
+                corrections_pass,
+                return_exceptions=True
+            )
+        else:
+            partial_concepts, corrections = await asyncio.gather(
+                map_chunks(client, concept_prompt, concept_template, chunks, semaphore, section="concept-part", metrics=metrics,
+                           gate=gate, lead=True),
+                corrections_pass,
+                return_exceptions=True
+            )
+            if isinstance(partial_concepts, BaseException):
+                # A summary merged from some parts would silently miss topics; the corrections still stand
+                mark_failed(writer, "concept", partial_concepts)
+                concept = partial_concepts
+            else:
+                concept = await merge_concepts(client, partial_concepts, writer, metrics)
+        raise_failures([concept, corrections])
+        return {"concept": concept, "correction": "\n\n---\n\n".join(corrections), "corrections": corrections}
+    finally:
+        if owns_client:
+            await client.close()
+
+
+async def run_chunked_prompt(system_prompt, template, paragraphs, max_tokens=None, client=None, writer=None, metrics=None):
+    """
+    Apply one prompt to a long text chunk by chunk, in parallel
+    :param system_prompt: System message
+    :param template: User message template with a {text} placeholder
+    :param paragraphs: Ordered paragraphs of the input text
+    :param max_tokens: Token budget per chunk (defaults to Config.LLM_CHUNK_TOKENS)
+    :param client: Optional shared AsyncOpenAI client
+    :param writer: Optional OrderedStreamWriter with sections "part-1".."part-N"
+    :param metrics: Optional RunMetrics recording every call
+    :return: Outputs in chunk order
+    """
+    chunks = chunk_transcript(paragraphs, max_tokens or Config.LLM_CHUNK_TOKENS)
+    owns_client = client is None
+    client = client or create_async_client()
+    try:
+        semaphore = asyncio.Semaphore(Config.LLM_CONCURRENCY)
+        return await map_chunks(client, system_prompt, template, chunks, semaphore, writer, metrics=metrics)
+    finally:
+        if owns_client:
+            await client.close()
+
+
+def enhance_paragraphs(paragraphs, max_tokens=None, metrics=None, stop_event=None):
+    """
+    Blocking wrapper around run_chunked_enhancements for synchronous callers
+    :param stop_event: Optional threading.Event; once set, the calls in flight are abandoned
+                       and EnhancementCancelled is raised
+    """
+    coro = run_chunked_enhancements(paragraphs, max_tokens, metrics=metrics)
+    return asyncio.run(run_until_stopped(coro, stop_event) if stop_event else coro)
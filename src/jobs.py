@@ -0,0 +1,151 @@
+import os
+import sqlite3
+import threading
+import time
+
+# Job states; queued and running jobs are unfinished
+JOB_STATES = ("queued", "running", "done", "partial", "failed", "cancelled")
+FINISHED_STATES = ("done", "partial", "failed", "cancelled")
+
+_COLUMNS = ("id", "input_file", "priority", "status", "created", "started", "finished",
+            "report", "error", "cancel_requested")
+
+
+class JobQueue:
+    """
+    Persistent priority queue of lecture jobs stored in SQLite
+    Jobs survive server restarts: anything still running when the process died is put
+    back in the queue and resumes from its run manifest. Safe to share between threads.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: Path to the SQLite database file
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, input_file TEXT NOT NULL, "
+            "priority INTEGER NOT NULL DEFAULT 0, status TEXT NOT NULL, created REAL NOT NULL, "
+            "started REAL, finished REAL, report TEXT, error TEXT, "
+            "cancel_requested INTEGER NOT NULL DEFAULT 0)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs(status, priority DESC, id)")
+        self._conn.commit()
+
+    def _row(self, row):
+        return dict(zip(_COLUMNS, row)) if row else None
+
+    def submit(self, input_file, priority=0):
+        """
+        Add a lecture to the queue
+        :param input_file: Path to the recording
+        :param priority: Higher values are processed first; equal priorities run in submission order
+        :return: The new job
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO jobs (input_file, priority, status, created) VALUES (?, ?, 'queued', ?)",
+                (os.path.abspath(input_file), int(priority), time.time())
+            )
+            self._conn.commit()
+            job_id = cursor.lastrowid
+        return self.get(job_id)
+
+    def get(self, job_id):
+        """Return one job as a dict, or None if it does not exist"""
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE id = ?", (job_id,)
+            ).fetchone()
+        return self._row(row)
+
+    def list(self, status=None, limit=100):
+        """Most recent jobs first, optionally only those in one state"""
+        query = f"SELECT {', '.join(_COLUMNS)} FROM jobs"
+        params = ()
+        if status:
+            query += " WHERE status = ?"
+            params = (status,)
+        query += " ORDER BY id DESC LIMIT ?"
+        with self._lock:
+            rows = self._conn.execute(query, params + (int(limit),)).fetchall()
+        return [self._row(row) for row in rows]
+
+    def claim(self):
+        """
+        Take the highest-priority queued job and mark it running
+        :return: The claimed job, or None if the queue is empty
+        """
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM jobs WHERE status = 'queued' "
+                "ORDER BY priority DESC, id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            job = self._row(row)
+            job["status"], job["started"] = "running", time.time()
+            self._conn.execute(
+                "UPDATE jobs SET status = 'running', started = ? WHERE id = ?", (job["started"], job["id"])
+            )
+            self._conn.commit()
+        return job
+
+    def finish(self, job_id, status, report=None, error=None):
+        """Record the outcome of a running job"""
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, finished = ?, report = ?, error = ? WHERE id = ?",
+                (status, time.time(), report, error, job_id)
+            )
+            self._conn.commit()
+
+    def cancel(self, job_id):
+        """
+        Cancel a job
+        Queued jobs are cancelled immediately; running jobs are flagged and stop at their
+        next segment or stage boundary, or abandon the LLM calls of the enhancement stage. Finished jobs are left as they are.
+        :return: The job after the update, or None if it does not exist
+        """
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished = ?, cancel_requested = 1 "
+                "WHERE id = ? AND status = 'queued'", (time.time(), job_id)
+            )
+            self._conn.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND status = 'running'", (job_id,)
+            )
+            self._conn.commit()
+        return self.get(job_id)
+
+    def requeue_interrupted(self):
+        """
+        Put jobs left running by a previous server process back in the queue
+        :return: Number of jobs requeued
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE jobs SET status = 'queued', started = NULL WHERE status = 'running' AND cancel_requested = 0"
+            )
+            self._conn.execute(
+                "UPDATE jobs SET status = 'cancelled', finished = ? WHERE status = 'running'", (time.time(),)
+            )
+            self._conn.commit()
+        return cursor.rowcount
+
+    def counts(self):
+        """Number of jobs in each state"""
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {state: 0 for state in JOB_STATES}
+        counts.update(dict(rows))
+        return counts
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
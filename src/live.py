@@ -0,0 +1,190 @@
+import os
+import sys
+import time
+import threading
+import subprocess
+import numpy as np
+
+from src.audio import PcmSegment, _read_exact
+from src.silence import frame_rms_db
+
+
+class StreamSegmenter:
+    """
+    Cut a live PCM stream into segments at quiet points, as the audio arrives
+    Applies the same rules as plan_segments: cuts snap to the quietest frame within
+    tolerance_sec of the target length, and dead air longer than max_silence_sec is
+    dropped. A long pause also ends the current segment immediately, so speech before
+    a break is transcribed without waiting for the segment to fill up.
+    """
+
+    def __init__(self, sample_rate=16000, target_sec=60, tolerance_sec=10, silence_db=-40.0,
+                 max_silence_sec=10.0, frame_sec=0.05, padding_sec=0.25):
+        """
+        :param sample_rate: Sample rate of the mono 16-bit PCM fed in
+        :param target_sec: Preferred segment length in seconds
+        :param tolerance_sec: How far a cut may move from the target to find a quiet frame
+                              (capped at half the target)
+        :param silence_db: Frames at or below this level count as silence
+        :param max_silence_sec: Silent stretches longer than this are cut out as dead air
+        :param frame_sec: Energy frame duration in seconds
+        :param padding_sec: Audio kept on either side of speech
+        """
+        self.sample_rate = sample_rate
+        self.frame_len = int(sample_rate * frame_sec)
+        self.frame_sec = self.frame_len / sample_rate
+        self.target = max(1, int(round(target_sec / self.frame_sec)))
+        # Capped below the target so every cut advances the stream (see plan_segments)
+        self.tolerance = min(int(round(tolerance_sec / self.frame_sec)), self.target // 2)
+        self.max_silence = max(1, int(round(max_silence_sec / self.frame_sec)))
+        self.pad = int(round(padding_sec / self.frame_sec))
+        self.silence_db = silence_db
+        self.buffer = bytearray()
+        # Energy of every complete frame in the buffer
+        self.rms_db = np.empty(0, dtype=np.float32)
+        # Stream position of the first buffered frame
+        self.offset = 0
+        self.index = 0
+
+    def _drop(self, frames):
+        del self.buffer[:frames * self.frame_len * 2]
+        self.rms_db = self.rms_db[frames:]
+        self.offset += frames
+
+    def _emit(self, frames):
+        segment = PcmSegment(
+            self.index, self.offset * self.frame_sec,
+            bytes(self.buffer[:frames * self.frame_len * 2]), self.sample_rate
+        )
+        self.index += 1
+        self._drop(frames)
+        return segment
+
+    def _cuts(self):
+        segments = []
+        while True:
+            voiced = np.flatnonzero(self.rms_db > self.silence_db)
+            if len(voiced) == 0:
+                # Nothing but silence so far: keep only the padding before the next speech
+                if len(self.rms_db) > self.pad:
+                    self._drop(len(self.rms_db) - self.pad)
+                return segments
+            if voiced[0] > self.pad:
+                self._drop(voiced[0] - self.pad)
+                continue
+            # A long pause after speech ends the segment there
+            gaps = np.flatnonzero(np.diff(np.r_[voiced, len(self.rms_db)]) > self.max_silence)
+            if len(gaps):
+                end = voiced[gaps[0]] + 1 + self.pad
+                if end <= self.target + self.tolerance:
+                    segments.append(self._emit(end))
+                    continue
+            if len(self.rms_db) < self.target + self.tolerance:
+                return segments
+            low = self.target - self.tolerance
+            high = max(low + 1, self.target + self.tolerance)
+            cut = low + int(np.argmin(self.rms_db[low:high]))
+            assert cut > 0
+            segments.append(self._emit(cut))
+
+    def feed(self, pcm):
+        """
+        Add decoded audio
+        :param pcm: Mono 16-bit PCM bytes
+        :return: List of PcmSegment that are complete
+        """
+        self.buffer.extend(pcm)
+        known = len(self.rms_db)
+        complete = len(self.buffer) // (self.frame_len * 2)
+        if complete > known:
+            samples = np.frombuffer(
+                bytes(self.buffer[known * self.frame_len * 2:complete * self.frame_len * 2]), dtype=np.int16
+            )
+            self.rms_db = np.concatenate([self.rms_db, frame_rms_db(samples, self.frame_len)])
+        return self._cuts()
+
+    def flush(self):
+        """Return the last, partial segment once the stream has ended"""
+        segments = self._cuts()
+        voiced = np.flatnonzero(self.rms_db > self.silence_db)
+        if len(voiced):
+            end = min(len(self.rms_db), voiced[-1] + 1 + self.pad)
+            segments.append(self._emit(end))
+        self.buffer = bytearray()
+        self.rms_db = self.rms_db[:0]
+        return segments
+
+
+def _feed_decoder(source, decoder_stdin, stop_event, idle_timeout_sec, poll_sec):
+    """Copy a growing file or stdin into the decoder until it ends, goes idle or is stopped"""
+    try:
+        if source == "-":
+            fd = sys.stdin.buffer.fileno()
+            while not stop_event.is_set():
+                data = os.read(fd, 64 * 1024)
+                if not data:
+                    break
+                decoder_stdin.write(data)
+            return
+        last_growth = time.monotonic()
+        with open(source, "rb") as f:
+            while not stop_event.is_set():
+                data = f.read(64 * 1024)
+                if data:
+                    decoder_stdin.write(data)
+                    last_growth = time.monotonic()
+                elif time.monotonic() - last_growth > idle_timeout_sec:
+                    break
+                else:
+                    decoder_stdin.flush()
+                    stop_event.wait(poll_sec)
+    except (BrokenPipeError, ValueError):
+        pass
+    finally:
+        try:
+            decoder_stdin.close()
+        except BrokenPipeError:
+            pass
+
+
+def iter_live_pcm(source, stop_event, sample_rate=16000, window_sec=1.0, input_format=None,
+                  idle_timeout_sec=30.0, poll_sec=0.5):
+    """
+    Decode a recording that is still being written, or a stdin stream, as it arrives
+    The input must be in a streamable format (WAV, MP3, FLAC, Ogg/Opus, ADTS AAC, raw PCM);
+    an M4A file cannot be decoded before the recorder finalises it.
+    :param source: Path to a growing file, or "-" for stdin
+    :param stop_event: threading.Event that ends the stream early (e.g. on Ctrl-C)
+    :param sample_rate: Output sample rate in Hz
+    :param window_sec: Read size in seconds
+    :param input_format: ffmpeg input format to force, e.g. "s16le" for headerless PCM
+    :param idle_timeout_sec: A file that has not grown for this long counts as finished
+    :param poll_sec: How often a file is checked for new data
+    :return: Generator of mono 16-bit PCM byte strings
+    """
+    format_args = ["-f", input_format] if input_format else []
+    command = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error",
+        *format_args, "-i", "pipe:0",
+        "-vn", "-ac", "1", "-ar", str(sample_rate),
+        "-f", "s16le", "pipe:1",
+    ]
+    process = subprocess.Popen(command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+    feeder = threading.Thread(
+        target=_feed_decoder,
+        args=(source, process.stdin, stop_event, idle_timeout_sec, poll_sec),
+        daemon=True
+    )
+    feeder.start()
+    window_bytes = int(window_sec * sample_rate) * 2
+    try:
+        while True:
+            chunk = _read_exact(process.stdout, window_bytes)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        process.stdout.close()
+        if process.poll() is None:
+            process.kill()
+        process.wait()
@@ -0,0 +1,175 @@
+import hashlib
+import json
+import os
+import threading
+from datetime import datetime
+
+from src.transcript import Transcript
+
+# Pipeline stages in execution order
+STAGES = ("split", "transcribed", "corrected", "summarized", "reported")
+# Stages whose outputs are derived from the transcript text
+TRANSCRIPT_STAGES = ("corrected", "summarized", "reported")
+
+
+def source_fingerprint(path):
+    """
+    Identify a lecture recording across runs without reading it
+    Based on the absolute path, size and modification time, so a re-recorded or edited
+    file gets a fresh manifest.
+    """
+    stat = os.stat(path)
+    key = f"{os.path.abspath(path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    return hashlib.sha256(key.encode("utf-8")).hexdigest()
+
+
+class LectureManifest:
+    """
+    Per-lecture JSON record of completed pipeline work
+    Every update is written atomically, so a crashed or interrupted run can be resumed
+    by reloading the manifest and skipping whatever is already recorded.
+    """
+
+    def __init__(self, path, source_file, fingerprint):
+        """
+        :param path: Path of the manifest JSON file
+        :param source_file: Path to the lecture recording
+        :param fingerprint: Identity of the recording (see source_fingerprint)
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.data = None
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                if data.get("fingerprint") == fingerprint:
+                    self.data = data
+            except (OSError, ValueError):
+                self.data = None
+        self.resumed = self.data is not None
+        if self.data is None:
+            self.data = {
+                "source_file": os.path.basename(source_file),
+                "fingerprint": fingerprint,
+                "created": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                "stages": {},
+                "segments": [],
+                "outputs": {},
+            }
+            self.save()
+
+    def save(self):
+        """Atomically write the manifest to disk"""
+        with self._lock:
+            tmp_path = f"{self.path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self.data, f, ensure_ascii=False, indent=2)
+            os.replace(tmp_path, self.path)
+
+    def is_done(self, stage):
+        return self.data["stages"].get(stage) is not None
+
+    def mark_done(self, stage):
+        self.data["stages"][stage] = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.save()
+
+    def _invalidate_outputs(self):
+        """Forget stages built from the old transcript, so they are redone from the new text"""
+        for stage in TRANSCRIPT_STAGES:
+            self.data["stages"].pop(stage, None)
+
+    def set_segments(self, paths, spans):
+        """Record the split result; resets any per-segment progress"""
+        self._invalidate_outputs()
+        self.data["segments"] = [
+            {"index": i, "path": path, "start_sec": start, "end_sec": end, "text": None}
+            for i, (path, (start, end)) in enumerate(zip(paths, spans))
+        ]
+        self.mark_done("split")
+
+    def add_segment(self, index, path, start_sec, end_sec):
+        """
+        Record one segment produced by a streaming split
+        A transcription from a previous run is kept when the segment covers the same span.
+        """
+        with self._lock:
+            segments = self.data["segments"]
+            if index < len(segments):
+                existing = segments[index]
+                if (existing["start_sec"], existing["end_sec"]) == (start_sec, end_sec):
+                    existing["path"] = path
+                    return existing
+                del segments[index:]
+                self._invalidate_outputs()
+            segment = {"index": index, "path": path, "start_sec": start_sec, "end_sec": end_sec, "text": None}
+            segments.append(segment)
+        self.save()
+        return segment
+
+    def segments_available(self):
+        """True if the split stage is recorded and every segment file still exists"""
+        return self.is_done("split") and all(
+            segment["text"] is not None or (segment["path"] and os.path.exists(segment["path"]))
+            for segment in self.data["segments"]
+        )
+
+    def pending_segments(self):
+        """Segments that have no transcription yet"""
+        return [segment for segment in self.data["segments"] if segment["text"] is None]
+
+    def set_transcription(self, index, text):
+        """Record a segment's text; new text invalidates the enhancement done without it"""
+        with self._lock:
+            segment = self.data["segments"][index]
+            if text is not None and text != segment["text"]:
+                self._invalidate_outputs()
+            segment["text"] = text
+        self.save()
+
+    def transcript(self):
+        """Timestamped Transcript of every segment, failed ones included"""
+        return Transcript.from_dicts(self.data["segments"], self.data["source_file"])
+
+    def get_output(self, name):
+        return self.data["outputs"].get(name)
+
+    def set_output(self, name, value, stage=None):
+        self.data["outputs"][name] = value
+        if stage:
+            self.mark_done(stage)
+        else:
+            self.save()
+
+    def acquire_lock(self):
+        """
+        Claim the run for this process so two pipelines never work on the same lecture at once
+        A lock left behind by a process that no longer exists is taken over.
+        :return: True if the lock was acquired
+        """
+        lock_path = os.path.join(os.path.dirname(self.path), "run.lock")
+        for _ in range(2):
+            try:
+                fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+                with os.fdopen(fd, "w") as f:
+                    f.write(str(os.getpid()))
+                return True
+            except FileExistsError:
+                try:
+                    with open(lock_path, "r") as f:
+                        pid = int(f.read().strip() or 0)
+                    os.kill(pid, 0)
+                    return False
+                except (OSError, ValueError):
+                    # Owner is gone; remove the stale lock and try again
+                    try:
+                        os.remove(lock_path)
+                    except FileNotFoundError:
+                        pass
+        return False
+
+    def release_lock(self):
+        try:
+            os.remove(os.path.join(os.path.dirname(self.path), "run.lock"))
+        except FileNotFoundError:
+            pass
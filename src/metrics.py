@@ -0,0 +1,156 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+
+class RunMetrics:
+    """
+    Timing spans, counters and LLM usage collected during one pipeline run
+    Thread-safe, so transcription workers and the enhancement event loop can record into
+    the same instance.
+    """
+
+    def __init__(self, run_name=None):
+        self.run_name = run_name
+        self.started_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.started = time.perf_counter()
+        self.spans = []
+        self.counters = {}
+        self.llm_calls = []
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """
+        Time a block of work
+        :param name: Span name, e.g. "split" or "transcribe_segment"
+        :param attrs: Extra fields stored with the span (segment index, audio seconds, ...)
+        """
+        record = {"name": name, **attrs}
+        start = time.perf_counter()
+        cpu_start = time.thread_time()
+        process_cpu_start = time.process_time()
+        children_start = os.times()
+        try:
+            yield record
+        finally:
+            children_end = os.times()
+            record["start_sec"] = round(start - self.started, 4)
+            record["duration_sec"] = round(time.perf_counter() - start, 4)
+            record["thread_cpu_sec"] = round(time.thread_time() - cpu_start, 4)
+            # Process-wide CPU (all threads) and CPU of finished child processes such as ffmpeg
+            record["process_cpu_sec"] = round(time.process_time() - process_cpu_start, 4)
+            record["children_cpu_sec"] = round(
+                (children_end.children_user - children_start.children_user)
+                + (children_end.children_system - children_start.children_system), 4
+            )
+            with self._lock:
+                self.spans.append(record)
+
+    def add(self, counter, value=1):
+        """Increase a named counter"""
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def record_llm_call(self, section, latency_sec, usage=None, first_token_sec=None):
+        """
+        Record one chat completion
+        :param section: What the call produced ("concept", "correction-1", ...)
+        :param latency_sec: Wall time of the call
+        :param usage: Usage object or dict from the API response, if available
+        :param first_token_sec: Time to first token for streamed calls
+        """
+        if usage is not None and not isinstance(usage, dict):
+            usage = usage.model_dump() if hasattr(usage, "model_dump") else dict(usage)
+        usage = usage or {}
+        record = {
+            "section": section,
+            "latency_sec": round(latency_sec, 4),
+            "first_token_sec": round(first_token_sec, 4) if first_token_sec is not None else None,
+            "prompt_tokens": usage.get("prompt_tokens"),
+            # DeepSeek reports prefix cache hits directly; OpenAI-style APIs under prompt_tokens_details
+            "prompt_cache_hit_tokens": usage.get("prompt_cache_hit_tokens",
+                                                 (usage.get("prompt_tokens_details") or {}).get("cached_tokens")),
+            "completion_tokens": usage.get("completion_tokens"),
+        }
+        with self._lock:
+            self.llm_calls.append(record)
+        self.add("llm_prompt_tokens", record["prompt_tokens"] or 0)
+        self.add("llm_prompt_cache_hit_tokens", record["prompt_cache_hit_tokens"] or 0)
+        self.add("llm_completion_tokens", record["completion_tokens"] or 0)
+
+    def stage_totals(self):
+        """Total wall and CPU time per span name"""
+        totals = {}
+        with self._lock:
+            for span in self.spans:
+                entry = totals.setdefault(span["name"], {
+                    "count": 0, "duration_sec": 0.0, "process_cpu_sec": 0.0, "children_cpu_sec": 0.0
+                })
+                entry["count"] += 1
+                for key in ("duration_sec", "process_cpu_sec", "children_cpu_sec"):
+                    entry[key] = round(entry[key] + span[key], 4)
+        return totals
+
+    def to_dict(self):
+        wall_sec = time.perf_counter() - self.started
+        audio_sec = self.counters.get("audio_seconds", 0)
+        with self._lock:
+            spans = list(self.spans)
+            llm_calls = list(self.llm_calls)
+            counters = dict(self.counters)
+        return {
+            "run": self.run_name,
+            "started_at": self.started_at,
+            "wall_sec": round(wall_sec, 4),
+            "real_time_factor": round(wall_sec / audio_sec, 4) if audio_sec else None,
+            "counters": counters,
+            "stages": self.stage_totals(),
+            "llm_calls": llm_calls,
+            "spans": spans,
+        }
+
+    def write_json(self, path):
+        """Write the run report as JSON and return its path"""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        return path
+
+    def to_prometheus(self, prefix="lecture_pipeline"):
+        """Render the run totals in Prometheus text exposition format"""
+        report = self.to_dict()
+        run = (self.run_name or "").replace("\\", "\\\\").replace('"', '\\"')
+        lines = [
+            f"# TYPE {prefix}_wall_seconds gauge",
+            f'{prefix}_wall_seconds{{run="{run}"}} {report["wall_sec"]}',
+            f"# TYPE {prefix}_stage_seconds gauge",
+        ]
+        for stage, totals in sorted(report["stages"].items()):
+            lines.append(f'{prefix}_stage_seconds{{run="{run}",stage="{stage}"}} {totals["duration_sec"]}')
+        lines.append(f"# TYPE {prefix}_counter gauge")
+        for counter, value in sorted(report["counters"].items()):
+            lines.append(f'{prefix}_counter{{run="{run}",name="{counter}"}} {value}')
+        if report["real_time_factor"] is not None:
+            lines.append(f"# TYPE {prefix}_real_time_factor gauge")
+            lines.append(f'{prefix}_real_time_factor{{run="{run}"}} {report["real_time_factor"]}')
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """Write the Prometheus text export and return its path"""
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+        return path
+
+    def write_reports(self, base_path, prometheus=False):
+        """
+        Write base_path + ".metrics.json" and optionally ".prom"
+        :param base_path: Report path without extension
+        :return: Path of the JSON report
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(base_path)), exist_ok=True)
+        if prometheus:
+            self.write_prometheus(f"{base_path}.prom")
+        return self.write_json(f"{base_path}.metrics.json")
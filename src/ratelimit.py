@@ -0,0 +1,200 @@
+import asyncio
+import itertools
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from src.config import Config
+
+# Shortest wait of a call that is not yet at the front of the fair queue
+MIN_POLL_SEC = 0.02
+
+# (lecture key, default units) for API calls made in the current thread or task
+_share = ContextVar("rate_share", default=(None, 0))
+
+
+@contextmanager
+def rate_share(key, units=0):
+    """
+    Attribute the API calls made in this block to one lecture
+    Waiting calls are served round-robin across keys. Context variables follow
+    asyncio tasks created inside the block, but not threads started from it.
+    :param key: Fair-queueing key, usually the recording's name
+    :param units: Size charged by calls that do not pass their own (e.g. audio seconds of an upload)
+    """
+    token = _share.set((key, units))
+    try:
+        yield
+    finally:
+        _share.reset(token)
+
+
+class TokenBucket:
+    """Refilling budget of some quantity per minute; 0 disables it"""
+
+    def __init__(self, per_minute):
+        """
+        :param per_minute: Sustained rate; also the burst size
+        """
+        self.rate = per_minute / 60.0
+        self.capacity = float(max(1, per_minute))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_for(self, amount):
+        """Seconds until amount can be taken (requests larger than the burst wait for a full bucket)"""
+        if self.rate <= 0:
+            return 0.0
+        need = min(amount, self.capacity)
+        return 0.0 if self.tokens >= need else (need - self.tokens) / self.rate
+
+    def take(self, amount):
+        # May go negative for oversized requests or underestimates; later requests then wait longer
+        if self.rate > 0:
+            self.tokens -= amount
+
+
+class RateLimiter:
+    """
+    Request and work budgets for one provider, enforced with token buckets
+    Each call reserves one request plus its estimated size in units (LLM tokens or audio
+    seconds) before it is sent, so concurrent lectures stay at the quota ceiling instead
+    of bursting into 429s. Waiting calls are queued per lecture and served round-robin.
+    Shared by every pipeline in the process, from threads or event loops alike.
+    """
+
+    def __init__(self, requests_per_minute, units_per_minute=0):
+        """
+        :param requests_per_minute: Sustained request rate; also the burst size. 0 disables it
+        :param units_per_minute: Sustained rate of tokens or audio seconds. 0 disables it
+        """
+        self.requests = TokenBucket(requests_per_minute)
+        self.units = TokenBucket(units_per_minute)
+        self.paused_until = 0.0
+        self._queues = OrderedDict()
+        self._tickets = itertools.count()
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self):
+        return self.requests.rate > 0 or self.units.rate > 0
+
+    def _enqueue(self, key, units):
+        ticket = (next(self._tickets), units)
+        with self._lock:
+            self._queues.setdefault(key, deque()).append(ticket)
+        return ticket
+
+    def _discard(self, key, ticket):
+        """Drop a ticket whose caller gave up (e.g. a cancelled task)"""
+        with self._lock:
+            queue = self._queues.get(key)
+            if queue and ticket in queue:
+                queue.remove(ticket)
+                if not queue:
+                    del self._queues[key]
+
+    def _reserve(self, key, ticket):
+        """Grant the ticket if it is next in turn and both budgets allow it; otherwise return how long to wait"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self.paused_until:
+                return self.paused_until - now
+            self.requests.refill(now)
+            self.units.refill(now)
+            head_key = next(iter(self._queues))
+            head = self._queues[head_key][0]
+            wait = max(self.requests.wait_for(1), self.units.wait_for(head[1]))
+            if head != ticket:
+                return max(wait, MIN_POLL_SEC)
+            if wait > 0:
+                return wait
+            self.requests.take(1)
+            self.units.take(ticket[1])
+            queue = self._queues[key]
+            queue.popleft()
+            # Round-robin: the lecture just served goes to the back of the line
+            if queue:
+                self._queues.move_to_end(key)
+            else:
+                del self._queues[key]
+            return 0.0
+
+    def _ticket_args(self, units, key):
+        share_key, share_units = _share.get()
+        return (share_key if key is None else key), (share_units if units is None else units)
+
+    def acquire(self, units=None, key=None):
+        """
+        Block the calling thread until a request may be sent
+        :param units: Estimated size of the request (defaults to the enclosing rate_share's units)
+        :param key: Fair-queueing key (defaults to the enclosing rate_share's key)
+        :return: Seconds spent waiting
+        """
+        if not self.enabled:
+            return 0.0
+        key, units = self._ticket_args(units, key)
+        ticket = self._enqueue(key, units)
+        started = time.monotonic()
+        try:
+            while True:
+                wait = self._reserve(key, ticket)
+                if wait <= 0:
+                    return time.monotonic() - started
+                time.sleep(wait)
+        finally:
+            self._discard(key, ticket)
+
+    async def acquire_async(self, units=None, key=None):
+        """Wait without blocking the event loop until a request may be sent; see acquire"""
+        if not self.enabled:
+            return 0.0
+        key, units = self._ticket_args(units, key)
+        ticket = self._enqueue(key, units)
+        started = time.monotonic()
+        try:
+            while True:
+                wait = self._reserve(key, ticket)
+                if wait <= 0:
+                    return time.monotonic() - started
+                await asyncio.sleep(wait)
+        finally:
+            self._discard(key, ticket)
+
+    def adjust(self, units):
+        """Charge (or refund, if negative) the difference between a request's estimated and actual size"""
+        with self._lock:
+            self.units.refill(time.monotonic())
+            self.units.take(units)
+            self.units.tokens = min(self.units.capacity, self.units.tokens)
+
+    def pause(self, seconds):
+        """Hold every queued request after the provider answered 429, instead of letting each one retry"""
+        with self._lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider):
+    """
+    Return the process-wide limiter for a provider
+    "siliconflow" budgets audio seconds per minute, "deepseek" prompt plus completion tokens.
+    :param provider: Provider name
+    """
+    with _limiters_lock:
+        if provider not in _limiters:
+            rpm, units_per_minute = {
+                "siliconflow": (Config.SILICON_FLOW_RPM, Config.SILICON_FLOW_AUDIO_SEC_PER_MIN),
+                "deepseek": (Config.DEEPSEEK_RPM, Config.DEEPSEEK_TPM),
+            }[provider]
+            _limiters[provider] = RateLimiter(rpm, units_per_minute)
+        return _limiters[provider]
@@ -0,0 +1,108 @@
+import os
+from datetime import datetime
+
+
+def render_frontmatter(title, source_file, generated_by):
+    """Return the YAML frontmatter of a Markdown report"""
+    return (
+        "---\n"
+        f"title: {title}\n"
+        f"date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n"
+        f"source_file: {os.path.basename(source_file)}\n"
+        f"generated_by: {generated_by}\n"
+        "---\n\n"
+    )
+
+
+def write_frontmatter(f, title, source_file, generated_by):
+    """Write the YAML frontmatter of a Markdown report"""
+    f.write(render_frontmatter(title, source_file, generated_by))
+
+
+def report_parts():
+    """Return the fixed (header, divider, footer) text around the two report sections"""
+    header = """# Lecture Analysis Report
+
+## Table of Contents
+- [Concept Summary](#concept-summary)
+- [Corrected Transcription](#corrected-transcription)
+
+---
+
+## Concept Summary
+
+"""
+    divider = """
+
+---
+
+## Corrected Transcription
+
+"""
+    footer = f"""
+
+---
+
+*Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}*
+"""
+    return header, divider, footer
+
+
+def build_report(results):
+    """Combine both summaries with clear separation"""
+    header, divider, footer = report_parts()
+    return header + results['concept'] + divider + results['correction'] + footer
+
+
+def write_report(path, results, source_file):
+    """
+    Write the lecture analysis report for finished enhancement results
+    :param path: Path of the Markdown report
+    :param results: Dict with "concept" and "correction" outputs
+    :param source_file: Lecture recording named in the frontmatter
+    :return: Path of the report
+    """
+    with open(path, 'w', encoding='utf-8') as f:
+        write_frontmatter(f, "Lecture Analysis Report", source_file, "AI Lecture Assistant")
+        f.write(build_report(results))
+    return path
+
+
+def render_summary_text(transcript):
+    """Plain-text lecture summary with one block per segment (draft.py format)"""
+    lines = ["=== Lecture Summary ===\n", f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n\n"]
+    for i, segment in enumerate(transcript, 1):
+        lines.append(f"\n=== Part {i} ===\n")
+        if segment.ok:
+            lines.append(segment.text.strip() + "\n")
+        else:
+            lines.append(f"[Part {i}{f' ({segment.span})' if segment.timed else ''} could not be transcribed]\n")
+    lines.append("\n=== End of Summary ===\n")
+    return "".join(lines)
+
+
+def render_complete_text(transcript):
+    """Plain-text complete lecture transcription with part headers (draft.py format)"""
+    lines = [
+        "=" * 80 + "\n",
+        "COMPLETE LECTURE TRANSCRIPTION\n",
+        "=" * 80 + "\n\n",
+        f"Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n",
+        f"Total Parts: {len(transcript)}\n",
+        "-" * 80 + "\n\n",
+    ]
+    for i, segment in enumerate(transcript, 1):
+        lines.append(f"PART {i}\n")
+        lines.append("-" * 40 + "\n")
+        if segment.ok:
+            # Add proper paragraph spacing
+            for paragraph in segment.text.strip().split('\n\n'):
+                if paragraph.strip():
+                    lines.append(paragraph.strip() + "\n\n")
+        else:
+            lines.append(f"[Part {i}{f' ({segment.span})' if segment.timed else ''} could not be transcribed]\n\n")
+        lines.append("-" * 80 + "\n\n")
+    lines.append("=" * 80 + "\n")
+    lines.append("END OF LECTURE TRANSCRIPTION\n")
+    lines.append("=" * 80 + "\n")
+    return "".join(lines)
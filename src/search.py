@@ -0,0 +1,224 @@
+import os
+import re
+import sqlite3
+import threading
+
+from src.config import Config
+
+# Run state and caches under output/ are not notes
+SKIP_DIRS = ("runs", "cache", "sections")
+HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+# Section n of file id is stored at FTS rowid (id << SECTION_BITS) | n, so a file's rows are one rowid range
+SECTION_BITS = 16
+
+
+def parse_note(text):
+    """
+    Split a Markdown report into its frontmatter and sections
+    :return: Tuple of (frontmatter dict, list of (heading, body) in document order)
+    """
+    frontmatter = {}
+    lines = text.splitlines()
+    start = 0
+    if lines and lines[0].strip() == "---":
+        for i, line in enumerate(lines[1:], 1):
+            if line.strip() == "---":
+                start = i + 1
+                break
+            key, sep, value = line.partition(":")
+            if sep:
+                frontmatter[key.strip()] = value.strip()
+
+    sections = []
+    heading, body, in_code = "", [], False
+    for line in lines[start:]:
+        if line.lstrip().startswith("```"):
+            in_code = not in_code
+        match = None if in_code else HEADING.match(line)
+        if match:
+            if heading or "".join(body).strip():
+                sections.append((heading, "\n".join(body).strip()))
+            heading, body = match.group(2), []
+        else:
+            body.append(line)
+    if heading or "".join(body).strip():
+        sections.append((heading, "\n".join(body).strip()))
+    return frontmatter, sections[:(1 << SECTION_BITS) - 1]
+
+
+def fts_query(query):
+    """
+    Quote every word of a plain query so punctuation cannot break the FTS5 syntax
+    A trailing * keeps its meaning as a prefix search ("decentral*").
+    """
+    terms = re.findall(r"(\w+)(\*?)", query)
+    return " ".join(f'"{term}"{star}' for term, star in terms)
+
+
+class NoteIndex:
+    """
+    Full-text index of the generated Markdown notes, stored in SQLite FTS5
+    One row per section (heading and body) together with the report's title and
+    source_file, ranked with BM25. Files are reindexed only when their size or
+    modification time changes. Safe to share between threads.
+    """
+
+    def __init__(self, path):
+        """
+        :param path: Path to the SQLite database file
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, size INTEGER NOT NULL, "
+            "mtime_ns INTEGER NOT NULL, title TEXT, source_file TEXT, date TEXT)"
+        )
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS sections USING fts5("
+            "heading, body, title, source_file, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        self._conn.commit()
+
+    def _delete(self, file_id):
+        self._conn.execute(
+            "DELETE FROM sections WHERE rowid BETWEEN ? AND ?",
+            (file_id << SECTION_BITS, ((file_id + 1) << SECTION_BITS) - 1)
+        )
+        self._conn.execute("DELETE FROM files WHERE id = ?", (file_id,))
+
+    def index_file(self, path):
+        """
+        Add or refresh one report
+        :return: True if the file was (re)indexed, False if it was unchanged
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute("SELECT id, size, mtime_ns FROM files WHERE path = ?", (path,)).fetchone()
+            if row and (row[1], row[2]) == (stat.st_size, stat.st_mtime_ns):
+                return False
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            frontmatter, sections = parse_note(f.read())
+        title = frontmatter.get("title", "")
+        source_file = frontmatter.get("source_file", "")
+        with self._lock:
+            row = self._conn.execute("SELECT id FROM files WHERE path = ?", (path,)).fetchone()
+            if row:
+                self._delete(row[0])
+            cursor = self._conn.execute(
+                "INSERT INTO files (path, size, mtime_ns, title, source_file, date) VALUES (?, ?, ?, ?, ?, ?)",
+                (path, stat.st_size, stat.st_mtime_ns, title, source_file, frontmatter.get("date", ""))
+            )
+            base = cursor.lastrowid << SECTION_BITS
+            self._conn.executemany(
+                "INSERT INTO sections (rowid, heading, body, title, source_file) VALUES (?, ?, ?, ?, ?)",
+                [(base + n, heading, body, title, source_file) for n, (heading, body) in enumerate(sections, 1)]
+            )
+            self._conn.commit()
+        return True
+
+    def update(self, root):
+        """
+        Bring the index up to date with the Markdown files under root
+        New and changed files are reindexed; files that no longer exist are dropped.
+        :return: Tuple of (files reindexed, files removed)
+        """
+        root = os.path.abspath(root)
+        seen = set()
+        indexed = 0
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = [name for name in dirnames if name not in SKIP_DIRS and not name.startswith(".")]
+            for name in filenames:
+                if name.endswith(".md"):
+                    path = os.path.join(dirpath, name)
+                    seen.add(path)
+                    try:
+                        indexed += self.index_file(path)
+                    except OSError as e:
+                        print(f"Error indexing {path}: {str(e)}")
+
+        prefix = root.rstrip(os.sep) + os.sep
+        with self._lock:
+            stale = [
+                file_id for file_id, path in self._conn.execute("SELECT id, path FROM files").fetchall()
+                if path.startswith(prefix) and path not in seen
+            ]
+            for file_id in stale:
+                self._delete(file_id)
+            self._conn.commit()
+        return indexed, len(stale)
+
+    def search(self, query, limit=20, source=None, since=None):
+        """
+        Find the best-matching sections
+        :param query: Words to look for (every word must occur in the section or its report's title/source)
+        :param limit: Maximum number of results
+        :param source: Only reports whose source_file contains this text
+        :param since: Only reports dated on or after this "YYYY-MM-DD[ HH:MM:SS]"
+        :return: List of dicts with path, title, source_file, date, heading and snippet, best first
+        """
+        match = fts_query(query)
+        if not match:
+            return []
+        sql = (
+            "SELECT f.path, f.title, f.source_file, f.date, s.heading, "
+            "snippet(sections, 1, '[', ']', '...', 16) "
+            "FROM sections s JOIN files f ON f.id = (s.rowid >> ?) "
+            "WHERE sections MATCH ?"
+        )
+        params = [SECTION_BITS, match]
+        if source:
+            sql += " AND f.source_file LIKE ?"
+            params.append(f"%{source}%")
+        if since:
+            sql += " AND f.date >= ?"
+            params.append(since)
+        # Matches in headings count most, then titles, then body text
+        sql += " ORDER BY bm25(sections, 5.0, 1.0, 2.0, 1.0) LIMIT ?"
+        params.append(int(limit))
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        keys = ("path", "title", "source_file", "date", "heading", "snippet")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def stats(self):
+        """Number of indexed files and sections"""
+        with self._lock:
+            files = self._conn.execute("SELECT COUNT(*) FROM files").fetchone()[0]
+            sections = self._conn.execute("SELECT COUNT(*) FROM sections").fetchone()[0]
+        return {"files": files, "sections": sections}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def get_note_index(path=None):
+    """Return the process-wide index stored at path (defaults to Config.SEARCH_INDEX_PATH)"""
+    path = os.path.abspath(path or Config.SEARCH_INDEX_PATH)
+    with _indexes_lock:
+        if path not in _indexes:
+            _indexes[path] = NoteIndex(path)
+        return _indexes[path]
+
+
+def index_report(report_path, index_path=None):
+    """
+    Index a report right after it was written
+    Failures are printed, never raised: a missing index entry is picked up by the next
+    search, which brings the index up to date.
+    """
+    if not Config.SEARCH_INDEX:
+        return
+    try:
+        get_note_index(index_path).index_file(report_path)
+    except Exception as e:
+        print(f"Error indexing {report_path}: {str(e)}")
@@ -0,0 +1,263 @@
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+from src.config import Config
+from src.report import render_frontmatter, report_parts
+
+# Sections that carry the run date; a report that differs only in these is unchanged
+DATED_SECTIONS = ("frontmatter", "footer")
+# Unreferenced blobs younger than this may belong to a report that is still being assembled
+PRUNE_GRACE_SEC = 3600
+SEGMENT_RULE = "\n\n---\n\n"
+TRAILING_RULES = re.compile(r"(?:\s*\n\s*-{3,}\s*)+$")
+
+
+def text_digest(text):
+    """SHA-256 of a section's text, its address in the BlobStore"""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class BlobStore:
+    """
+    Content-addressed text storage
+    Each distinct text is written once, under the SHA-256 of its content, so a section
+    that is the same in several reports (or runs) is stored once.
+    """
+
+    def __init__(self, root):
+        """
+        :param root: Directory holding the blobs
+        """
+        self.root = root
+
+    def _path(self, digest):
+        return os.path.join(self.root, digest[:2], digest[2:])
+
+    def put(self, text):
+        """Store text and return its digest"""
+        digest = text_digest(text)
+        path = self._path(digest)
+        try:
+            # Refresh the age of a blob that is used again, so pruning leaves it alone
+            os.utime(path)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(text.encode("utf-8"))
+            os.replace(tmp_path, path)
+        return digest
+
+    def get(self, digest):
+        """Return the text stored under digest, or None if it is missing"""
+        try:
+            with open(self._path(digest), "rb") as f:
+                return f.read().decode("utf-8")
+        except (OSError, ValueError):
+            return None
+
+    def prune(self, keep, grace_sec=PRUNE_GRACE_SEC):
+        """
+        Remove blobs that no report refers to any more
+        :param keep: Set of digests still in use
+        :param grace_sec: Only blobs unused for at least this long are removed
+        :return: Number of blobs removed
+        """
+        if not os.path.isdir(self.root):
+            return 0
+        cutoff = time.time() - grace_sec
+        removed = 0
+        for shard in os.listdir(self.root):
+            shard_dir = os.path.join(self.root, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                path = os.path.join(shard_dir, name)
+                if shard + name in keep or name.endswith(".tmp"):
+                    continue
+                try:
+                    if os.path.getmtime(path) < cutoff:
+                        os.remove(path)
+                        removed += 1
+                except FileNotFoundError:
+                    pass
+        return removed
+
+
+def split_corrections(corrections, segments):
+    """
+    Cut the corrected transcript into one section per segment
+    The correction prompt keeps each segment's time-range marker, so every chunk's output
+    is cut at the start of the line holding the next marker. Text before a chunk's first
+    marker belongs to that segment; a segment whose marker the model dropped stays in the
+    section before it.
+    :param corrections: Corrected chunks in order
+    :param segments: TranscriptSegment records that were sent for correction, in order
+    :return: List of (segment, corrected text)
+    """
+    markers = [
+        (segment, re.compile(r"\s*[–—-]+\s*".join(re.escape(part) for part in segment.span.split(" – "))))
+        for segment in segments if segment.timed
+    ]
+    sections = []
+    first = 0
+    for correction in corrections:
+        cuts = []
+        pos = 0
+        for i in range(first, len(markers)):
+            segment, marker = markers[i]
+            match = marker.search(correction, pos)
+            if match:
+                cuts.append((segment, 0 if not cuts else max(correction.rfind("\n", 0, match.start()) + 1, pos)))
+                pos = match.end()
+                first = i + 1
+        if not cuts:
+            if sections:
+                sections[-1] = (sections[-1][0], f"{sections[-1][1]}{SEGMENT_RULE}{correction.strip()}")
+            elif segments:
+                cuts = [(segments[0], 0)]
+        for (segment, cut), (_, next_cut) in zip(cuts, cuts[1:] + [(None, len(correction))]):
+            text = TRAILING_RULES.sub("", correction[cut:next_cut]).strip()
+            if text:
+                sections.append((segment, text))
+    return sections
+
+
+def build_sections(results, transcript, source_file, title="Lecture Analysis Report",
+                   generated_by="AI Lecture Assistant"):
+    """
+    Lay out a lecture report as named sections: frontmatter, concept summary, and the
+    corrected transcript of every segment (failed segments get a note instead)
+    :param results: Dict with "concept" and "correction" outputs
+    :param transcript: Transcript the results were generated from
+    :param source_file: Lecture recording named in the frontmatter
+    :return: List of (name, text) in document order
+    """
+    header, divider, footer = report_parts()
+    corrected = {
+        segment.index: text
+        for segment, text in split_corrections(
+            results.get("corrections") or [results["correction"]], [s for s in transcript if s.text]
+        )
+    }
+    segments = []
+    for segment in transcript:
+        if segment.index in corrected:
+            text = corrected[segment.index]
+        elif not segment.ok:
+            text = f"*{segment.marked_text()}*"
+        else:
+            continue
+        if segments:
+            segments.append(("rule", SEGMENT_RULE))
+        segments.append((f"segment-{segment.index + 1}", text))
+    return [
+        ("frontmatter", render_frontmatter(title, source_file, generated_by)),
+        ("header", header),
+        ("concept", results["concept"]),
+        ("divider", divider),
+        *segments,
+        ("footer", footer),
+    ]
+
+
+class ReportSections:
+    """
+    The latest report of one lecture, kept as an ordered list of section blobs
+    The report file is written from the stored blobs. Sections of an unchanged segment
+    come out of the LLM response cache identical, so they map to the blob the last report
+    already stored; only changed sections add new blobs.
+    """
+
+    def __init__(self, path, blobs):
+        """
+        :param path: JSON file listing the sections of the lecture's latest report
+        :param blobs: BlobStore holding the section texts
+        """
+        self.path = path
+        self.blobs = blobs
+        data = {}
+        if os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                data = {}
+        self.report_path = data.get("report")
+        self.sections = [tuple(section) for section in data.get("sections", [])]
+
+    def _content(self, sections):
+        return [(name, digest) for name, digest in sections if name not in DATED_SECTIONS]
+
+    def assemble(self, report_path, sections):
+        """
+        Store a report's sections and write the report file from them
+        If everything but the dated frontmatter and footer matches the lecture's latest
+        report and that file still exists, nothing is stored or written.
+        :param report_path: Path of the Markdown report to write
+        :param sections: List of (name, text) in document order (see build_sections)
+        :return: Path of the report to keep: the latest one if unchanged, else report_path
+        """
+        digests = [(name, text_digest(text)) for name, text in sections]
+        if self.report_path and self.report_path != report_path and os.path.exists(self.report_path) \
+                and self._content(digests) == self._content(self.sections):
+            return self.report_path
+
+        for _, text in sections:
+            self.blobs.put(text)
+        tmp_path = f"{report_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for _, digest in digests:
+                text = self.blobs.get(digest)
+                if text is None:
+                    raise OSError(f"Section blob {digest} is missing")
+                f.write(text)
+        os.replace(tmp_path, report_path)
+
+        self.report_path = report_path
+        self.sections = digests
+        self.save()
+        return report_path
+
+    def save(self):
+        """Atomically write the section list"""
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"report": self.report_path, "sections": self.sections}, f, indent=2)
+        os.replace(tmp_path, self.path)
+
+
+def report_sections(source_file, root=None):
+    """
+    Open the section list of a lecture's latest report
+    Keyed by the recording's path (not its content), so a re-transcribed or edited
+    lecture still finds its last report.
+    :param root: Sections directory (defaults to Config.SECTIONS_DIR)
+    """
+    root = root or Config.SECTIONS_DIR
+    os.makedirs(root, exist_ok=True)
+    name = hashlib.sha256(os.path.abspath(source_file).encode("utf-8")).hexdigest()[:16]
+    return ReportSections(os.path.join(root, f"{name}.json"), BlobStore(os.path.join(root, "blobs")))
+
+
+def prune_sections(root=None, grace_sec=PRUNE_GRACE_SEC):
+    """
+    Remove section blobs that no lecture's latest report refers to
+    :param root: Sections directory (defaults to Config.SECTIONS_DIR)
+    :return: Number of blobs removed
+    """
+    root = root or Config.SECTIONS_DIR
+    keep = set()
+    for name in os.listdir(root) if os.path.isdir(root) else ():
+        if name.endswith(".json"):
+            try:
+                with open(os.path.join(root, name), "r", encoding="utf-8") as f:
+                    keep.update(digest for _, digest in json.load(f).get("sections", []))
+            except (OSError, ValueError):
+                # An unreadable list could hide references; keep everything this time
+                return 0
+    return BlobStore(os.path.join(root, "blobs")).prune(keep, grace_sec)
@@ -0,0 +1,152 @@
+import os
+import subprocess
+import numpy as np
+
+from src.audio import SEGMENT_CODECS
+
+
+def decode_to_pcm(input_file, pcm_path, sample_rate=16000):
+    """
+    Decode an audio file once into raw mono 16-bit PCM on disk
+    :param input_file: Path to input audio file
+    :param pcm_path: Path of the raw PCM file to write
+    :param sample_rate: Output sample rate in Hz
+    :return: Path to the PCM file
+    """
+    command = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+        "-i", input_file,
+        "-vn", "-ac", "1", "-ar", str(sample_rate),
+        "-f", "s16le", pcm_path,
+    ]
+    subprocess.run(command, check=True, capture_output=True)
+    return pcm_path
+
+
+def frame_rms_db(samples, frame_len, block_frames=4000):
+    """
+    Compute per-frame RMS energy in dBFS
+    Works block by block, scaling and squaring each block in place, so memory stays at one
+    small float block (about 12 MB with 800-sample frames) whatever the recording length.
+    :param samples: 1-D int16 array (may be a np.memmap)
+    :param frame_len: Samples per frame
+    :param block_frames: Frames converted to float per block
+    :return: float32 array with one dBFS value per complete frame
+    """
+    n_frames = len(samples) // frame_len
+    rms_db = np.empty(n_frames, dtype=np.float32)
+    for first in range(0, n_frames, block_frames):
+        last = min(first + block_frames, n_frames)
+        block = np.array(samples[first * frame_len:last * frame_len], dtype=np.float32).reshape(-1, frame_len)
+        np.multiply(block, 1.0 / 32768.0, out=block)
+        np.square(block, out=block)
+        rms = np.sqrt(np.mean(block, axis=1))
+        rms_db[first:last] = 20.0 * np.log10(np.maximum(rms, 1e-10))
+    return rms_db
+
+
+def plan_segments(rms_db, frame_sec, target_sec=600, tolerance_sec=30,
+                  silence_db=-40.0, max_silence_sec=10.0, padding_sec=0.25):
+    """
+    Plan segment boundaries that fall in quiet frames instead of at fixed offsets
+    Leading/trailing silence and gaps longer than max_silence_sec are dropped entirely.
+    :param rms_db: Per-frame energy in dBFS (see frame_rms_db)
+    :param frame_sec: Frame duration in seconds
+    :param target_sec: Preferred segment length in seconds
+    :param tolerance_sec: How far a cut may move from the target to find a quiet frame
+                          (capped at half the target)
+    :param silence_db: Frames at or below this level count as silence
+    :param max_silence_sec: Silent stretches longer than this are cut out as dead air
+    :param padding_sec: Audio kept on either side of each voiced region
+    :return: List of (start_sec, end_sec) tuples
+    """
+    voiced = np.flatnonzero(rms_db > silence_db)
+    if len(voiced) == 0:
+        return []
+
+    # Group voiced frames into regions separated by dead air
+    gaps = np.flatnonzero(np.diff(voiced) > max_silence_sec / frame_sec)
+    region_starts = voiced[np.r_[0, gaps + 1]]
+    region_ends = voiced[np.r_[gaps, len(voiced) - 1]] + 1
+
+    n_frames = len(rms_db)
+    pad = int(round(padding_sec / frame_sec))
+    target = max(1, int(round(target_sec / frame_sec)))
+    # A tolerance as large as the target would allow a cut at the segment start, which never advances
+    tolerance = min(int(round(tolerance_sec / frame_sec)), target // 2)
+
+    spans = []
+    for region_start, region_end in zip(region_starts, region_ends):
+        start = max(0, region_start - pad)
+        end = min(n_frames, region_end + pad)
+        while end - start > target + tolerance:
+            low = start + target - tolerance
+            high = max(low + 1, start + target + tolerance)
+            cut = low + int(np.argmin(rms_db[low:high]))
+            assert cut > start
+            spans.append((start, cut))
+            start = cut
+        spans.append((start, end))
+
+    return [(float(start * frame_sec), float(end * frame_sec)) for start, end in spans]
+
+
+def export_span(pcm_path, start_sec, end_sec, output_path, fmt="flac", sample_rate=16000):
+    """Encode one span of a raw PCM file into an upload-ready segment"""
+    command = [
+        "ffmpeg", "-hide_banner", "-loglevel", "error", "-y",
+        "-f", "s16le", "-ac", "1", "-ar", str(sample_rate),
+        "-ss", f"{start_sec:.3f}", "-t", f"{end_sec - start_sec:.3f}",
+        "-i", pcm_path,
+        *SEGMENT_CODECS[fmt],
+        output_path,
+    ]
+    subprocess.run(command, check=True, capture_output=True)
+    return output_path
+
+
+def split_on_silence(input_file, output_dir, segment_length_sec=600, fmt="flac",
+                     sample_rate=16000, frame_sec=0.05, tolerance_sec=30,
+                     silence_db=-40.0, max_silence_sec=10.0, prefix="segment"):
+    """
+    Split an audio file at quiet points near every segment_length_sec
+    The source is decoded once to a raw PCM scratch file which is memory-mapped for analysis.
+    :param input_file: Path to input audio file
+    :param output_dir: Directory to write the segments to
+    :param segment_length_sec: Preferred segment length in seconds
+    :param fmt: Segment format (see src.audio.SEGMENT_CODECS)
+    :param sample_rate: Output sample rate in Hz
+    :param frame_sec: Energy frame duration in seconds
+    :param tolerance_sec: Maximum distance a cut may move from the preferred offset
+    :param silence_db: Silence threshold in dBFS
+    :param max_silence_sec: Silences longer than this are removed
+    :param prefix: Filename prefix for the segments
+    :return: List of (segment_path, start_sec, end_sec) tuples
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    pcm_path = os.path.join(output_dir, f"{prefix}_source.pcm")
+    decode_to_pcm(input_file, pcm_path, sample_rate=sample_rate)
+    try:
+        if os.path.getsize(pcm_path) < 2:
+            return []
+        samples = np.memmap(pcm_path, dtype=np.int16, mode="r")
+        frame_len = int(sample_rate * frame_sec)
+        rms_db = frame_rms_db(samples, frame_len)
+        del samples
+
+        spans = plan_segments(
+            rms_db, frame_len / sample_rate,
+            target_sec=segment_length_sec,
+            tolerance_sec=tolerance_sec,
+            silence_db=silence_db,
+            max_silence_sec=max_silence_sec
+        )
+
+        segments = []
+        for i, (start_sec, end_sec) in enumerate(spans, 1):
+            segment_path = os.path.join(output_dir, f"{prefix}_{i:03d}.{fmt}")
+            export_span(pcm_path, start_sec, end_sec, segment_path, fmt=fmt, sample_rate=sample_rate)
+            segments.append((segment_path, start_sec, end_sec))
+        return segments
+    finally:
+        os.remove(pcm_path)
@@ -0,0 +1,131 @@
+import json
+import os
+
+
+def format_timestamp(seconds):
+    """Format an offset in the recording as H:MM:SS"""
+    seconds = int(seconds)
+    return f"{seconds // 3600}:{seconds % 3600 // 60:02d}:{seconds % 60:02d}"
+
+
+class TranscriptSegment:
+    """Text of one audio segment and where it sits in the recording"""
+
+    __slots__ = ("index", "start_sec", "end_sec", "text")
+
+    def __init__(self, index, start_sec, end_sec, text=None):
+        """
+        :param index: Position of the segment in the recording
+        :param start_sec: Segment start in the source recording, or None if unknown
+        :param end_sec: Segment end in the source recording, or None if unknown
+        :param text: Transcribed text, or None if transcription failed
+        """
+        self.index = index
+        self.start_sec = start_sec
+        self.end_sec = end_sec
+        self.text = text
+
+    @property
+    def ok(self):
+        return self.text is not None
+
+    @property
+    def timed(self):
+        """True if the segment's place in the recording is known"""
+        return self.start_sec is not None and self.end_sec is not None
+
+    @property
+    def span(self):
+        """Human-readable time range, e.g. "0:10:00 – 0:19:58", or None if the segment is not timed"""
+        if not self.timed:
+            return None
+        return f"{format_timestamp(self.start_sec)} – {format_timestamp(self.end_sec)}"
+
+    def marked_text(self):
+        """Segment text prefixed with its time range (when known), as sent to the LLM"""
+        marker = f"[{self.span}] " if self.timed else ""
+        if self.text is None:
+            return f"{marker}(This part of the recording could not be transcribed.)"
+        return f"{marker}{self.text.strip()}"
+
+    def to_dict(self):
+        return {"index": self.index, "start_sec": self.start_sec, "end_sec": self.end_sec, "text": self.text}
+
+
+class Transcript:
+    """
+    Ordered, timestamped segment texts of one lecture
+    Built once from the manifest (or the live stream) and handed to the enhancement and
+    output stages, so segment offsets and failed segments are never lost in a joined string.
+    """
+
+    def __init__(self, segments=(), source_file=None):
+        """
+        :param segments: TranscriptSegment records in recording order
+        :param source_file: Name of the lecture recording
+        """
+        self.segments = list(segments)
+        self.source_file = source_file
+
+    @classmethod
+    def from_dicts(cls, segments, source_file=None):
+        """Build from manifest-style dicts with index, start_sec, end_sec and text"""
+        return cls(
+            (TranscriptSegment(s["index"], s["start_sec"], s["end_sec"], s.get("text")) for s in segments),
+            source_file
+        )
+
+    def append(self, segment):
+        self.segments.append(segment)
+
+    def __len__(self):
+        return len(self.segments)
+
+    def __iter__(self):
+        return iter(self.segments)
+
+    @property
+    def failed(self):
+        """Segments that could not be transcribed"""
+        return [segment for segment in self.segments if not segment.ok]
+
+    def has_text(self):
+        return any(segment.text for segment in self.segments)
+
+    @property
+    def audio_sec(self):
+        """Seconds of audio covered by the transcribed segments"""
+        return sum(segment.end_sec - segment.start_sec for segment in self.segments if segment.ok and segment.timed)
+
+    def paragraphs(self, timestamps=True, failed=True):
+        """
+        Segment texts for the enhancement stage, one paragraph per segment
+        :param timestamps: Prefix each with its time range and keep markers for failed segments
+        :param failed: With timestamps, include the markers of failed segments
+        """
+        if timestamps:
+            return [
+                segment.marked_text() for segment in self.segments
+                if segment.text or (failed and not segment.ok)
+            ]
+        return [segment.text for segment in self.segments if segment.text]
+
+    def text(self):
+        """Plain transcript text, segments separated by blank lines"""
+        return "\n\n".join(self.paragraphs(timestamps=False))
+
+    def to_dict(self):
+        return {"source_file": self.source_file, "segments": [segment.to_dict() for segment in self.segments]}
+
+    def save(self, path):
+        """Write the transcript as JSON and return its path"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+        return path
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls.from_dicts(data["segments"], data.get("source_file"))
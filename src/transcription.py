@@ -0,0 +1,270 @@
+import io
+import os
+import time
+import threading
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+
+from src.config import Config
+from src.audio import PcmSegment, mime_type_for
+from src.ratelimit import get_limiter
+
+
+def transcribe_with_retry(transcribe_fn, segment, retries=3, backoff_sec=2.0, stop_event=None):
+    """
+    Call a transcription function, retrying with exponential backoff
+    A TranscriptionError is terminal: the backend has already retried what was worth
+    retrying (or its circuit is open), so the segment fails without another attempt.
+    :param transcribe_fn: Callable taking a segment and returning text or None
+    :param segment: Segment passed through to transcribe_fn
+    :param retries: Number of retries after the first attempt
+    :param backoff_sec: Initial delay between attempts, doubled after each failure
+    :param stop_event: Optional threading.Event; once set, no further attempts are made
+    :return: Transcribed text, or None if every attempt failed
+    """
+    delay = backoff_sec
+    for attempt in range(retries + 1):
+        if stop_event and stop_event.is_set():
+            return None
+        try:
+            text = transcribe_fn(segment)
+        except TranscriptionError as e:
+            print(f"Error transcribing segment: {str(e)}")
+            return None
+        except Exception as e:
+            print(f"Error transcribing segment: {str(e)}")
+            text = None
+        if text is not None:
+            return text
+        if attempt < retries:
+            print(f"Retrying segment in {delay:.1f}s ({attempt + 1}/{retries})...")
+            if stop_event:
+                stop_event.wait(delay)
+            else:
+                time.sleep(delay)
+            delay *= 2
+    return None
+
+
+def transcribe_segments(transcribe_fn, segments, max_workers=4, retries=3, backoff_sec=2.0, stop_event=None):
+    """
+    Transcribe segments concurrently on a bounded thread pool
+    :param transcribe_fn: Callable taking a segment and returning text or None
+    :param segments: Segments in playback order
+    :param max_workers: Maximum number of segments in flight at once
+    :param retries: Per-segment retries after the first attempt
+    :param backoff_sec: Initial per-segment retry delay
+    :param stop_event: Optional threading.Event; once set, segments not yet started are skipped
+    :return: List of texts in segment order, with None for failed segments
+    """
+    results = [None] * len(segments)
+    if not segments:
+        return results
+
+    def run(index):
+        results[index] = transcribe_with_retry(transcribe_fn, segments[index], retries, backoff_sec, stop_event)
+        if stop_event and stop_event.is_set() and results[index] is None:
+            return
+        status = "done" if results[index] is not None else "failed"
+        print(f"Segment {index + 1} of {len(segments)} {status}")
+
+    workers = max(1, min(max_workers, len(segments)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(run, range(len(segments))))
+    return results
+
+
+def transcribe_stream(transcribe_fn, segments, max_workers=4, retries=3, backoff_sec=2.0, stop_event=None):
+    """
+    Transcribe segments from an iterator while it is still producing them
+    At most 2 * max_workers segments are held at once, so a streaming decoder
+    never gets far ahead of the uploads.
+    :param transcribe_fn: Callable taking a segment and returning text or None
+    :param segments: Iterable of segments in playback order
+    :param stop_event: Optional threading.Event; once set, no more segments are read or started
+    :return: List of texts in segment order, with None for failed segments
+    """
+    results = []
+    slots = threading.BoundedSemaphore(2 * max(1, max_workers))
+
+    def run(index, segment):
+        try:
+            results[index] = transcribe_with_retry(transcribe_fn, segment, retries, backoff_sec, stop_event)
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+        for index, segment in enumerate(segments):
+            if stop_event and stop_event.is_set():
+                break
+            slots.acquire()
+            results.append(None)
+            executor.submit(run, index, segment)
+    return results
+
+
+@contextmanager
+def open_segment(segment):
+    """
+    Open a segment for upload, whether it is a file path, a PcmSegment or a file-like object
+    :return: Context manager yielding (filename, file object, MIME type)
+    """
+    if isinstance(segment, PcmSegment):
+        yield f"segment_{segment.index + 1:03d}.wav", io.BytesIO(segment.to_wav_bytes()), "audio/wav"
+    elif isinstance(segment, str):
+        with open(segment, "rb") as f:
+            yield os.path.basename(segment), f, mime_type_for(segment)
+    else:
+        name = os.path.basename(getattr(segment, "name", "") or "segment.wav")
+        segment.seek(0)
+        yield name, segment, mime_type_for(name)
+
+
+class TranscriptionError(Exception):
+    """Raised when the transcription API rejects a request or keeps failing"""
+
+
+class CircuitOpenError(TranscriptionError):
+    """Raised instead of sending a request while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """
+    Stop calling a failing service for a while after repeated errors
+    After failure_threshold consecutive failures the circuit opens; once reset_sec has
+    passed a single trial request is let through and its outcome closes or reopens it.
+    """
+
+    def __init__(self, failure_threshold=5, reset_sec=60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_sec = reset_sec
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """Return True if a request may be sent now"""
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at >= self.reset_sec:
+                # Half-open: let one request through and restart the timer
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+def parse_retry_after(value):
+    """Return the delay in seconds from a Retry-After header (seconds or HTTP date), or None"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return None
+
+
+class TranscriptionClient:
+    """
+    SiliconFlow transcription client with a pooled keep-alive session
+    Requests use explicit connect/read timeouts, retry 429/5xx responses and connection
+    errors with exponential backoff (honouring Retry-After), and share a circuit breaker.
+    """
+
+    RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+    def __init__(self, api_key=None, url=None, model=None, pool_size=None):
+        """
+        :param api_key: SiliconFlow API key (defaults to Config.SILICON_FLOW_API_KEY)
+        :param url: Transcription endpoint (defaults to Config.SILICON_FLOW_URL)
+        :param model: ASR model name (defaults to Config.SILICON_FLOW_MODEL)
+        :param pool_size: Maximum pooled connections (defaults to TRANSCRIBE_CONCURRENCY x BATCH_LECTURE_CONCURRENCY)
+        """
+        self.api_key = api_key or Config.SILICON_FLOW_API_KEY
+        self.url = url or Config.SILICON_FLOW_URL
+        self.model = model or Config.SILICON_FLOW_MODEL
+        self.timeout = (Config.HTTP_CONNECT_TIMEOUT_SEC, Config.HTTP_READ_TIMEOUT_SEC)
+        self.max_retries = Config.HTTP_MAX_RETRIES
+        self.backoff_sec = Config.TRANSCRIBE_BACKOFF_SEC
+        self.breaker = CircuitBreaker(Config.CIRCUIT_FAILURE_THRESHOLD, Config.CIRCUIT_RESET_SEC)
+
+        # Imported here so modules using only the helpers above start without loading requests
+        import requests
+        from requests.adapters import HTTPAdapter
+
+        pool_size = pool_size or max(1, Config.TRANSCRIBE_CONCURRENCY * Config.BATCH_LECTURE_CONCURRENCY)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update({"Authorization": f"Bearer {self.api_key}"})
+
+    def transcribe(self, filename, audio_file, mime_type):
+        """
+        Upload one audio file and return the parsed JSON response
+        :param filename: Name reported in the multipart upload
+        :param audio_file: Binary file object positioned at the start of the audio
+        :param mime_type: MIME type of the audio
+        :return: Response JSON (contains "text")
+        """
+        import requests
+
+        start = audio_file.tell()
+        delay = self.backoff_sec
+        for attempt in range(self.max_retries + 1):
+            if not self.breaker.allow():
+                raise CircuitOpenError("Transcription service circuit is open; skipping request")
+
+            audio_file.seek(start)
+            files = {
+                "file": (filename, audio_file, mime_type),
+                "model": (None, self.model)
+            }
+            get_limiter("siliconflow").acquire()
+            retry_after = None
+            response = None
+            try:
+                response = self.session.post(self.url, files=files, timeout=self.timeout)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                self.breaker.record_failure()
+                error = TranscriptionError(f"Request failed: {str(e)}")
+            else:
+                if response.status_code == 200:
+                    self.breaker.record_success()
+                    return response.json()
+                error = TranscriptionError(f"Transcription failed with status code {response.status_code}: {response.text[:200]}")
+                if response.status_code not in self.RETRY_STATUSES:
+                    raise error
+                self.breaker.record_failure()
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+
+            if attempt == self.max_retries:
+                raise error
+            wait = retry_after if retry_after is not None else delay
+            if response is not None and response.status_code == 429:
+                # Hold every queued upload rather than letting each worker hit the limit again
+                get_limiter("siliconflow").pause(wait)
+            print(f"{str(error)}; retrying in {wait:.1f}s ({attempt + 1}/{self.max_retries})")
+            time.sleep(wait)
+            delay *= 2
+
+    def close(self):
+        self.session.close()
+
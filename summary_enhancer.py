@@ -1,7 +1,10 @@
 import os
-from openai import OpenAI
 from datetime import datetime
 from src.config import Config
+from src.engine import RunContext, PromptStage
+from src.enhancement import LECTURE_SYSTEM_PROMPT, TRANSCRIPT_TEMPLATE
+from src.report import write_frontmatter
+from src.search import index_report
 
 def enhance_lecture_summary(input_file, output_dir="output/enhanced_summaries"):
     """
@@ -18,14 +21,12 @@ def enhance_lecture_summary(input_file, output_dir="output/enhanced_summaries"):
         with open(input_file, 'r', encoding='utf-8') as f:
             original_summary = f.read()
         
-        # Initialize DeepSeek client
-        client = OpenAI(
-            api_key=Config.DEEPSEEK_API_KEY,
-            base_url="https://api.deepseek.com"
-        )
-        
         # Construct the prompt for enhancement with Markdown formatting
-        system_prompt = """You are an expert at analyzing and improving lecture summaries. Your task is to enhance the lecture summary and provide it in well-structured Markdown format. Please:
+        # The summary goes first and the task after it, the same layout as the pipeline's passes,
+        # so the provider can serve the shared prefix from its cache
+        system_prompt = LECTURE_SYSTEM_PROMPT
+
+        user_template = TRANSCRIPT_TEMPLATE + """Task: enhance the lecture summary above and convert it into a well-structured Markdown document. Please:
 
 1. Remove any irrelevant content or transcription artifacts
 2. Fix any transcription errors or unclear sentences
@@ -50,37 +51,26 @@ Format requirements:
 
 Please ensure the output is in perfect Markdown format."""
 
-        user_prompt = f"""Please enhance this lecture summary and convert it into a well-structured Markdown document:
-
-{original_summary}"""
-
-        # Get enhanced summary from DeepSeek API
-        response = client.chat.completions.create(
-            model="deepseek-chat",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt},
-            ],
-            stream=False
-        )
-        
-        enhanced_summary = response.choices[0].message.content
-        
         # Save the enhanced summary as Markdown
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_file = os.path.join(output_dir, f"enhanced_summary_{timestamp}.md")
+        paragraphs = original_summary.split("\n\n")
         
+        context = RunContext(os.path.basename(input_file))
         with open(output_file, 'w', encoding='utf-8') as f:
             # Add YAML frontmatter
-            f.write("---\n")
-            f.write(f"title: Enhanced Lecture Summary\n")
-            f.write(f"date: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
-            f.write(f"source_file: {os.path.basename(input_file)}\n")
-            f.write(f"generated_by: DeepSeek AI\n")
-            f.write("---\n\n")
-            # Write the enhanced summary
-            f.write(enhanced_summary)
+            write_frontmatter(f, "Enhanced Lecture Summary", input_file, "DeepSeek AI")
+            
+            # Long summaries are split into token-bounded chunks and enhanced in parallel
+            if Config.LLM_STREAM:
+                # Stream each part into the file as it is generated, in document order
+                PromptStage(system_prompt, user_template, out=f)(context, paragraphs)
+            else:
+                parts = PromptStage(system_prompt, user_template)(context, paragraphs)
+                # Write the enhanced summary
+                f.write("\n\n---\n\n".join(parts))
         
+        index_report(output_file)
         print(f"\nEnhanced summary saved to {output_file}")
         return output_file
         
@@ -103,6 +93,9 @@ def main():
     latest_summary = sorted(summary_files)[-1]
     input_file = os.path.join(transcriptions_dir, latest_summary)
     
+    # Only DeepSeek credentials are needed here
+    Config.require("llm")
+
     print(f"\n=== Starting Summary Enhancement ===")
     print(f"Processing file: {latest_summary}")
     
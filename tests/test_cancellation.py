@@ -0,0 +1,29 @@
+import asyncio
+import threading
+
+import pytest
+
+from src.enhancement import EnhancementCancelled, run_until_stopped
+
+
+def test_run_until_stopped_abandons_calls_in_flight():
+    stop_event = threading.Event()
+    finished = []
+
+    async def slow_call():
+        try:
+            await asyncio.sleep(30)
+        finally:
+            finished.append(True)
+
+    threading.Timer(0.2, stop_event.set).start()
+    with pytest.raises(EnhancementCancelled):
+        asyncio.run(run_until_stopped(slow_call(), stop_event, poll_sec=0.05))
+    assert finished == [True]
+
+
+def test_run_until_stopped_returns_result():
+    async def call():
+        return "text"
+
+    assert asyncio.run(run_until_stopped(call(), threading.Event())) == "text"
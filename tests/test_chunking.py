@@ -0,0 +1,32 @@
+import random
+
+from src.enhancement import chunk_transcript, estimate_tokens
+
+
+def paragraphs(n, seed=0):
+    rng = random.Random(seed)
+    words = ("entropy", "market", "price", "risk", "bond", "yield")
+    return [
+        f"[0:{i:02d}:00 – 0:{i:02d}:59] " + " ".join(rng.choice(words) for _ in range(rng.randint(800, 1600)))
+        for i in range(n)
+    ]
+
+
+def test_chunks_stay_within_budget_and_keep_every_paragraph():
+    paras = paragraphs(40)
+    chunks = chunk_transcript(paras, 6000)
+
+    assert all(estimate_tokens(chunk) <= 6000 for chunk in chunks)
+    assert "\n\n".join(chunks) == "\n\n".join(paras)
+
+
+def test_editing_one_paragraph_leaves_later_chunks_unchanged():
+    paras = paragraphs(40)
+    chunks = chunk_transcript(paras, 6000)
+    for index in (3, 20, 35):
+        edited = list(paras)
+        edited[index] += " and a much longer ending" * 50
+        changed = set(chunk_transcript(edited, 6000)) - set(chunks)
+
+        assert 1 <= len(changed) <= 5
+        assert chunks[-1] in chunk_transcript(edited, 6000)
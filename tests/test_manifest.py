@@ -0,0 +1,29 @@
+from src.manifest import LectureManifest
+
+
+def manifest(tmp_path):
+    source = tmp_path / "lecture.m4a"
+    source.write_bytes(b"audio")
+    m = LectureManifest(str(tmp_path / "manifest.json"), str(source), "fingerprint")
+    m.set_segments(["a.flac", "b.flac"], [(0, 600), (600, 1200)])
+    m.set_transcription(0, "zero")
+    m.set_output("correction", "corrected zero", stage="corrected")
+    m.set_output("concept", "concepts", stage="summarized")
+    return m
+
+
+def test_recovered_segment_invalidates_enhancement(tmp_path):
+    m = manifest(tmp_path)
+    m.set_transcription(1, "one")
+
+    assert not m.is_done("corrected")
+    assert not m.is_done("summarized")
+
+
+def test_unchanged_text_keeps_enhancement(tmp_path):
+    m = manifest(tmp_path)
+    m.set_transcription(0, "zero")
+    m.set_transcription(1, None)
+
+    assert m.is_done("corrected")
+    assert m.is_done("summarized")
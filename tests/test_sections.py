@@ -0,0 +1,82 @@
+import os
+
+from src.sections import BlobStore, ReportSections, build_sections, prune_sections, split_corrections, text_digest
+from src.transcript import Transcript, TranscriptSegment
+
+
+def segments(n):
+    return [TranscriptSegment(i, i * 600, i * 600 + 598, f"text {i}") for i in range(n)]
+
+
+def test_split_corrections_cuts_at_markers_per_chunk():
+    segs = segments(4)
+    corrections = [
+        "# Corrected\n\n## [0:00:00 – 0:09:58]\nzero\n\n**[0:10:00 - 0:19:58]** one\n\n---",
+        "# Corrected\n\n[0:20:00 – 0:29:58] two\n\n[0:30:00 – 0:39:58] three",
+    ]
+    sections = split_corrections(corrections, segs)
+
+    assert [(segment.index, text) for segment, text in sections] == [
+        (0, "# Corrected\n\n## [0:00:00 – 0:09:58]\nzero"),
+        (1, "**[0:10:00 - 0:19:58]** one"),
+        (2, "# Corrected\n\n[0:20:00 – 0:29:58] two"),
+        (3, "[0:30:00 – 0:39:58] three"),
+    ]
+
+
+def test_split_corrections_keeps_text_of_dropped_marker():
+    segs = segments(3)
+    sections = split_corrections(["[0:00:00 – 0:09:58] zero\n\none without marker\n\n[0:20:00 – 0:29:58] two"], segs)
+
+    assert [(segment.index, text) for segment, text in sections] == [
+        (0, "[0:00:00 – 0:09:58] zero\n\none without marker"),
+        (2, "[0:20:00 – 0:29:58] two"),
+    ]
+
+
+def test_untimed_segments_have_no_markers():
+    segs = [TranscriptSegment(i, None, None, f"text {i}") for i in range(2)]
+    sections = split_corrections(["zero\n\none"], segs)
+
+    assert segs[0].marked_text() == "text 0"
+    assert Transcript(segs).audio_sec == 0
+    assert [(segment.index, text) for segment, text in sections] == [(0, "zero\n\none")]
+
+
+def test_build_sections_notes_failed_segments():
+    transcript = Transcript([*segments(1), TranscriptSegment(1, 600, 1198, None)], "lecture.m4a")
+    names = [name for name, _ in build_sections(
+        {"concept": "concept", "correction": "[0:00:00 – 0:09:58] zero"}, transcript, "lecture.m4a"
+    )]
+
+    assert names == ["frontmatter", "header", "concept", "divider", "segment-1", "rule", "segment-2", "footer"]
+
+
+def test_assemble_writes_report_from_blobs_and_keeps_unchanged_report(tmp_path):
+    root = str(tmp_path / "sections")
+    os.makedirs(root)
+    blobs = BlobStore(os.path.join(root, "blobs"))
+    first = str(tmp_path / "first.md")
+    second = str(tmp_path / "second.md")
+    sections = [("frontmatter", "---\ndate: 1\n---\n"), ("concept", "concept"), ("footer", "footer 1")]
+
+    assert ReportSections(os.path.join(root, "a.json"), blobs).assemble(first, sections) == first
+    with open(first, encoding="utf-8") as f:
+        assert f.read() == "---\ndate: 1\n---\nconceptfooter 1"
+
+    redated = [("frontmatter", "---\ndate: 2\n---\n"), ("concept", "concept"), ("footer", "footer 2")]
+    assert ReportSections(os.path.join(root, "a.json"), blobs).assemble(second, redated) == first
+    assert not os.path.exists(second)
+    assert blobs.get(text_digest("footer 2")) is None
+
+
+def test_prune_removes_only_unreferenced_blobs(tmp_path):
+    root = str(tmp_path)
+    blobs = BlobStore(os.path.join(root, "blobs"))
+    report = ReportSections(os.path.join(root, "a.json"), blobs)
+    report.assemble(str(tmp_path / "r1.md"), [("concept", "old")])
+    report.assemble(str(tmp_path / "r2.md"), [("concept", "new")])
+
+    assert prune_sections(root, grace_sec=0) == 1
+    assert blobs.get(text_digest("new")) == "new"
+    assert blobs.get(text_digest("old")) is None
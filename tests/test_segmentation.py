@@ -0,0 +1,112 @@
+import signal
+
+import numpy as np
+import pytest
+
+from src.live import StreamSegmenter
+from src.silence import frame_rms_db, plan_segments
+
+FRAME_SEC = 0.05
+SAMPLE_RATE = 16000
+
+
+@pytest.fixture(autouse=True)
+def fail_on_hang():
+    """Turn an endless segmentation loop into a test failure"""
+    def timeout(signum, frame):
+        raise TimeoutError("segmentation did not terminate")
+
+    previous = signal.signal(signal.SIGALRM, timeout)
+    signal.alarm(5)
+    yield
+    signal.alarm(0)
+    signal.signal(signal.SIGALRM, previous)
+
+
+def speech_rms(duration_sec, pause_every_sec=7.0):
+    """Per-frame energy of continuous speech with a short quiet dip every few seconds"""
+    rms_db = np.full(int(duration_sec / FRAME_SEC), -20.0, dtype=np.float32)
+    rms_db[::int(pause_every_sec / FRAME_SEC)] = -60.0
+    return rms_db
+
+
+def speech_pcm(duration_sec):
+    t = np.arange(int(duration_sec * SAMPLE_RATE)) / SAMPLE_RATE
+    return (np.sin(2 * np.pi * 220 * t) * 8000).astype(np.int16).tobytes()
+
+
+def silence_pcm(duration_sec):
+    return bytes(int(duration_sec * SAMPLE_RATE) * 2)
+
+
+@pytest.mark.parametrize("target_sec, tolerance_sec", [
+    (600, 30),
+    (60, 10),
+    (30, 30),
+    (30, 60),
+    (0.05, 5),
+])
+def test_plan_segments_terminates_and_covers_speech(target_sec, tolerance_sec):
+    rms_db = speech_rms(300)
+    spans = plan_segments(rms_db, FRAME_SEC, target_sec=target_sec, tolerance_sec=tolerance_sec)
+
+    assert spans[0][0] == 0.0
+    assert spans[-1][1] == pytest.approx(len(rms_db) * FRAME_SEC)
+    for (start, end), (next_start, _) in zip(spans, spans[1:]):
+        assert end == next_start
+    limit = target_sec + min(tolerance_sec, target_sec / 2) + FRAME_SEC
+    for start, end in spans:
+        assert 0 < end - start <= limit
+
+
+def test_plan_segments_cuts_at_quiet_frames():
+    rms_db = speech_rms(300)
+    spans = plan_segments(rms_db, FRAME_SEC, target_sec=60, tolerance_sec=10)
+
+    for _, end in spans[:-1]:
+        assert rms_db[int(round(end / FRAME_SEC))] == -60.0
+
+
+def test_plan_segments_drops_dead_air():
+    rms_db = np.r_[np.full(400, -20.0), np.full(600, -80.0), np.full(400, -20.0)].astype(np.float32)
+    spans = plan_segments(rms_db, FRAME_SEC, target_sec=600, max_silence_sec=10.0, padding_sec=0.25)
+
+    assert spans == [(0.0, pytest.approx(20.25)), (pytest.approx(49.75), pytest.approx(70.0))]
+
+
+def test_plan_segments_of_silence_is_empty():
+    assert plan_segments(np.full(100, -80.0, dtype=np.float32), FRAME_SEC) == []
+
+
+@pytest.mark.parametrize("target_sec, tolerance_sec", [(10, 2), (10, 10), (10, 30)])
+def test_stream_segmenter_advances(target_sec, tolerance_sec):
+    segmenter = StreamSegmenter(SAMPLE_RATE, target_sec=target_sec, tolerance_sec=tolerance_sec)
+    pcm = speech_pcm(45)
+    segments = []
+    for first in range(0, len(pcm), SAMPLE_RATE):
+        segments.extend(segmenter.feed(pcm[first:first + SAMPLE_RATE]))
+    segments.extend(segmenter.flush())
+
+    assert len(segments) >= 3
+    assert [segment.index for segment in segments] == list(range(len(segments)))
+    assert sum(segment.duration_sec for segment in segments) == pytest.approx(45, abs=FRAME_SEC)
+    for segment in segments:
+        assert 0 < segment.duration_sec <= target_sec + min(tolerance_sec, target_sec / 2) + FRAME_SEC
+
+
+def test_stream_segmenter_ends_segment_at_long_pause():
+    segmenter = StreamSegmenter(SAMPLE_RATE, target_sec=60, tolerance_sec=10, max_silence_sec=2.0)
+    segments = segmenter.feed(speech_pcm(5) + silence_pcm(4))
+
+    assert len(segments) == 1
+    assert segments[0].start_sec == 0.0
+    assert segments[0].duration_sec == pytest.approx(5.25, abs=FRAME_SEC)
+
+
+def test_frame_rms_db_is_independent_of_block_size():
+    samples = (np.random.default_rng(0).standard_normal(800 * 1003) * 3000).astype(np.int16)
+    expected = samples.astype(np.float64).reshape(-1, 800) / 32768.0
+    expected = 20.0 * np.log10(np.sqrt(np.mean(expected * expected, axis=1)))
+
+    for block_frames in (7, 4000):
+        assert np.allclose(frame_rms_db(samples, 800, block_frames), expected, atol=1e-3)